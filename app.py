@@ -1,18 +1,40 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+import base64
+import binascii
+from collections import deque
+from itertools import islice
 import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
 import os
-import psycopg2
+import re
+import time
 from psycopg2.extras import RealDictCursor
-import os
 
-# Database connection
-def get_db_connection():
-    DATABASE_URL = os.environ.get('DATABASE_URL')
-    if DATABASE_URL:
-        conn = psycopg2.connect(DATABASE_URL, sslmode='require')  # [2][4][6]
-        return conn
-    return None
+from assets import AssetBundle
+from db import get_db_connection, release_db_connection, pool_stats
+from dedup import dedup_stats, record_key, recent_uploads
+from export import EXPORT_FORMATS, csv_stream, iter_batches, ndjson_stream, parquet_available, parquet_stream
+from hotwindow import hot_window
+from ingest import get_ingest_buffer, ingest_stats, insert_record
+from latest import LatestReadings
+from live import encode_event, live_feed, notify
+from localstore import get_local_store
+from logs import get_logger, sampled
+from metrics import REQUEST_SECONDS, render as render_metrics, timer
+from migrations import migrate
+from partitions import maintain_partitions, start_partition_maintenance
+from responses import ApiJSONProvider, columnar, compress_response, msgpack_available, pack
+from rollups import (ROLLUP_METRICS, bucket_start, format_stats, resolution_for, stats_query, summarize,
+                     update_rollups)
+from schema import (QUERYABLE_COLUMNS, TIMESTAMP_MIN, add_missing_columns_sql, as_timestamp,
+                    build_data_query, create_table_sql, parse_wslink, with_timestamps)
+from series import (RAW_MAX_SPAN, SERIES_DEFAULT_POINTS, SERIES_MAX_POINTS, SERIES_METRICS, SOURCES, downsample,
+                    raw_series, records_to_arrays, select_source, series_available, series_query, series_response,
+                    to_arrays)
+
+log = get_logger(__name__)
 
 def init_database():
     """Vytvoří tabulku při prvním spuštění"""
@@ -20,133 +42,155 @@ def init_database():
     if conn:
         try:
             cur = conn.cursor()
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS meteo_data (
-                    id SERIAL PRIMARY KEY,
-                    wsid VARCHAR(50),
-                    datetime VARCHAR(50),
-                    received_at TIMESTAMP,
-                    relative_pressure FLOAT,
-                    absolute_pressure FLOAT,
-                    indoor_temp FLOAT,
-                    indoor_humidity INTEGER,
-                    console_battery INTEGER,
-                    outdoor_temp FLOAT,
-                    outdoor_humidity INTEGER,
-                    feels_like FLOAT,
-                    wind_chill FLOAT,
-                    heat_index FLOAT,
-                    dew_point FLOAT,
-                    wind_direction INTEGER,
-                    wind_speed FLOAT,
-                    wind_speed_10min_avg FLOAT,
-                    wind_gust FLOAT,
-                    rain_rate FLOAT,
-                    rain_hourly FLOAT,
-                    rain_daily FLOAT,
-                    rain_weekly FLOAT,
-                    rain_monthly FLOAT,
-                    rain_yearly FLOAT,
-                    uv_index FLOAT,
-                    solar_radiation FLOAT,
-                    wbgt_temp FLOAT,
-                    outdoor_battery INTEGER,
-                    outdoor_connection INTEGER,
-                    lightning_last_strike_time INTEGER,
-                    lightning_distance_km INTEGER,
-                    lightning_strikes_1hour INTEGER,
-                    lightning_count_5min INTEGER,
-                    lightning_count_30min INTEGER,
-                    lightning_count_1hour INTEGER,
-                    lightning_count_1day INTEGER,
-                    lightning_battery INTEGER,
-                    lightning_connection INTEGER,
-                    ch1_temp FLOAT,
-                    ch1_humidity INTEGER,
-                    ch1_battery INTEGER,
-                    ch1_connection INTEGER,
-                    ch1_type INTEGER,
-                    ch2_temp FLOAT,
-                    ch2_humidity INTEGER,
-                    ch2_battery INTEGER,
-                    ch2_connection INTEGER,
-                    ch2_type INTEGER,
-                    soil_temp FLOAT,
-                    soil_humidity INTEGER,
-                    soil_battery INTEGER,
-                    soil_connection INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            cur.execute(create_table_sql())
+            # Starší tabulky nemusí mít sloupce přidané později (kanály 3-7)
+            cur.execute(add_missing_columns_sql())
             conn.commit()
+            # Migrace přestavující meteo_data i s daty se spouští zvlášť (python migrations.py)
+            migrate(conn)
             cur.close()
-            print("✅ Database table created/verified")
+            log.info("✅ Database table created/verified")
+            maintain_partitions(conn)
+            start_partition_maintenance()
+            hot_window.load()
         except Exception as e:
-            print(f"❌ Database error: {e}")
+            log.exception(f"❌ Database error: {e}")
         finally:
-            conn.close()
+            release_db_connection(conn)
+
+# static/ obsluhuje dashboard_asset s otisky a předkomprimací, ne výchozí /static
+app = Flask(__name__, static_folder=None)
+dashboard_assets = AssetBundle()
+# Časy v odpovědích jako epoch milisekundy
+app.json = ApiJSONProvider(app)
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
 
-app = Flask(__name__)
+@app.after_request
+def observe_request(response):
+    """Doba požadavku do /metrics (u streamovaných odpovědí jen do prvního bajtu)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method, response.status_code)
+    return response
 
-# Soubor pro ukládání dat
+@app.after_request
+def compress(response):
+    """gzip/brotli podle Accept-Encoding (streamované odpovědi se nekomprimují)"""
+    return compress_response(response, request.accept_encodings)
+
+# Starý soubor s daty - při prvním spuštění bez DB se převezme do lokálního úložiště
 DATA_FILE = 'meteo_data.json'
 
-def load_data():
-    """Načte data z databáze"""
-    conn = get_db_connection()
+def load_data(station=None, start=None, end=None, limit=1000, columns=None, before=None, since=None):
+    """Načte data z databáze (nejstarší první)
+
+    Volitelně jen pro jednu stanici, časový rozsah [start, end), posledních
+    `limit` záznamů, vybrané sloupce a jen záznamy starší než kurzor `before`.
+    Se `since` (id nebo čas přijetí) vrátí prvních `limit` novějších záznamů.
+    """
+    sql, params = build_data_query(station, start, end, limit, columns, before,
+                                   ascending=since is not None,
+                                   after_id=since if isinstance(since, int) else None,
+                                   after_time=since if isinstance(since, datetime) else None)
+    with timer('db_connect'):
+        conn = get_db_connection()
     if conn:
         try:
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM meteo_data ORDER BY created_at DESC LIMIT 1000")
-            rows = cur.fetchall()
-            cur.close()
-            conn.close()
+            with timer('query'):
+                cur = conn.cursor(cursor_factory=RealDictCursor)
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+                cur.close()
+            release_db_connection(conn)
             
             # Převedení na seznam slovníků
             data = []
             for row in rows:
                 data.append(dict(row))
             
-            return list(reversed(data))  # Nejstarší první
+            return data if since is not None else list(reversed(data))  # Nejstarší první
         except Exception as e:
-            print(f"❌ Error loading data: {e}")
-            conn.close()
+            log.error(f"❌ Error loading data: {e}")
+            release_db_connection(conn)
     
-    # Fallback na JSON soubor
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return []
-    return []
+    # Fallback na lokální úložiště
+    return load_local_data(station, start, end, limit, columns, before, since)
+
+def load_recent(station=None, start=None, end=None, limit=1000, columns=None, before=None, since=None):
+    """load_data, které nejdřív zkusí okno posledních dat v paměti (hotwindow.py)"""
+    data = hot_window.select(station, start, end, limit, columns, before, since, newest=data_version())
+    if data is not None:
+        return data
+    return load_data(station, start, end, limit, columns, before, since)
+
+def load_local_data(station=None, start=None, end=None, limit=None, columns=None, before=None, since=None):
+    """Stejný výběr jako build_data_query, ale z lokálního úložiště"""
+    store = get_local_store(DATA_FILE)
+    if before:
+        # Lokální záznamy nemají id - kurzor tu určuje jen čas přijetí
+        end = before[0] if end is None else min(end, before[0])
+    if isinstance(since, datetime):
+        newer = (r for r in store.scan(station, max(start, since) if start else since, end)
+                 if as_timestamp(r['received_at']) > since)
+        data = list(islice(newer, limit) if limit else newer)
+    elif since is not None:
+        # Id mají jen záznamy z databáze
+        data = []
+    elif start is None:
+        # Posledních N záznamů - čteme od konce
+        newest = store.tail(station, end)
+        data = list(islice(newest, limit) if limit else newest)
+        data.reverse()
+    else:
+        data = store.scan(station, start, end)
+        data = list(deque(data, maxlen=limit) if limit else data)
+    # Časy jsou v souboru jako text - vrátíme je stejně jako z databáze
+    data = [with_timestamps(r) for r in data]
+    if columns:
+        data = [{c: r.get(c) for c in columns} for r in data]
+    return data
+
+def load_latest(station=None):
+    """Poslední záznam stanice z okna posledních dat nebo z DB - studený start cache nejnovějších dat"""
+    latest = hot_window.latest(station)
+    if latest is not None:
+        return latest
+    data = load_data(station, limit=1)
+    return data[-1] if data else None
+
+latest_readings = LatestReadings(load_latest)
 
 def save_data_to_db(weather_data):
     """Uloží data do databáze"""
-    conn = get_db_connection()
+    with timer('db_connect'):
+        conn = get_db_connection()
     if conn:
         try:
             cur = conn.cursor()
-            
-            # Připravení dat pro insert
-            columns = list(weather_data.keys())
-            values = list(weather_data.values())
-            
-            # SQL pro insert
-            sql = f"""
-                INSERT INTO meteo_data ({', '.join(columns)}) 
-                VALUES ({', '.join(['%s'] * len(values))})
-            """
-            
-            cur.execute(sql, values)
-            conn.commit()
+            with timer('insert'):
+                inserted = insert_record(cur, weather_data)
+                if inserted is not None:
+                    record_id, created_at = inserted
+                    weather_data = dict(weather_data, id=record_id, created_at=created_at)
+                    update_rollups(cur, [weather_data])
+                    notify(cur, [weather_data])
+            with timer('commit'):
+                conn.commit()
             cur.close()
-            conn.close()
-            print("✅ Data saved to database")
+            release_db_connection(conn)
+            if inserted is None:
+                log.debug("Duplicate upload skipped", extra={'wsid': weather_data.get('wsid')})
+            else:
+                hot_window.add([weather_data])
+                log.debug("✅ Data saved to database", extra={'id': record_id})
             return True
         except Exception as e:
-            print(f"❌ Database save error: {e}")
-            conn.close()
+            log.error(f"❌ Database save error: {e}", extra={'wsid': weather_data.get('wsid')})
+            release_db_connection(conn)
     return False
 
 def save_data(data):
@@ -154,903 +198,384 @@ def save_data(data):
     if data and len(data) > 0:
         latest_data = data[-1]
         if not save_data_to_db(latest_data):
-            # Fallback na JSON
+            # Fallback na lokální úložiště
             try:
-                with open(DATA_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
+                get_local_store(DATA_FILE).append(latest_data)
             except Exception as e:
-                print(f"❌ JSON save error: {e}")
+                log.error(f"❌ Local store save error: {e}")
 
 @app.route('/data/upload.php', methods=['GET'])
 def receive_weather_data():
     """Endpoint pro příjem dat z meteostanice"""
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Přijaty parametry", extra={'params': dict(request.args)})
+
+    with timer('parse'):
+        weather_data = parse_wslink(request.args)
+
+    # Opakovaný upload, který už je uložený, jen potvrdíme (dedup.py)
+    key = record_key(weather_data)
+    if recent_uploads.seen(key):
+        return "OK", 200
     
-    print(f"Přijaty parametry: {dict(request.args)}")
-    
-    # Získání všech parametrů
-    weather_data = {}
-    
-    # Základní informace
-    weather_data['wsid'] = request.args.get('wsid', 'unknown')
-    weather_data['datetime'] = request.args.get('datetime', datetime.now().isoformat())
-    weather_data['received_at'] = datetime.now().isoformat()
-    
-    # Tlak
-    weather_data['relative_pressure'] = request.args.get('rbar', type=float)
-    weather_data['absolute_pressure'] = request.args.get('abar', type=float)
-    
-    # Vnitřní senzory
-    weather_data['indoor_temp'] = request.args.get('intem', type=float)
-    weather_data['indoor_humidity'] = request.args.get('inhum', type=int)
-    weather_data['console_battery'] = request.args.get('inbat', type=int)
-    
-    # Venkovní senzory (Type1)
-    weather_data['outdoor_temp'] = request.args.get('t1tem', type=float)
-    weather_data['outdoor_humidity'] = request.args.get('t1hum', type=int)
-    weather_data['feels_like'] = request.args.get('t1feels', type=float)
-    weather_data['wind_chill'] = request.args.get('t1chill', type=float)
-    weather_data['heat_index'] = request.args.get('t1heat', type=float)
-    weather_data['dew_point'] = request.args.get('t1dew', type=float)
-    
-    # Vítr
-    weather_data['wind_direction'] = request.args.get('t1wdir', type=int)
-    weather_data['wind_speed'] = request.args.get('t1ws', type=float)
-    weather_data['wind_speed_10min_avg'] = request.args.get('t1ws10mav', type=float)
-    weather_data['wind_gust'] = request.args.get('t1wgust', type=float)
-    
-    # Déšť
-    weather_data['rain_rate'] = request.args.get('t1rainra', type=float)
-    weather_data['rain_hourly'] = request.args.get('t1rainhr', type=float)
-    weather_data['rain_daily'] = request.args.get('t1raindy', type=float)
-    weather_data['rain_weekly'] = request.args.get('t1rainwy', type=float)
-    weather_data['rain_monthly'] = request.args.get('t1rainmth', type=float)
-    weather_data['rain_yearly'] = request.args.get('t1rainyr', type=float)
-    
-    # Ostatní
-    weather_data['uv_index'] = request.args.get('t1uvi', type=float)
-    weather_data['solar_radiation'] = request.args.get('t1solrad', type=float)
-    weather_data['wbgt_temp'] = request.args.get('t1wbgt', type=float)
-    weather_data['outdoor_battery'] = request.args.get('t1bat', type=int)
-    weather_data['outdoor_connection'] = request.args.get('t1cn', type=int)
-    
-    # Lightning Sensor (Type5)
-    weather_data['lightning_last_strike_time'] = request.args.get('t5lst', type=int)
-    weather_data['lightning_distance_km'] = request.args.get('t5lskm', type=int)
-    weather_data['lightning_strikes_1hour'] = request.args.get('t5lsf', type=int)
-    weather_data['lightning_count_5min'] = request.args.get('t5ls5mtc', type=int)
-    weather_data['lightning_count_30min'] = request.args.get('t5ls30mtc', type=int)
-    weather_data['lightning_count_1hour'] = request.args.get('t5ls1htc', type=int)
-    weather_data['lightning_count_1day'] = request.args.get('t5ls1dtc', type=int)
-    weather_data['lightning_battery'] = request.args.get('t5lsbat', type=int)
-    weather_data['lightning_connection'] = request.args.get('t5lscn', type=int)
-    
-    # Dodatečné senzory (Type2,3,4) - prvních 7 kanálů
-    # Kanál 2 je obvykle půdní teplota a vlhkost
-    for i in range(1, 8):
-        temp_key = f't234c{i}tem'
-        hum_key = f't234c{i}hum'
-        bat_key = f't234c{i}bat'
-        cn_key = f't234c{i}cn'
-        tp_key = f't234c{i}tp'
-        
-        if request.args.get(temp_key):
-            weather_data[f'ch{i}_temp'] = request.args.get(temp_key, type=float)
-            weather_data[f'ch{i}_humidity'] = request.args.get(hum_key, type=int)
-            weather_data[f'ch{i}_battery'] = request.args.get(bat_key, type=int)
-            weather_data[f'ch{i}_connection'] = request.args.get(cn_key, type=int)
-            weather_data[f'ch{i}_type'] = request.args.get(tp_key, type=int)
-            
-            # Specifické označení pro kanál 2 (půdní senzory)
-            if i == 2:
-                weather_data['soil_temp'] = request.args.get(temp_key, type=float)
-                weather_data['soil_humidity'] = request.args.get(hum_key, type=int)
-                weather_data['soil_battery'] = request.args.get(bat_key, type=int)
-                weather_data['soil_connection'] = request.args.get(cn_key, type=int)
-    
-    # Uložení dat
-save_data_to_db(weather_data)
+    # Uložení dat - při dávkovém zápisu jen zařadíme do fronty a hned odpovíme
+    ingest_buffer = get_ingest_buffer()
+    if ingest_buffer:
+        ingest_buffer.add(weather_data)
+    else:
+        save_data([weather_data])
+    recent_uploads.remember(key)
+    latest_readings.update(weather_data)
+    if not os.environ.get('DATABASE_URL'):
+        # S databází záznam rozešle NOTIFY po commitu
+        live_feed.publish_local(encode_event(weather_data))
     
-    print(f"Přijata data v {datetime.now()}: Lightning: {weather_data.get('lightning_connection', 'N/A')}, Soil: {weather_data.get('soil_temp', 'N/A')}°C")
+    log.info("Přijata data", extra=sampled(wsid=weather_data.get('wsid'),
+                                          lightning=weather_data.get('lightning_connection'),
+                                          soil_temp=weather_data.get('soil_temp')))
     
     return "OK", 200
 
 @app.route('/')
 def dashboard():
-    """Hlavní stránka s přehledem dat"""
-    
-    html_template = """
-    <!DOCTYPE html>
-    <html lang="cs">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Meteostanice Dashboard</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                margin: 0;
-                padding: 20px;
-                background-color: #f5f5f5;
-            }
-            .container {
-                max-width: 1200px;
-                margin: 0 auto;
-            }
-            .header {
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 20px;
-                border-radius: 10px;
-                text-align: center;
-                margin-bottom: 20px;
-            }
-            .nav-tabs {
-                display: flex;
-                background: white;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                margin-bottom: 20px;
-                overflow: hidden;
-            }
-            .nav-tab {
-                flex: 1;
-                padding: 15px 20px;
-                background: white;
-                border: none;
-                cursor: pointer;
-                font-size: 16px;
-                transition: all 0.3s;
-                border-bottom: 3px solid transparent;
-            }
-            .nav-tab:hover {
-                background: #f8f9ff;
-            }
-            .nav-tab.active {
-                background: #667eea;
-                color: white;
-                border-bottom: 3px solid #4c51bf;
-            }
-            .tab-content {
-                display: none;
-            }
-            .tab-content.active {
-                display: block;
-            }
-            .grid {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-                gap: 20px;
-                margin-bottom: 20px;
-            }
-            .card {
-                background: white;
-                padding: 20px;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }
-            .card h3 {
-                margin-top: 0;
-                color: #333;
-                border-bottom: 2px solid #667eea;
-                padding-bottom: 10px;
-            }
-            .value {
-                font-size: 24px;
-                font-weight: bold;
-                color: #667eea;
-                margin: 10px 0;
-            }
-            .unit {
-                font-size: 14px;
-                color: #666;
-                font-weight: normal;
-            }
-            .status {
-                padding: 5px 10px;
-                border-radius: 20px;
-                font-size: 12px;
-                font-weight: bold;
-            }
-            .status.ok {
-                background-color: #d4edda;
-                color: #155724;
-            }
-            .status.warning {
-                background-color: #fff3cd;
-                color: #856404;
-            }
-            .status.error {
-                background-color: #f8d7da;
-                color: #721c24;
-            }
-            .last-update {
-                text-align: center;
-                color: #666;
-                margin-top: 20px;
-            }
-            .refresh-btn {
-                background: #667eea;
-                color: white;
-                border: none;
-                padding: 10px 20px;
-                border-radius: 5px;
-                cursor: pointer;
-                margin: 10px;
-            }
-            .refresh-btn:hover {
-                background: #5a67d8;
-            }
-            .lightning-warning {
-                background-color: #fff3cd;
-                border: 2px solid #ffc107;
-                border-radius: 5px;
-                padding: 10px;
-                margin: 10px 0;
-            }
-            .history-table {
-                width: 100%;
-                border-collapse: collapse;
-                background: white;
-                border-radius: 10px;
-                overflow: hidden;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }
-            .history-table th,
-            .history-table td {
-                padding: 12px;
-                text-align: left;
-                border-bottom: 1px solid #ddd;
-            }
-            .history-table th {
-                background: #667eea;
-                color: white;
-                font-weight: bold;
-            }
-            .history-table tr:nth-child(even) {
-                background-color: #f8f9ff;
-            }
-            .history-table tr:hover {
-                background-color: #e8ebff;
-            }
-            .filter-controls {
-                background: white;
-                padding: 20px;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                margin-bottom: 20px;
-                display: flex;
-                gap: 15px;
-                align-items: center;
-                flex-wrap: wrap;
-            }
-            .filter-controls select,
-            .filter-controls input {
-                padding: 8px 12px;
-                border: 1px solid #ddd;
-                border-radius: 5px;
-                font-size: 14px;
-            }
-            .filter-controls button {
-                background: #667eea;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 5px;
-                cursor: pointer;
-            }
-            .stats-grid {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 15px;
-                margin-bottom: 20px;
-            }
-            .stat-card {
-                background: white;
-                padding: 15px;
-                border-radius: 8px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-                text-align: center;
-            }
-            .stat-value {
-                font-size: 20px;
-                font-weight: bold;
-                color: #667eea;
-            }
-            .stat-label {
-                font-size: 12px;
-                color: #666;
-                margin-top: 5px;
-            }
-            .loading {
-                text-align: center;
-                padding: 40px;
-                color: #666;
-            }
-            .export-btn {
-                background: #28a745;
-                color: white;
-                border: none;
-                padding: 8px 16px;
-                border-radius: 5px;
-                cursor: pointer;
-                text-decoration: none;
-                display: inline-block;
-            }
-            .export-btn:hover {
-                background: #218838;
-            }
-        </style>
-        <script>
-            let allData = [];
-            
-            function showTab(tabName) {
-                // Hide all tabs
-                document.querySelectorAll('.tab-content').forEach(tab => {
-                    tab.classList.remove('active');
-                });
-                document.querySelectorAll('.nav-tab').forEach(tab => {
-                    tab.classList.remove('active');
-                });
-                
-                // Show selected tab
-                document.getElementById(tabName).classList.add('active');
-                document.querySelector(`[onclick="showTab('${tabName}')"]`).classList.add('active');
-                
-                if (tabName === 'history') {
-                    loadHistoryData();
-                } else if (tabName === 'stats') {
-                    loadStatsData();
-                }
-            }
-            
-            function refreshData() {
-                if (document.getElementById('current').classList.contains('active')) {
-                    loadCurrentData();
-                } else if (document.getElementById('history').classList.contains('active')) {
-                    loadHistoryData();
-                } else if (document.getElementById('stats').classList.contains('active')) {
-                    loadStatsData();
-                }
-            }
-            
-            async function loadCurrentData() {
-                try {
-                    const response = await fetch('/api/data');
-                    const data = await response.json();
-                    allData = data;
-                    
-                    if (data.length === 0) {
-                        document.getElementById('current-content').innerHTML = `
-                            <div class="card">
-                                <h3>Žádná data</h3>
-                                <p>Zatím nebyla přijata žádná data z meteostanice.</p>
-                                <p>Zkontroluj nastavení v aplikaci WSLink:</p>
-                                <ul>
-                                    <li>URL: https://[IP_ADRESA_TOHOTO_SERVERU]:8000/data/upload.php</li>
-                                    <li>ID meteostanice: libovolné</li>
-                                    <li>Heslo: libovolné</li>
-                                </ul>
-                            </div>
-                        `;
-                        return;
-                    }
-                    
-                    const latest = data[data.length - 1];
-                    
-                    let html = '<div class="grid">';
-                    
-                    // Základní informace
-                    html += `
-                        <div class="card">
-                            <h3>📊 Základní informace</h3>
-                            <div><strong>ID stanice:</strong> ${latest.wsid || 'N/A'}</div>
-                            <div><strong>Posledních záznamů:</strong> ${data.length}</div>
-                            <div><strong>Připojení:</strong> 
-                                <span class="status ${latest.outdoor_connection ? 'ok' : 'error'}">
-                                    ${latest.outdoor_connection ? 'Připojeno' : 'Odpojeno'}
-                                </span>
-                            </div>
-                        </div>
-                    `;
-                    
-                    // Teploty
-                    html += `
-                        <div class="card">
-                            <h3>🌡️ Teploty</h3>
-                            ${latest.outdoor_temp !== null ? `<div class="value">${latest.outdoor_temp}°C <span class="unit">venkovní</span></div>` : ''}
-                            ${latest.indoor_temp !== null ? `<div class="value">${latest.indoor_temp}°C <span class="unit">vnitřní</span></div>` : ''}
-                            ${latest.soil_temp !== null ? `<div class="value">${latest.soil_temp}°C <span class="unit">půdní</span></div>` : ''}
-                            ${latest.feels_like !== null ? `<div>Pocitová: ${latest.feels_like}°C</div>` : ''}
-                            ${latest.dew_point !== null ? `<div>Rosný bod: ${latest.dew_point}°C</div>` : ''}
-                        </div>
-                    `;
-                    
-                    // Vlhkost
-                    html += `
-                        <div class="card">
-                            <h3>💧 Vlhkost</h3>
-                            ${latest.outdoor_humidity !== null ? `<div class="value">${latest.outdoor_humidity}% <span class="unit">venkovní</span></div>` : ''}
-                            ${latest.indoor_humidity !== null ? `<div class="value">${latest.indoor_humidity}% <span class="unit">vnitřní</span></div>` : ''}
-                            ${latest.soil_humidity !== null ? `<div class="value">${latest.soil_humidity}% <span class="unit">půdní</span></div>` : ''}
-                        </div>
-                    `;
-                    
-                    // Tlak
-                    html += `
-                        <div class="card">
-                            <h3>🌪️ Atmosférický tlak</h3>
-                            ${latest.relative_pressure !== null ? `<div class="value">${latest.relative_pressure} <span class="unit">hPa relativní</span></div>` : ''}
-                            ${latest.absolute_pressure !== null ? `<div class="value">${latest.absolute_pressure} <span class="unit">hPa absolutní</span></div>` : ''}
-                        </div>
-                    `;
-                    
-                    // Vítr
-                    html += `
-                        <div class="card">
-                            <h3>🌪️ Vítr</h3>
-                            ${latest.wind_speed !== null ? `<div class="value">${latest.wind_speed} <span class="unit">m/s rychlost</span></div>` : ''}
-                            ${latest.wind_gust !== null ? `<div>Náraz: ${latest.wind_gust} m/s</div>` : ''}
-                            ${latest.wind_direction !== null ? `<div>Směr: ${latest.wind_direction}°</div>` : ''}
-                            ${latest.wind_speed_10min_avg !== null ? `<div>Průměr 10min: ${latest.wind_speed_10min_avg} m/s</div>` : ''}
-                        </div>
-                    `;
-                    
-                    // Déšť
-                    html += `
-                        <div class="card">
-                            <h3>🌧️ Srážky</h3>
-                            ${latest.rain_rate !== null ? `<div class="value">${latest.rain_rate} <span class="unit">mm/h intenzita</span></div>` : ''}
-                            ${latest.rain_daily !== null ? `<div>Dnes: ${latest.rain_daily} mm</div>` : ''}
-                            ${latest.rain_hourly !== null ? `<div>Hodinové: ${latest.rain_hourly} mm</div>` : ''}
-                            ${latest.rain_monthly !== null ? `<div>Měsíční: ${latest.rain_monthly} mm</div>` : ''}
-                        </div>
-                    `;
-                    
-                    // Blesky
-                    if (latest.lightning_connection) {
-                        html += `
-                            <div class="card">
-                                <h3>⚡ Detekce blesků</h3>
-                                <div><strong>Připojení:</strong> 
-                                    <span class="status ${latest.lightning_connection ? 'ok' : 'error'}">
-                                        ${latest.lightning_connection ? 'Aktivní' : 'Neaktivní'}
-                                    </span>
-                                </div>
-                                ${latest.lightning_distance_km !== null ? `<div class="value">${latest.lightning_distance_km} <span class="unit">km vzdálenost</span></div>` : ''}
-                                ${latest.lightning_strikes_1hour !== null ? `<div>Úderů za hodinu: ${latest.lightning_strikes_1hour}</div>` : ''}
-                                ${latest.lightning_count_5min !== null ? `<div>Za 5 min: ${latest.lightning_count_5min}</div>` : ''}
-                                ${latest.lightning_count_30min !== null ? `<div>Za 30 min: ${latest.lightning_count_30min}</div>` : ''}
-                                ${latest.lightning_battery !== null ? `<div>Baterie: ${latest.lightning_battery}%</div>` : ''}
-                            </div>
-                        `;
-                    }
-                    
-                    // UV a sluneční záření
-                    if (latest.uv_index !== null || latest.solar_radiation !== null) {
-                        html += `
-                            <div class="card">
-                                <h3>☀️ UV & Sluneční záření</h3>
-                                ${latest.uv_index !== null ? `<div class="value">${latest.uv_index} <span class="unit">UV index</span></div>` : ''}
-                                ${latest.solar_radiation !== null ? `<div class="value">${latest.solar_radiation} <span class="unit">W/m² sluneční záření</span></div>` : ''}
-                            </div>
-                        `;
-                    }
-                    
-                    html += '</div>';
-                    
-                    // Poslední aktualizace
-                    html += `
-                        <div class="last-update">
-                            Poslední aktualizace: ${new Date(latest.received_at).toLocaleString('cs-CZ')}
-                        </div>
-                    `;
-                    
-                    document.getElementById('current-content').innerHTML = html;
-                    
-                } catch (error) {
-                    console.error('Chyba při načítání dat:', error);
-                    document.getElementById('current-content').innerHTML = `
-                        <div class="card">
-                            <h3>Chyba</h3>
-                            <p>Nepodařilo se načíst data. Zkus obnovit stránku.</p>
-                        </div>
-                    `;
-                }
-            }
-            
-            async function loadHistoryData() {
-                try {
-                    document.getElementById('history-content').innerHTML = '<div class="loading">Načítám historická data...</div>';
-                    
-                    const response = await fetch('/api/data');
-                    const data = await response.json();
-                    allData = data;
-                    
-                    if (data.length === 0) {
-                        document.getElementById('history-content').innerHTML = `
-                            <div class="card">
-                                <h3>Žádná data</h3>
-                                <p>Zatím nebyla přijata žádná data z meteostanice.</p>
-                            </div>
-                        `;
-                        return;
-                    }
-                    
-                    const recordCount = document.getElementById('recordCount').value;
-                    let displayData = data;
-                    
-                    if (recordCount !== 'all') {
-                        displayData = data.slice(-parseInt(recordCount));
-                    }
-                    
-                    let html = `
-                        <div style="overflow-x: auto;">
-                            <table class="history-table">
-                                <thead>
-                                    <tr>
-                                        <th>Čas</th>
-                                        <th>Teplota (°C)</th>
-                                        <th>Vlhkost (%)</th>
-                                        <th>Tlak (hPa)</th>
-                                        <th>Vítr (m/s)</th>
-                                        <th>Déšť (mm)</th>
-                                        <th>UV index</th>
-                                        <th>Blesky</th>
-                                    </tr>
-                                </thead>
-                                <tbody>
-                    `;
-                    
-                    displayData.reverse().forEach(record => {
-                        const time = new Date(record.received_at).toLocaleString('cs-CZ');
-                        html += `
-                            <tr>
-                                <td>${time}</td>
-                                <td>${record.outdoor_temp !== null ? record.outdoor_temp : '-'}</td>
-                                <td>${record.outdoor_humidity !== null ? record.outdoor_humidity : '-'}</td>
-                                <td>${record.relative_pressure !== null ? record.relative_pressure : '-'}</td>
-                                <td>${record.wind_speed !== null ? record.wind_speed : '-'}</td>
-                                <td>${record.rain_rate !== null ? record.rain_rate : '-'}</td>
-                                <td>${record.uv_index !== null ? record.uv_index : '-'}</td>
-                                <td>${record.lightning_distance_km !== null ? record.lightning_distance_km + ' km' : '-'}</td>
-                            </tr>
-                        `;
-                    });
-                    
-                    html += `
-                                </tbody>
-                            </table>
-                        </div>
-                    `;
-                    
-                    document.getElementById('history-content').innerHTML = html;
-                    
-                } catch (error) {
-                    console.error('Chyba při načítání historie:', error);
-                    document.getElementById('history-content').innerHTML = `
-                        <div class="card">
-                            <h3>Chyba</h3>
-                            <p>Nepodařilo se načíst historická data.</p>
-                        </div>
-                    `;
-                }
-            }
-            
-            async function loadStatsData() {
-                try {
-                    document.getElementById('stats-content').innerHTML = '<div class="loading">Počítám statistiky...</div>';
-                    
-                    const response = await fetch('/api/data');
-                    const data = await response.json();
-                    
-                    if (data.length === 0) {
-                        document.getElementById('stats-content').innerHTML = `
-                            <div class="card">
-                                <h3>Žádná data</h3>
-                                <p>Zatím nebyla přijata žádná data pro statistiky.</p>
-                            </div>
-                        `;
-                        return;
-                    }
-                    
-                    // Výpočet statistik
-                    const stats = calculateStats(data);
-                    
-                    let html = `
-                        <div class="stats-grid">
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.temp.min}°C</div>
-                                <div class="stat-label">Min. teplota</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.temp.max}°C</div>
-                                <div class="stat-label">Max. teplota</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.temp.avg}°C</div>
-                                <div class="stat-label">Průměr teplota</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.humidity.min}%</div>
-                                <div class="stat-label">Min. vlhkost</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.humidity.max}%</div>
-                                <div class="stat-label">Max. vlhkost</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.humidity.avg}%</div>
-                                <div class="stat-label">Průměr vlhkost</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.pressure.min}</div>
-                                <div class="stat-label">Min. tlak (hPa)</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.pressure.max}</div>
-                                <div class="stat-label">Max. tlak (hPa)</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.pressure.avg}</div>
-                                <div class="stat-label">Průměr tlak (hPa)</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.wind.max}</div>
-                                <div class="stat-label">Max. vítr (m/s)</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.wind.avg}</div>
-                                <div class="stat-label">Průměr vítr (m/s)</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-value">${stats.rain.total}</div>
-                                <div class="stat-label">Celkem déšť (mm)</div>
-                            </div>
-                        </div>
-                        
-                        <div class="card">
-                            <h3>📊 Přehled za posledních 24 hodin</h3>
-                            <div class="grid">
-                                <div>
-                                    <strong>Celkem záznamů:</strong> ${data.length}<br>
-                                    <strong>První záznam:</strong> ${new Date(data[0].received_at).toLocaleString('cs-CZ')}<br>
-                                    <strong>Poslední záznam:</strong> ${new Date(data[data.length-1].received_at).toLocaleString('cs-CZ')}
-                                </div>
-                                <div>
-                                    <strong>Aktivní senzory:</strong><br>
-                                    ${stats.sensors.outdoor ? '✅ Venkovní senzor' : '❌ Venkovní senzor'}<br>
-                                    ${stats.sensors.indoor ? '✅ Vnitřní senzor' : '❌ Vnitřní senzor'}<br>
-                                    ${stats.sensors.soil ? '✅ Půdní senzor' : '❌ Půdní senzor'}<br>
-                                    ${stats.sensors.lightning ? '✅ Detektor blesků' : '❌ Detektor blesků'}
-                                </div>
-                            </div>
-                        </div>
-                    `;
-                    
-                    document.getElementById('stats-content').innerHTML = html;
-                    
-                } catch (error) {
-                    console.error('Chyba při načítání statistik:', error);
-                    document.getElementById('stats-content').innerHTML = `
-                        <div class="card">
-                            <h3>Chyba</h3>
-                            <p>Nepodařilo se načíst statistiky.</p>
-                        </div>
-                    `;
-                }
-            }
-            
-            function calculateStats(data) {
-                const stats = {
-                    temp: { min: null, max: null, avg: null, values: [] },
-                    humidity: { min: null, max: null, avg: null, values: [] },
-                    pressure: { min: null, max: null, avg: null, values: [] },
-                    wind: { min: null, max: null, avg: null, values: [] },
-                    rain: { total: 0, values: [] },
-                    sensors: {
-                        outdoor: false,
-                        indoor: false,
-                        soil: false,
-                        lightning: false
-                    }
-                };
-                
-                data.forEach(record => {
-                    // Teplota
-                    if (record.outdoor_temp !== null) {
-                        stats.temp.values.push(record.outdoor_temp);
-                        stats.sensors.outdoor = true;
-                    }
-                    
-                    // Vlhkost
-                    if (record.outdoor_humidity !== null) {
-                        stats.humidity.values.push(record.outdoor_humidity);
-                    }
-                    
-                    // Tlak
-                    if (record.relative_pressure !== null) {
-                        stats.pressure.values.push(record.relative_pressure);
-                    }
-                    
-                    // Vítr
-                    if (record.wind_speed !== null) {
-                        stats.wind.values.push(record.wind_speed);
-                    }
-                    
-                    // Déšť
-                    if (record.rain_daily !== null) {
-                        stats.rain.values.push(record.rain_daily);
-                    }
-                    
-                    // Senzory
-                    if (record.indoor_temp !== null) stats.sensors.indoor = true;
-                    if (record.soil_temp !== null) stats.sensors.soil = true;
-                    if (record.lightning_connection) stats.sensors.lightning = true;
-                });
-                
-                // Výpočet min/max/avg pro teplotu
-                if (stats.temp.values.length > 0) {
-                    stats.temp.min = Math.min(...stats.temp.values).toFixed(1);
-                    stats.temp.max = Math.max(...stats.temp.values).toFixed(1);
-                    stats.temp.avg = (stats.temp.values.reduce((a, b) => a + b, 0) / stats.temp.values.length).toFixed(1);
-                } else {
-                    stats.temp.min = stats.temp.max = stats.temp.avg = '-';
-                }
-                
-                // Výpočet pro vlhkost
-                if (stats.humidity.values.length > 0) {
-                    stats.humidity.min = Math.min(...stats.humidity.values);
-                    stats.humidity.max = Math.max(...stats.humidity.values);
-                    stats.humidity.avg = Math.round(stats.humidity.values.reduce((a, b) => a + b, 0) / stats.humidity.values.length);
-                } else {
-                    stats.humidity.min = stats.humidity.max = stats.humidity.avg = '-';
-                }
-                
-                // Výpočet pro tlak
-                if (stats.pressure.values.length > 0) {
-                    stats.pressure.min = Math.min(...stats.pressure.values).toFixed(1);
-                    stats.pressure.max = Math.max(...stats.pressure.values).toFixed(1);
-                    stats.pressure.avg = (stats.pressure.values.reduce((a, b) => a + b, 0) / stats.pressure.values.length).toFixed(1);
-                } else {
-                    stats.pressure.min = stats.pressure.max = stats.pressure.avg = '-';
-                }
-                
-                // Výpočet pro vítr
-                if (stats.wind.values.length > 0) {
-                    stats.wind.min = Math.min(...stats.wind.values).toFixed(1);
-                    stats.wind.max = Math.max(...stats.wind.values).toFixed(1);
-                    stats.wind.avg = (stats.wind.values.reduce((a, b) => a + b, 0) / stats.wind.values.length).toFixed(1);
-                } else {
-                    stats.wind.min = stats.wind.max = stats.wind.avg = '-';
-                }
-                
-                // Výpočet pro déšť
-                if (stats.rain.values.length > 0) {
-                    stats.rain.total = Math.max(...stats.rain.values).toFixed(1);
-                } else {
-                    stats.rain.total = '-';
-                }
-                
-                return stats;
-            }
-            
-            function exportData() {
-                if (allData.length === 0) {
-                    alert('Žádná data k exportu');
-                    return;
-                }
-                
-                // Vytvoření CSV
-                let csv = 'Cas,Venkovni_teplota,Venkovni_vlhkost,Vnitrni_teplota,Vnitrni_vlhkost,Relativni_tlak,Absolutni_tlak,Rychlost_vetru,Smer_vetru,Intenzita_deste,Denny_dest,UV_index,Slunecni_zareni,Vzdalenost_blesku\\n';
-                
-                allData.forEach(record => {
-                    csv += [
-                        new Date(record.received_at).toLocaleString('cs-CZ'),
-                        record.outdoor_temp || '',
-                        record.outdoor_humidity || '',
-                        record.indoor_temp || '',
-                        record.indoor_humidity || '',
-                        record.relative_pressure || '',
-                        record.absolute_pressure || '',
-                        record.wind_speed || '',
-                        record.wind_direction || '',
-                        record.rain_rate || '',
-                        record.rain_daily || '',
-                        record.uv_index || '',
-                        record.solar_radiation || '',
-                        record.lightning_distance_km || ''
-                    ].join(',') + '\\n';
-                });
-                
-                // Stažení souboru
-                const blob = new Blob([csv], { type: 'text/csv;charset=utf-8;' });
-                const link = document.createElement('a');
-                const url = URL.createObjectURL(blob);
-                link.setAttribute('href', url);
-                link.setAttribute('download', `meteodata_${new Date().toISOString().split('T')[0]}.csv`);
-                link.style.visibility = 'hidden';
-                document.body.appendChild(link);
-                link.click();
-                document.body.removeChild(link);
-            }
-            
-            // Auto-refresh každých 30 sekund pouze pro aktuální data
-            setInterval(() => {
-                if (document.getElementById('current').classList.contains('active')) {
-                    loadCurrentData();
-                }
-            }, 30000);
-            
-            // Načíst data při načtení stránky
-            window.addEventListener('DOMContentLoaded', () => {
-                loadCurrentData();
-            });
-        </script>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🌤️ Meteostanice Dashboard</h1>
-                <button class="refresh-btn" onclick="refreshData()">🔄 Obnovit data</button>
-            </div>
-            
-            <!-- Navigation tabs -->
-            <div class="nav-tabs">
-                <button class="nav-tab active" onclick="showTab('current')">📊 Aktuální data</button>
-                <button class="nav-tab" onclick="showTab('history')">📋 Historie</button>
-                <button class="nav-tab" onclick="showTab('stats')">📈 Statistiky</button>
-            </div>
-            
-            <!-- Current data tab -->
-            <div id="current" class="tab-content active">
-                <div id="current-content">
-                    <div class="loading">Načítám aktuální data...</div>
-                </div>
-            </div>
-            
-            <!-- History tab -->
-            <div id="history" class="tab-content">
-                <div class="filter-controls">
-                    <label>Zobrazit posledních:</label>
-                    <select id="recordCount" onchange="loadHistoryData()">
-                        <option value="10">10 záznamů</option>
-                        <option value="50" selected>50 záznamů</option>
-                        <option value="100">100 záznamů</option>
-                        <option value="all">Všechny záznamy</option>
-                    </select>
-                    <button class="export-btn" onclick="exportData()">📥 Export CSV</button>
-                </div>
-                <div id="history-content">
-                    <div class="loading">Klikni na záložku Historie pro načtení dat...</div>
-                </div>
-            </div>
-            
-            <!-- Statistics tab -->
-            <div id="stats" class="tab-content">
-                <div id="stats-content">
-                    <div class="loading">Klikni na záložku Statistiky pro načtení dat...</div>
-                </div>
-            </div>
-        </div>
-    </body>
-    </html>
+    """Hlavní stránka s přehledem dat (předem sestavená, viz assets.py)"""
+    return dashboard_assets.page.response(request)
+
+@app.route('/assets/<name>')
+def dashboard_asset(name):
+    """CSS a JS dashboardu; otisknuté názvy se smí cachovat natrvalo"""
+    asset, fingerprinted = dashboard_assets.get(name)
+    if asset is None:
+        return "Not Found", 404
+    return asset.response(request, immutable=fingerprinted)
+
+def parse_time_arg(name, value=None):
+    """Převede ISO čas z parametru dotazu; neplatný formát vyhodí ValueError
+
+    Čas bez časové zóny se bere jako místní čas serveru.
     """
-    
-    return render_template_string(html_template)
+    value = value or request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"invalid '{name}' timestamp: {value}")
+    return as_timestamp(parsed)
+
+def encode_cursor(record):
+    """Kurzor pro další stránku z posledního (nejstaršího) vráceného záznamu"""
+    received_at = record['received_at']
+    if isinstance(received_at, datetime):
+        received_at = received_at.isoformat()
+    raw = json.dumps([received_at, record.get('id')])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(value):
+    """Opak encode_cursor; neplatný kurzor vyhodí ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        received_at, record_id = json.loads(raw)
+        return as_timestamp(received_at), record_id
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError(f"invalid cursor: {value}")
+
+def data_version():
+    """Čas přijetí nejnovějšího záznamu, ze kterého se odvozují ETag a Last-Modified
+
+    Vrací None, dokud má tento proces záznamy ve frontě pro zápis - odpověď
+    z DB by je ještě neobsahovala, a nesmí se proto uložit pod novou verzí.
+    """
+    buffer = get_ingest_buffer()
+    if buffer and buffer.has_pending():
+        return None
+    latest = latest_readings.get()
+    if not latest:
+        return TIMESTAMP_MIN
+    return as_timestamp(latest['received_at'])
+
+def conditional_response(build):
+    """Odpoví 304, pokud klient už má aktuální verzi; jinak zavolá build()
+
+    ETag kombinuje verzi dat s celým dotazem (stanice, limit, fields...).
+    """
+    version = data_version()
+    if version is None:
+        response = build()
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    etag = hashlib.sha1(f'{version.isoformat()}|{request.full_path}'.encode()).hexdigest()[:20]
+    last_modified = None
+    if version != TIMESTAMP_MIN:
+        last_modified = version.astimezone(timezone.utc).replace(microsecond=0)
+
+    if request.if_none_match:
+        unchanged = request.if_none_match.contains_weak(etag)
+    else:
+        unchanged = bool(last_modified and request.if_modified_since
+                         and last_modified <= request.if_modified_since)
+    response = Response(status=304) if unchanged else build()
+    if response.status_code not in (200, 304):
+        return response
+    # Vždy slabý ETag: komprimovaná a nekomprimovaná odpověď nejsou bajtově
+    # shodné a 304 musí nést stejný validátor i Vary jako odpověď 200
+    response.set_etag(etag, weak=True)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    if last_modified:
+        response.last_modified = last_modified
+    # Prohlížeč smí odpověď uložit, ale před použitím se musí zeptat serveru
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/data')
 def get_data():
-    """API endpoint pro získání dat"""
-    data = load_data()
-    return jsonify(data)
+    """API endpoint pro získání dat
+
+    Parametry: station, from, to (ISO čas), limit (max. 1000),
+    fields (čárkami oddělené sloupce; id a received_at se vrací vždy)
+    a cursor z hlavičky X-Next-Cursor předchozí odpovědi pro další, starší stránku.
+
+    S since=<id|ISO čas> vrátí jen záznamy novější než poslední, které klient
+    už má (od nejstaršího). Je-li jich víc než limit, hlavička X-Next-Since
+    obsahuje hodnotu pro další dotaz.
+
+    format=columns vrátí sloupcový JSON (viz responses.columnar), format=msgpack
+    totéž v MessagePack. Časy (received_at, datetime) jsou epoch milisekundy.
+    """
+    data_format = request.args.get('format', 'rows')
+    if data_format not in ('rows', 'columns', 'msgpack'):
+        return jsonify({'error': f"unknown format: {data_format}"}), 400
+    if data_format == 'msgpack' and not msgpack_available():
+        return jsonify({'error': 'msgpack format requires msgpack'}), 501
+
+    try:
+        start = parse_time_arg('from')
+        end = parse_time_arg('to')
+        cursor = request.args.get('cursor')
+        before = decode_cursor(cursor) if cursor else None
+        since = request.args.get('since') or None
+        if since:
+            since = int(since) if since.isdigit() else parse_time_arg('since', since)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if cursor and since:
+        return jsonify({'error': 'cursor and since cannot be combined'}), 400
+
+    columns = None
+    fields = request.args.get('fields')
+    if fields:
+        columns = [c for c in fields.split(',') if c]
+        columns += [c for c in ('id', 'received_at') if c not in columns]
+        unknown = [c for c in columns if c not in QUERYABLE_COLUMNS]
+        if unknown:
+            return jsonify({'error': f"unknown fields: {', '.join(unknown)}"}), 400
+
+    limit = max(1, min(request.args.get('limit', 1000, type=int), 1000))
+
+    def build():
+        data = load_recent(request.args.get('station'), start, end, limit, columns, before, since)
+        with timer('serialize'):
+            if data_format == 'columns':
+                response = jsonify(columnar(data))
+            elif data_format == 'msgpack':
+                response = Response(pack(columnar(data)), mimetype='application/msgpack')
+            else:
+                response = jsonify(data)
+        if len(data) == limit and since:
+            newest = data[-1]
+            # Záznamy z lokálního úložiště nemají id, jen čas přijetí
+            response.headers['X-Next-Since'] = str(newest.get('id') or newest['received_at'].isoformat())
+        elif len(data) == limit:
+            response.headers['X-Next-Cursor'] = encode_cursor(data[0])
+        return response
+
+    return conditional_response(build)
+
+def parse_period(value):
+    """'24h', '7d' apod. na timedelta; neplatná hodnota vyhodí ValueError"""
+    match = re.fullmatch(r'(\d+)([hd])', value or '')
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"invalid period: {value}")
+    amount = int(match.group(1))
+    return timedelta(hours=amount) if match.group(2) == 'h' else timedelta(days=amount)
+
+def load_stats(resolution, start, station=None):
+    """Sečte průběžné agregace od `start` (bez DB spočítá statistiky ze souboru)"""
+    conn = get_db_connection()
+    if conn:
+        try:
+            sql, params = stats_query(resolution, start, station)
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute(sql, params)
+            row = cur.fetchone()
+            cur.close()
+            release_db_connection(conn)
+            return format_stats(row)
+        except Exception as e:
+            log.error(f"❌ Error loading stats: {e}")
+            release_db_connection(conn)
+            return None
+    return format_stats(summarize(load_local_data(station, start)))
+
+@app.route('/api/stats')
+def get_stats():
+    """API endpoint se statistikami za období (?period=24h, ?station=)
+
+    Odpovídá z minutových, hodinových nebo denních agregací podle délky
+    období, takže cena nezávisí na délce historie.
+    """
+    period = request.args.get('period', '24h')
+    try:
+        span = parse_period(period)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    resolution = resolution_for(span)
+    start = bucket_start(datetime.now() - span, resolution)
+    station = request.args.get('station')
+    # Krátká období spočítá okno posledních dat v paměti, delší agregace v DB
+    summary = hot_window.summary(start, station, newest=data_version())
+    stats = format_stats(summary) if summary is not None else load_stats(resolution, start, station)
+    if stats is None:
+        return jsonify({'error': 'statistics are not available'}), 503
+    stats.update(period=period, resolution=resolution, since=start)
+    return jsonify(stats)
+
+def load_series(metric, source, start, end, station=None):
+    """Sloupce řady jako pole (bez DB jen surová data z lokálního úložiště); vrací (zdroj, sloupce)"""
+    with timer('db_connect'):
+        conn = get_db_connection()
+    if conn:
+        try:
+            sql, params = series_query(metric, source, start, end, station)
+            with timer('query'):
+                cur = conn.cursor()
+                cur.execute(sql, params)
+                columns = to_arrays(cur.fetchall(), len(cur.description))
+                cur.close()
+            release_db_connection(conn)
+            return source, raw_series(columns, metric) if source == 'raw' else columns
+        except Exception as e:
+            log.error(f"❌ Error loading series: {e}")
+            release_db_connection(conn)
+            return source, None
+    return 'raw', records_to_arrays(load_local_data(station, start, end), metric)
+
+@app.route('/api/series')
+def get_series():
+    """Časová řada jedné veličiny zmenšená na N bodů pro graf (viz series.py)
+
+    Parametry: metric, station, from, to (ISO čas, výchozí posledních 24 h),
+    points (výchozí SERIES_DEFAULT_POINTS, max. SERIES_MAX_POINTS) a source
+    (raw, minute, hour, day) - bez něj se zdroj vybere podle délky rozsahu.
+    Ze surových dat (i veličiny bez agregací) jen rozsah do SERIES_RAW_MAX_DAYS.
+    """
+    if not series_available():
+        return jsonify({'error': 'series require numpy'}), 501
+    metric = request.args.get('metric')
+    if metric not in SERIES_METRICS:
+        return jsonify({'error': f"unknown metric: {metric}"}), 400
+    try:
+        end = parse_time_arg('to') or datetime.now().astimezone()
+        start = parse_time_arg('from') or end - timedelta(hours=24)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start >= end:
+        return jsonify({'error': "'from' must be before 'to'"}), 400
+
+    points = max(3, min(request.args.get('points', SERIES_DEFAULT_POINTS, type=int), SERIES_MAX_POINTS))
+    source = request.args.get('source') or select_source(metric, end - start, points)
+    if source not in SOURCES:
+        return jsonify({'error': f"unknown source: {source}"}), 400
+    if source != 'raw' and metric not in ROLLUP_METRICS:
+        return jsonify({'error': f"{metric} has no rollups, use source=raw"}), 400
+    if source == 'raw' and end - start > RAW_MAX_SPAN:
+        return jsonify({'error': f"raw series are limited to {RAW_MAX_SPAN.total_seconds() / 86400:g} days"}), 400
+    station = request.args.get('station')
+
+    def build():
+        used, columns = load_series(metric, source, start, end, station)
+        if columns is None:
+            response = jsonify({'error': 'series are not available'})
+            response.status_code = 503
+            return response
+        with timer('serialize'):
+            return jsonify(series_response(downsample(columns, points), metric, used, station, start, end))
+
+    return conditional_response(build)
+
+@app.route('/api/export')
+def export_data():
+    """Streamovaný export dat pro libovolné období a stanici
+
+    Parametry: format (csv, ndjson, parquet), station, from, to (ISO čas),
+    fields (čárkami oddělené sloupce, výchozí všechny).
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"unknown format: {export_format}"}), 400
+    if export_format == 'parquet' and not parquet_available():
+        return jsonify({'error': 'parquet export requires pyarrow'}), 501
+    try:
+        start = parse_time_arg('from')
+        end = parse_time_arg('to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    fields = request.args.get('fields')
+    columns = [c for c in fields.split(',') if c] if fields else list(QUERYABLE_COLUMNS)
+    unknown = [c for c in columns if c not in QUERYABLE_COLUMNS]
+    if unknown:
+        return jsonify({'error': f"unknown fields: {', '.join(unknown)}"}), 400
+
+    station = request.args.get('station')
+    batches = iter_batches(columns, station, start, end,
+                           fallback=lambda: map(with_timestamps, get_local_store(DATA_FILE).scan(station, start, end)))
+    writer = {'csv': csv_stream, 'ndjson': ndjson_stream, 'parquet': parquet_stream}[export_format]
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f"meteodata_{datetime.now().strftime('%Y-%m-%d')}.{extension}"
+    return Response(stream_with_context(writer(columns, batches)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+@app.route('/api/pool')
+def get_pool_stats():
+    """API endpoint se stavem poolu databázových spojení"""
+    return jsonify(pool_stats())
+
+@app.route('/api/ingest')
+def get_ingest_stats():
+    """API endpoint se stavem fronty pro zápis dat"""
+    return jsonify(dict(ingest_stats(), dedup=dedup_stats()))
+
+@app.route('/metrics')
+def get_metrics():
+    """Histogramy dob zpracování a stav poolu, fronty a živého kanálu pro Prometheus"""
+    gauges = {'pool': pool_stats(), 'ingest': ingest_stats(), 'dedup': dedup_stats(),
+              'hot_window': hot_window.metrics(), 'live': live_feed.metrics()}
+    return Response(render_metrics(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/live')
+def get_live():
+    """Server-Sent Events s novými záznamy (volitelně ?station=)
+
+    Nejdřív pošle událost `latest` s posledním známým záznamem, pak každý
+    nově uložený záznam jako zprávu s jeho id.
+    """
+    station = request.args.get('station')
+    stream = live_feed.stream(latest_readings.get(station), station)
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/live/stats')
+def get_live_stats():
+    """API endpoint se stavem živého kanálu"""
+    return jsonify(live_feed.metrics())
 
 @app.route('/api/latest')
 def get_latest():
-    """API endpoint pro nejnovější data"""
-    data = load_data()
-    if data:
-        return jsonify(data[-1])
-    return jsonify({})
+    """API endpoint pro nejnovější data (volitelně ?station=)"""
+    station = request.args.get('station')
+    return conditional_response(lambda: jsonify(latest_readings.get(station) or {}))
 
 # Inicializace databáze při startu
 init_database()
@@ -0,0 +1,82 @@
+"""Dashboard jako předem připravené statické soubory.
+
+CSS a JS ze static/ se při startu načtou a dostanou do názvu otisk obsahu
+(dashboard.3f2a9c1b7e5d.css). Otisk se mění jen se změnou souboru, takže
+prohlížeč je smí držet rok bez ověřování (immutable). HTML stránka se
+sestaví jednou s odkazy na otisknuté názvy, posílá se z paměti a ověřuje
+se přes ETag - po nasazení nové verze tak klient dostane nové odkazy.
+
+Všechny soubory mají předem připravenou gzip (a s balíčkem brotli i br)
+variantu, za běhu se nic nekomprimuje. Změny ve static/ se projeví až
+po restartu serveru.
+"""
+import gzip
+import hashlib
+import os
+
+from flask import Response
+
+from responses import brotli, negotiate_encoding
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+DASHBOARD_PAGE = 'dashboard.html'
+DASHBOARD_ASSETS = {
+    'dashboard.css': 'text/css',
+    'dashboard.js': 'text/javascript',
+}
+
+
+class Asset:
+    """Obsah souboru a jeho předem zkomprimované varianty"""
+
+    def __init__(self, name, body, mimetype):
+        self.name = name
+        self.mimetype = mimetype
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        self.bodies = {None: body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body, quality=11)
+
+    @property
+    def fingerprinted_name(self):
+        stem, extension = os.path.splitext(self.name)
+        return f'{stem}.{self.digest}{extension}'
+
+    def response(self, request, immutable=False):
+        """Odpověď v nejlepším kódování, které klient přijme (nebo 304)"""
+        encoding = negotiate_encoding(request.accept_encodings)
+        response = Response(self.bodies[encoding], mimetype=self.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(f'{self.digest}-{encoding}' if encoding else self.digest)
+        if immutable:
+            response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+
+class AssetBundle:
+    """Stránka dashboardu a soubory, na které odkazuje"""
+
+    def __init__(self, directory=STATIC_DIR):
+        self.assets = {}    # otisknutý i původní název -> Asset
+        html = _read(directory, DASHBOARD_PAGE).decode('utf-8')
+        for name, mimetype in DASHBOARD_ASSETS.items():
+            asset = Asset(name, _read(directory, name), mimetype)
+            self.assets[name] = self.assets[asset.fingerprinted_name] = asset
+            html = html.replace(f'/assets/{name}', f'/assets/{asset.fingerprinted_name}')
+        self.page = Asset(DASHBOARD_PAGE, html.encode('utf-8'), 'text/html')
+
+    def get(self, name):
+        """(Asset, je otisknutý) podle názvu z URL, neznámý název vrátí (None, False)"""
+        asset = self.assets.get(name)
+        return asset, asset is not None and name != asset.name
+
+
+def _read(directory, name):
+    with open(os.path.join(directory, name), 'rb') as f:
+        return f.read()
@@ -0,0 +1,120 @@
+"""Odvozené veličiny (derived.py) po sloupcích vs. po jednotlivých záznamech v Pythonu.
+
+Obě varianty počítají rosný bod, heat index, wind chill, pocitovou teplotu,
+WBGT a relativní tlak pro stejné záznamy ze simulátoru a výsledky se
+porovnají.
+
+    python bench/derived_meteo.py --rows 100000
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from derived import (BAROMETRIC_EXPONENT, LAPSE_RATE, MAGNUS_B, MAGNUS_C, columns_from_records,  # noqa: E402
+                     fill_missing)
+from schema import parse_wslink  # noqa: E402
+from simulator import stations  # noqa: E402
+
+ALTITUDE = 250.0
+DERIVED = ('dew_point', 'heat_index', 'wind_chill', 'feels_like', 'wbgt_temp', 'relative_pressure')
+INPUTS = ('outdoor_temp', 'outdoor_humidity', 'wind_speed', 'absolute_pressure')
+
+
+def row_dew_point(t, rh):
+    gamma = math.log(min(max(rh, 1), 100) / 100) + MAGNUS_B * t / (MAGNUS_C + t)
+    return MAGNUS_C * gamma / (MAGNUS_B - gamma)
+
+
+def row_wind_chill(t, ws):
+    if t > 10 or ws * 3.6 <= 4.8:
+        return t
+    v = (ws * 3.6) ** 0.16
+    return 13.12 + 0.6215 * t - 11.37 * v + 0.3965 * t * v
+
+
+def row_heat_index(t_c, rh):
+    if t_c < 26.7:
+        return t_c
+    t = t_c * 9 / 5 + 32
+    index = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    if (index + t) / 2 >= 80:
+        index = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+                 - 6.83783e-3 * t * t - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+                 + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+        if rh < 13 and 80 <= t <= 112:
+            index -= (13 - rh) / 4 * math.sqrt((17 - abs(t - 95)) / 17)
+        elif rh > 85 and 80 <= t <= 87:
+            index += (rh - 85) / 10 * (87 - t) / 5
+    return (index - 32) * 5 / 9
+
+
+def row_derived(r):
+    t, rh, ws, p = (r[c] for c in INPUTS)
+    e = 6.112 * math.exp(MAGNUS_B * t / (MAGNUS_C + t)) * rh / 100
+    cold = t <= 10 and ws * 3.6 > 4.8
+    h = LAPSE_RATE * ALTITUDE
+    return {
+        'dew_point': round(row_dew_point(t, rh), 1),
+        'heat_index': round(row_heat_index(t, rh), 1),
+        'wind_chill': round(row_wind_chill(t, ws), 1),
+        'feels_like': round(row_wind_chill(t, ws) if cold else row_heat_index(t, rh), 1),
+        'wbgt_temp': round(0.567 * t + 0.393 * e + 3.94, 1),
+        'relative_pressure': round(p * (1 - h / (t + h + 273.15)) ** -BAROMETRIC_EXPONENT, 1),
+    }
+
+
+def make_records(count):
+    sims = stations(20)
+    start = datetime.now() - timedelta(minutes=count)
+    records = []
+    for i in range(count):
+        record = parse_wslink(sims[i % len(sims)].query(start + timedelta(minutes=i)))
+        if record['outdoor_temp'] is None or record['wind_speed'] is None:
+            continue
+        for column in DERIVED:
+            record[column] = None
+        records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+
+    started = time.perf_counter()
+    per_row = [row_derived(r) for r in records]
+    row_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    columns = columns_from_records(records, INPUTS + DERIVED)
+    convert_seconds = time.perf_counter() - started
+    columns['altitude'] = np.full(len(records), ALTITUDE)
+    started = time.perf_counter()
+    filled = fill_missing(columns)
+    vector_seconds = time.perf_counter() - started
+
+    for column in DERIVED:
+        expected = np.array([r[column] for r in per_row])
+        mismatches = int((np.abs(filled[column] - expected) > 0.051).sum())
+        if mismatches:
+            print(f"MISMATCH {column}: {mismatches} rows")
+
+    n = len(records)
+    print(f"rows: {n:,}")
+    print(f"per row (Python):   {row_seconds * 1000:8.1f} ms  ({n / row_seconds:12,.0f} rows/s)")
+    print(f"columns (NumPy):    {vector_seconds * 1000:8.1f} ms  ({n / vector_seconds:12,.0f} rows/s)"
+          f"  + {convert_seconds * 1000:.1f} ms records -> arrays")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Regresní kontrola plánů dotazů load_data: žádný dotaz nesmí skončit sekvenčním průchodem meteo_data.
+
+Kontrola běží s enable_seqscan = off - na malé testovací tabulce by planner
+sekvenční průchod volil vždy, takže se tím ptáme, jestli existuje použitelný
+index. Když se i tak objeví Seq Scan, index chybí nebo ho dotaz nemůže použít.
+
+    DATABASE_URL=postgresql://localhost/meteo_test DATABASE_SSLMODE=disable \\
+        python bench/explain_plans.py
+"""
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db import get_db_connection, release_db_connection  # noqa: E402
+from schema import build_data_query  # noqa: E402
+
+NOW = datetime.now().astimezone()
+
+QUERIES = {
+    'latest': {},
+    'latest for station': {'station': 'garni001'},
+    'station time range': {'station': 'garni001', 'start': NOW - timedelta(days=7), 'end': NOW},
+    'time range, all stations': {'start': NOW - timedelta(days=1), 'end': NOW, 'limit': None},
+    'projected columns': {'station': 'garni001', 'columns': ['received_at', 'outdoor_temp']},
+    'next page for station': {'station': 'garni001', 'before': (NOW, 1000)},
+    'next page': {'before': (NOW, 1000)},
+    'changes since id': {'after_id': 1000, 'ascending': True},
+}
+
+
+def seq_scans(plan):
+    """Vrátí tabulky, které plán čte sekvenčně"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def main():
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("DATABASE_URL is not set")
+
+    failures = 0
+    try:
+        cur = conn.cursor()
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for name, kwargs in QUERIES.items():
+            sql, params = build_data_query(**kwargs)
+            cur.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            root = plan[0]['Plan']
+            bad = [t for t in seq_scans(root) if t and t.startswith('meteo_data')]
+            status = 'FAIL' if bad else 'ok'
+            failures += bool(bad)
+            print(f"{status:>4}  {name}: {root['Node Type']}")
+        conn.rollback()
+    finally:
+        release_db_connection(conn)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Objemová data pro benchmarky: 10k, 1M nebo 10M záznamů od simulovaných stanic.
+
+Záznamy vznikají stejnou cestou jako při příjmu (simulator -> parse_wslink),
+jen s časy rozloženými do minulosti. Do PostgreSQL se nahrají přes COPY
+(a agregace se pak přepočítají z nahraných dat), bez DATABASE_URL - nebo
+s --local - do lokálního úložiště, ze kterého čte fallback bez databáze.
+
+    DATABASE_URL=postgresql://localhost/meteo_bench DATABASE_SSLMODE=disable \\
+        python bench/fixtures.py --size 1m
+    LOCAL_STORE_DIR=/tmp/meteo_bench python bench/fixtures.py --size 10k --local
+
+Pro měření škálování /api/data nahraj postupně 10k, 1m a 10m a po každém
+kroku pusť bench/load.py --mix data=1.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db import get_db_connection, release_db_connection  # noqa: E402
+from localstore import get_local_store  # noqa: E402
+from partitions import add_months, create_partition, existing_partitions, month_start  # noqa: E402
+from rollups import backfill_rollups  # noqa: E402
+from schema import INSERT_COLUMNS, parse_wslink  # noqa: E402
+from simulator import stations  # noqa: E402
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+CHUNK_ROWS = 20_000
+
+
+def generate(rows, station_count, interval, end=None):
+    """Záznamy pro meteo_data od nejstaršího; stanice se střídají po `interval` sekundách"""
+    end = end or datetime.now()
+    per_station = -(-rows // station_count)
+    start = end - timedelta(seconds=interval * per_station)
+    sims = stations(station_count)
+    produced = 0
+    for step in range(per_station):
+        when = start + timedelta(seconds=interval * step)
+        for sim in sims:
+            if produced == rows:
+                return
+            received_at = when.astimezone()
+            yield parse_wslink(sim.query(when), now=received_at)
+            produced += 1
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def load_postgres(records, total):
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        loaded = 0
+        chunk = []
+        for record in records:
+            if loaded == 0 and not chunk:
+                _ensure_months(cur, record['received_at'])
+            chunk.append(record)
+            if len(chunk) == CHUNK_ROWS:
+                loaded += _copy(cur, chunk)
+                chunk = []
+                conn.commit()
+                _progress(loaded, total)
+        if chunk:
+            loaded += _copy(cur, chunk)
+        # Agregace přepočítáme najednou z nahraných dat
+        cur.execute("TRUNCATE meteo_rollup, meteo_rollup_state")
+        backfill_rollups(cur)
+        cur.execute("ANALYZE meteo_data")
+        conn.commit()
+        cur.close()
+        return loaded
+    finally:
+        release_db_connection(conn)
+
+
+def _ensure_months(cur, first):
+    """Oddíly pro celé období fixture, ať se nic nenahrává do výchozího oddílu"""
+    existing = existing_partitions(cur)
+    month = month_start(first)
+    last = month_start(datetime.now().astimezone())
+    while month <= last:
+        if month not in existing:
+            create_partition(cur, month)
+        month = add_months(month, 1)
+
+
+def _copy(cur, chunk):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in chunk:
+        writer.writerow([_csv_value(record.get(c)) for c in INSERT_COLUMNS])
+    buffer.seek(0)
+    cur.copy_expert(f"COPY meteo_data ({', '.join(INSERT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    return len(chunk)
+
+
+def load_local(records, total):
+    store = get_local_store()
+    loaded = 0
+    for record in records:
+        store.append(record)
+        loaded += 1
+        if loaded % CHUNK_ROWS == 0:
+            _progress(loaded, total)
+    return loaded
+
+
+def _progress(loaded, total):
+    print(f"  {loaded:>10,} / {total:,} rows", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=SIZES, default='10k')
+    parser.add_argument('--stations', type=int, default=10)
+    parser.add_argument('--interval', type=int, default=60, help='seconds between uploads of one station')
+    parser.add_argument('--local', action='store_true', help='load into the local store even with DATABASE_URL')
+    args = parser.parse_args()
+
+    total = SIZES[args.size]
+    records = generate(total, args.stations, args.interval)
+    use_db = os.environ.get('DATABASE_URL') and not args.local
+    started = time.perf_counter()
+    loaded = load_postgres(records, total) if use_db else load_local(records, total)
+    seconds = time.perf_counter() - started
+    target = 'meteo_data' if use_db else get_local_store().path
+    print(f"loaded {loaded:,} rows into {target} in {seconds:.1f} s ({loaded / seconds:,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Okno posledních dat (hotwindow.py): paměť na stanici a den a doba typických dotazů.
+
+Okno se naplní záznamy ze simulátoru za --hours hodin (místo dotazu do DB
+je loader nad seznamem v paměti) a změří se dotazy dashboardu. Výsledky
+se porovnají s výpočtem nad stejnými záznamy v Pythonu (rollups.summarize,
+seřazený seznam). Neshoda nebo paměť nad --max-mib-per-station-day
+(při uploadu každých --interval sekund) ukončí skript s kódem 1.
+
+    python bench/hot_window.py --stations 10 --interval 60 --hours 48 --max-mib-per-station-day 1
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fixtures import generate  # noqa: E402
+from hotwindow import ROW_BYTES, HotWindow  # noqa: E402
+from rollups import format_stats, summarize  # noqa: E402
+
+
+def make_records(stations, interval, hours):
+    rows = stations * int(hours * 3600 / interval)
+    # Poslední záznamy trochu v minulosti, ať je všechny okno vezme jako přijaté
+    records = list(generate(rows, stations, interval, end=datetime.now() - timedelta(seconds=interval)))
+    for i, record in enumerate(records, 1):
+        record['id'] = i
+        record['created_at'] = record['received_at'].replace(tzinfo=None)
+    return records
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def check(failures, name, ok):
+    if not ok:
+        failures.append(f"mismatch in {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=60, help='seconds between uploads of one station')
+    parser.add_argument('--hours', type=float, default=48)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--max-mib-per-station-day', type=float, default=1.0,
+                        help='memory budget of the window (MiB per station and day)')
+    args = parser.parse_args()
+    failures = []
+
+    records = make_records(args.stations, args.interval, args.hours)
+    window = HotWindow(lambda after_id, since, start: records, hours=args.hours + 1,
+                       max_rows=int(args.hours * 3600 / args.interval) + 1, refresh_interval=3600)
+    started = time.perf_counter()
+    window.load()
+    load_seconds = time.perf_counter() - started
+
+    metrics = window.metrics()
+    days = args.hours / 24
+    per_station_day = metrics['bytes'] / args.stations / days
+    print(f"rows: {metrics['rows']:,} in {metrics['stations']} stations, loaded in {load_seconds * 1000:.0f} ms")
+    print(f"memory: {metrics['bytes'] / 2 ** 20:.1f} MiB, {per_station_day / 2 ** 20:.2f} MiB per station per day"
+          f" (rows {ROW_BYTES} B each: {ROW_BYTES * 86400 / args.interval / 2 ** 20:.2f} MiB without spare capacity)")
+    if per_station_day / 2 ** 20 > args.max_mib_per_station_day:
+        failures.append(f"memory {per_station_day / 2 ** 20:.2f} MiB per station per day "
+                        f"is over {args.max_mib_per_station_day:g} MiB")
+
+    station = records[-1]['wsid']
+    own = [r for r in records if r['wsid'] == station]
+    start = (datetime.now() - timedelta(hours=24)).replace(minute=0, second=0, microsecond=0)
+
+    seconds, data = timed(lambda: window.select(station, limit=100), args.repeat)
+    print(f"{'last 100 rows of station':>28}: {seconds * 1000:7.2f} ms")
+    check(failures, 'last 100 rows', [r['id'] for r in data] == [r['id'] for r in own[-100:]])
+
+    seconds, data = timed(lambda: window.select(limit=1000), args.repeat)
+    print(f"{'last 1000 rows':>28}: {seconds * 1000:7.2f} ms")
+    check(failures, 'last 1000 rows', [r['id'] for r in data] == [r['id'] for r in records[-1000:]])
+
+    since = records[-5 * args.stations]['id']
+    seconds, data = timed(lambda: window.select(limit=1000, since=since), args.repeat)
+    print(f"{'rows since id':>28}: {seconds * 1000:7.2f} ms")
+    check(failures, 'rows since id', [r['id'] for r in data] == [r['id'] for r in records if r['id'] > since])
+
+    seconds, summary = timed(lambda: window.summary(start), args.repeat)
+    print(f"{'24h stats (all stations)':>28}: {seconds * 1000:7.2f} ms")
+    started = time.perf_counter()
+    expected = summarize([r for r in records if r['received_at'].replace(tzinfo=None) >= start])
+    print(f"{'24h stats in Python':>28}: {(time.perf_counter() - started) * 1000:7.2f} ms")
+    got, want = format_stats(summary), format_stats(expected)
+    check(failures, '24h stats', got['count'] == want['count'] and all(
+        got['metrics'][m]['count'] == want['metrics'][m]['count']
+        and got['metrics'][m]['max'] == want['metrics'][m]['max']
+        and abs((got['metrics'][m]['avg'] or 0) - (want['metrics'][m]['avg'] or 0)) < 1e-9
+        for m in got['metrics']))
+
+    seconds, latest = timed(lambda: window.latest(station), args.repeat)
+    print(f"{'latest of station':>28}: {seconds * 1000:7.2f} ms")
+    check(failures, 'latest', latest['id'] == own[-1]['id'])
+    print(f"served from window: {window.stats['hits']}, fell back: {window.stats['misses']}")
+    for failure in failures:
+        print(f"FAIL  {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
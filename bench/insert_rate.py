@@ -0,0 +1,83 @@
+"""Počet INSERTů za sekundu: SQL sestavené při každém volání vs. prepared statement.
+
+Obě varianty vkládají stejné záznamy ze simulátoru po jednom (jako
+save_data_to_db bez dávkování) do dočasných kopií meteo_data a
+meteo_upload_keys, které v rámci spojení zakryjí skutečné tabulky - data
+benchmarku nikde nezůstanou.
+
+    DATABASE_URL=postgresql://localhost/meteo_test DATABASE_SSLMODE=disable \\
+        python bench/insert_rate.py --rows 5000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db import get_db_connection, release_db_connection  # noqa: E402
+from ingest import insert_record  # noqa: E402
+from schema import INSERT_COLUMNS, parse_wslink  # noqa: E402
+from simulator import stations  # noqa: E402
+
+
+def adhoc_insert(cur, record):
+    """Původní cesta: SQL text se skládá a server ho parsuje při každém volání"""
+    values = [record.get(c) for c in INSERT_COLUMNS]
+    sql = f"""
+        INSERT INTO meteo_data ({', '.join(INSERT_COLUMNS)})
+        VALUES ({', '.join(['%s'] * len(values))})
+        RETURNING id
+    """
+    cur.execute(sql, values)
+    return cur.fetchone()[0]
+
+
+def make_records(count):
+    sims = stations(10)
+    start = datetime.now() - timedelta(minutes=count)
+    return [parse_wslink(sims[i % len(sims)].query(start + timedelta(minutes=i))) for i in range(count)]
+
+
+def measure(conn, insert, records, commit_every):
+    cur = conn.cursor()
+    started = time.perf_counter()
+    for i, record in enumerate(records, 1):
+        insert(cur, record)
+        if i % commit_every == 0:
+            conn.commit()
+    conn.commit()
+    seconds = time.perf_counter() - started
+    cur.close()
+    return len(records) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--commit-every', type=int, default=1, help='rows per transaction')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("DATABASE_URL is not set")
+    records = make_records(args.rows)
+    try:
+        cur = conn.cursor()
+        # Dočasné tabulky mají přednost před public.* po celé spojení
+        cur.execute("CREATE TEMP TABLE meteo_data (LIKE public.meteo_data INCLUDING DEFAULTS)")
+        cur.execute("CREATE TEMP TABLE meteo_upload_keys (LIKE public.meteo_upload_keys INCLUDING ALL)")
+        conn.commit()
+        for name, insert in (('ad hoc SQL', adhoc_insert), ('prepared', insert_record)):
+            rate = measure(conn, insert, records, args.commit_every)
+            print(f"{name:>10}: {rate:,.0f} inserts/s")
+        cur.close()
+    finally:
+        # Spojení s dočasnou tabulkou a připraveným příkazem do poolu nevracíme,
+        # zavřením zmizí obojí
+        release_db_connection(conn, broken=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Zátěžový test: simulované stanice posílají uploady a klienti čtou API zároveň.
+
+Každé vlákno opakovaně vybírá endpoint podle --mix (váhy) a měří latenci.
+Na konci vypíše pro každý endpoint počet požadavků, chyby, req/s, p50 a p99.
+Podmínky --max-p99 a --min-rps slouží jako regresní brána: když některá
+neprojde, skript skončí s kódem 1.
+
+    python app.py &                                  # bez DATABASE_URL = JSON fallback
+    python bench/load.py --duration 30 --concurrency 16 \\
+        --mix upload=70,data=10,latest=15,stats=5 --max-p99 upload=50 --min-rps upload=200
+
+Škálování s objemem dat: nahraj bench/fixtures.py --size 10k / 1m / 10m
+(do PostgreSQL nebo lokálního úložiště) a po každém kroku pusť stejný mix.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from simulator import stations  # noqa: E402
+
+ENDPOINTS = {
+    'upload': None,  # cesta s parametry ze simulátoru
+    'data': '/api/data?limit=100',
+    'latest': '/api/latest',
+    'stats': '/api/stats',
+    'export': '/api/export?format=csv&limit=1000',
+    'dashboard': '/',
+}
+
+
+def parse_pairs(text, cast=float):
+    """'upload=70,data=10' -> {'upload': 70.0, 'data': 10.0}"""
+    pairs = {}
+    for item in filter(None, (text or '').split(',')):
+        name, _, value = item.partition('=')
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r} (choose from {', '.join(ENDPOINTS)})")
+        pairs[name] = cast(value)
+    return pairs
+
+
+class Worker(threading.Thread):
+    """Jedno keep-alive spojení; výsledky si drží lokálně a sloučí se až na konci"""
+
+    def __init__(self, url, mix, sims, deadline, seed):
+        super().__init__(daemon=True)
+        self.url = url
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.sims = sims
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.samples = {name: [] for name in mix}
+        self.errors = {name: 0 for name in mix}
+        self.conn = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+        self.conn = cls(self.url.netloc, timeout=30)
+
+    def _path(self, name):
+        if name == 'upload':
+            return f"/data/upload.php?{self.random.choice(self.sims).query_string()}"
+        return ENDPOINTS[name]
+
+    def run(self):
+        self._connect()
+        while time.monotonic() < self.deadline:
+            name = self.random.choices(self.names, self.weights)[0]
+            path = self._path(name)
+            start = time.perf_counter()
+            try:
+                self.conn.request('GET', self.url.path.rstrip('/') + path)
+                response = self.conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+                self.conn.close()
+                self._connect()
+            elapsed = (time.perf_counter() - start) * 1000
+            if ok:
+                self.samples[name].append(elapsed)
+            else:
+                self.errors[name] += 1
+        self.conn.close()
+
+
+def summarize(workers, names, seconds):
+    report = {}
+    for name in names:
+        samples = sorted(s for w in workers for s in w.samples[name])
+        errors = sum(w.errors[name] for w in workers)
+        report[name] = {
+            'requests': len(samples),
+            'errors': errors,
+            'rps': len(samples) / seconds,
+            'p50': samples[len(samples) // 2] if samples else None,
+            'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))] if samples else None,
+        }
+    return report
+
+
+def check(report, max_p99, min_rps):
+    """Porušené podmínky jako texty"""
+    failures = []
+    for name, limit in max_p99.items():
+        p99 = report.get(name, {}).get('p99')
+        if p99 is None or p99 > limit:
+            failures.append(f"{name} p99 {p99 if p99 is None else round(p99, 1)} ms > {limit} ms")
+    for name, limit in min_rps.items():
+        rps = report.get(name, {}).get('rps', 0)
+        if rps < limit:
+            failures.append(f"{name} {rps:.1f} req/s < {limit} req/s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--duration', type=float, default=10, help='seconds')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--stations', type=int, default=50)
+    parser.add_argument('--mix', type=parse_pairs, default='upload=70,data=10,latest=15,stats=5')
+    parser.add_argument('--max-p99', type=parse_pairs, default={}, help='e.g. upload=50,data=200 (ms)')
+    parser.add_argument('--min-rps', type=parse_pairs, default={}, help='e.g. upload=200')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    sims = stations(args.stations, prefix='load')
+    deadline = time.monotonic() + args.duration
+    # Stanice mají stav (čítače srážek, poslední čas), takže každou řídí jen jedno vlákno
+    workers = [Worker(url, args.mix, sims[i::args.concurrency] or [sims[i % len(sims)]], deadline, seed=i)
+               for i in range(args.concurrency)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    seconds = time.perf_counter() - started
+
+    report = summarize(workers, args.mix, seconds)
+    failures = check(report, args.max_p99, args.min_rps)
+    if args.json:
+        print(json.dumps({'seconds': seconds, 'concurrency': args.concurrency,
+                          'endpoints': report, 'failures': failures}, indent=2))
+    else:
+        print(f"{'endpoint':<10} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, row in report.items():
+            p50 = '-' if row['p50'] is None else f"{row['p50']:.1f}"
+            p99 = '-' if row['p99'] is None else f"{row['p99']:.1f}"
+            print(f"{name:<10} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9.1f} {p50:>8} {p99:>8}")
+        for failure in failures:
+            print(f"FAIL  {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Mikrobenchmark parsování dotazu WSLink: původní řada request.args.get vs. parse_wslink.
+
+Před měřením ověří, že oba parsery dají stejný záznam a že parse_record
+(import meteo_data.json / CSV) doplní z kanálu 2 sloupce soil_* jako parse_wslink.
+
+    python bench/parse_wslink.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MultiDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from schema import SOIL_COLUMNS, parse_record, parse_wslink  # noqa: E402
+
+# Typický dotaz konzole s venkovním čidlem, detektorem blesků a dvěma kanály
+QUERY = (
+    'wsid=garni001&wspw=secret&datetime=2025-06-07+11:17:22&rbar=1012.6&abar=964.3'
+    '&intem=22.2&inhum=62&inbat=1&t1tem=18.4&t1hum=71&t1feels=18.4&t1chill=18.4'
+    '&t1heat=18.4&t1dew=13.0&t1wdir=225&t1ws=3.4&t1ws10mav=2.9&t1wgust=6.1'
+    '&t1rainra=0.0&t1rainhr=0.0&t1raindy=1.2&t1rainwy=4.8&t1rainmth=31.0&t1rainyr=402.5'
+    '&t1uvi=3.1&t1solrad=412&t1wbgt=17.2&t1bat=1&t1cn=1'
+    '&t5lst=1717751842&t5lskm=12&t5lsf=3&t5ls5mtc=0&t5ls30mtc=1&t5ls1htc=3&t5ls1dtc=7'
+    '&t5lsbat=1&t5lscn=1'
+    '&t234c1tem=21.0&t234c1hum=48&t234c1bat=1&t234c1cn=1&t234c1tp=1'
+    '&t234c2tem=14.2&t234c2hum=33&t234c2bat=1&t234c2cn=1&t234c2tp=2'
+)
+
+
+def legacy_parse(args):
+    """Původní parser z receive_weather_data (pro srovnání)"""
+    weather_data = {}
+    weather_data['wsid'] = args.get('wsid', 'unknown')
+    weather_data['datetime'] = args.get('datetime', datetime.now().isoformat())
+    weather_data['received_at'] = datetime.now().isoformat()
+    weather_data['relative_pressure'] = args.get('rbar', type=float)
+    weather_data['absolute_pressure'] = args.get('abar', type=float)
+    weather_data['indoor_temp'] = args.get('intem', type=float)
+    weather_data['indoor_humidity'] = args.get('inhum', type=int)
+    weather_data['console_battery'] = args.get('inbat', type=int)
+    weather_data['outdoor_temp'] = args.get('t1tem', type=float)
+    weather_data['outdoor_humidity'] = args.get('t1hum', type=int)
+    weather_data['feels_like'] = args.get('t1feels', type=float)
+    weather_data['wind_chill'] = args.get('t1chill', type=float)
+    weather_data['heat_index'] = args.get('t1heat', type=float)
+    weather_data['dew_point'] = args.get('t1dew', type=float)
+    weather_data['wind_direction'] = args.get('t1wdir', type=int)
+    weather_data['wind_speed'] = args.get('t1ws', type=float)
+    weather_data['wind_speed_10min_avg'] = args.get('t1ws10mav', type=float)
+    weather_data['wind_gust'] = args.get('t1wgust', type=float)
+    weather_data['rain_rate'] = args.get('t1rainra', type=float)
+    weather_data['rain_hourly'] = args.get('t1rainhr', type=float)
+    weather_data['rain_daily'] = args.get('t1raindy', type=float)
+    weather_data['rain_weekly'] = args.get('t1rainwy', type=float)
+    weather_data['rain_monthly'] = args.get('t1rainmth', type=float)
+    weather_data['rain_yearly'] = args.get('t1rainyr', type=float)
+    weather_data['uv_index'] = args.get('t1uvi', type=float)
+    weather_data['solar_radiation'] = args.get('t1solrad', type=float)
+    weather_data['wbgt_temp'] = args.get('t1wbgt', type=float)
+    weather_data['outdoor_battery'] = args.get('t1bat', type=int)
+    weather_data['outdoor_connection'] = args.get('t1cn', type=int)
+    weather_data['lightning_last_strike_time'] = args.get('t5lst', type=int)
+    weather_data['lightning_distance_km'] = args.get('t5lskm', type=int)
+    weather_data['lightning_strikes_1hour'] = args.get('t5lsf', type=int)
+    weather_data['lightning_count_5min'] = args.get('t5ls5mtc', type=int)
+    weather_data['lightning_count_30min'] = args.get('t5ls30mtc', type=int)
+    weather_data['lightning_count_1hour'] = args.get('t5ls1htc', type=int)
+    weather_data['lightning_count_1day'] = args.get('t5ls1dtc', type=int)
+    weather_data['lightning_battery'] = args.get('t5lsbat', type=int)
+    weather_data['lightning_connection'] = args.get('t5lscn', type=int)
+    for i in range(1, 8):
+        temp_key = f't234c{i}tem'
+        hum_key = f't234c{i}hum'
+        bat_key = f't234c{i}bat'
+        cn_key = f't234c{i}cn'
+        tp_key = f't234c{i}tp'
+        if args.get(temp_key):
+            weather_data[f'ch{i}_temp'] = args.get(temp_key, type=float)
+            weather_data[f'ch{i}_humidity'] = args.get(hum_key, type=int)
+            weather_data[f'ch{i}_battery'] = args.get(bat_key, type=int)
+            weather_data[f'ch{i}_connection'] = args.get(cn_key, type=int)
+            weather_data[f'ch{i}_type'] = args.get(tp_key, type=int)
+            if i == 2:
+                weather_data['soil_temp'] = args.get(temp_key, type=float)
+                weather_data['soil_humidity'] = args.get(hum_key, type=int)
+                weather_data['soil_battery'] = args.get(bat_key, type=int)
+                weather_data['soil_connection'] = args.get(cn_key, type=int)
+    return weather_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    query = MultiDict(parse_qsl(QUERY, keep_blank_values=True))
+
+    # Oba parsery musí dát stejný záznam (až na časy - parse_wslink je vrací jako datetime)
+    old, new = legacy_parse(query), parse_wslink(query)
+    for key in ('datetime', 'received_at'):
+        old.pop(key), new.pop(key)
+    assert old == new, set(old.items()) ^ set(new.items())
+
+    # Záznam z exportu bez soil_* (jen ch2_*) musí po parse_record mít soil_* jako z parse_wslink
+    live = parse_wslink(query)
+    exported = {k: str(v) for k, v in live.items()
+                if v is not None and k not in SOIL_COLUMNS.values()}
+    imported = parse_record(exported)
+    soil = {c: (live[c], imported[c]) for c in SOIL_COLUMNS.values() if live[c] != imported[c]}
+    if soil:
+        print(f"❌ parse_record soil columns differ from parse_wslink (live, imported): {soil}")
+        sys.exit(1)
+
+    for name, fn in (('legacy request.args.get', legacy_parse), ('parse_wslink', parse_wslink)):
+        seconds = min(timeit.repeat(lambda: fn(query), number=args.iterations, repeat=5))
+        print(f"{name:>24}: {seconds / args.iterations * 1e6:.2f} µs/request")
+
+
+if __name__ == '__main__':
+    main()
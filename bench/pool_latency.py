@@ -0,0 +1,74 @@
+"""Porovnání latence dotazu s poolem a bez něj.
+
+Spuštění proti dočasné databázi:
+
+    DATABASE_URL=postgresql://localhost/meteo_test DATABASE_SSLMODE=disable \\
+        python bench/pool_latency.py --requests 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db import DATABASE_SSLMODE, get_db_connection, release_db_connection, pool_stats  # noqa: E402
+
+QUERY = "SELECT 1"
+
+
+def connect_per_call(dsn):
+    conn = psycopg2.connect(dsn, sslmode=DATABASE_SSLMODE)
+    cur = conn.cursor()
+    cur.execute(QUERY)
+    cur.fetchall()
+    cur.close()
+    conn.close()
+
+
+def pooled(dsn):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(QUERY)
+    cur.fetchall()
+    cur.close()
+    release_db_connection(conn)
+
+
+def measure(fn, dsn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn(dsn)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'mean': statistics.fmean(samples),
+        'p50': samples[len(samples) // 2],
+        'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit("DATABASE_URL is not set")
+
+    results = {
+        'connect-per-call': measure(connect_per_call, dsn, args.requests),
+        'pooled': measure(pooled, dsn, args.requests),
+    }
+    for name, r in results.items():
+        print(f"{name:>18}: mean {r['mean']:.3f} ms  p50 {r['p50']:.3f} ms  p99 {r['p99']:.3f} ms")
+    print(f"pool: {pool_stats()}")
+
+
+if __name__ == '__main__':
+    main()
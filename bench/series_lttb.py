@@ -0,0 +1,45 @@
+"""Doba zmenšení řady algoritmem LTTB (series.lttb) pro různé délky řady.
+
+    python bench/series_lttb.py --points 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from series import lttb  # noqa: E402
+
+SIZES = {
+    'week of minutes': 7 * 24 * 60,
+    'year of hours': 365 * 24,
+    '5 years of hours': 5 * 365 * 24,
+    'year of raw (1/min)': 365 * 24 * 60,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--points', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for name, n in SIZES.items():
+        x = np.arange(n, dtype=np.float64) * 60
+        y = 10 * np.sin(x / 86400 * 2 * np.pi) + rng.normal(0, 0.5, n).cumsum() * 0.01
+        best = min(_timed(lambda: lttb(x, y, args.points)) for _ in range(args.repeat))
+        print(f"{name:>20} ({n:>9,} -> {args.points}): {best * 1000:7.1f} ms")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Syntetické meteostanice posílající data protokolem WSLink.
+
+Každá stanice má plynule se měnící počasí (denní chod teploty a slunce,
+náhodná procházka tlaku, přeháňky s kumulativními čítači srážek, občasné
+bouřky) a posílá stejnou sadu parametrů jako skutečná konzole: t1* venkovní
+čidlo, t5* detektor blesků a t234c* přídavné kanály. Používají ho
+bench/load.py (uploady) a bench/fixtures.py (objemová data).
+
+    python bench/simulator.py --stations 3
+"""
+import argparse
+import math
+import random
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+
+def _dew_point(temp, humidity):
+    # Magnusův vzorec
+    gamma = math.log(max(humidity, 1) / 100) + 17.62 * temp / (243.12 + temp)
+    return 243.12 * gamma / (17.62 - gamma)
+
+
+class SimulatedStation:
+    """Jedna konzole WSLink; query(čas) vrátí parametry jednoho uploadu"""
+
+    def __init__(self, wsid, seed=None, channels=(1, 2), lightning=True):
+        self.wsid = wsid
+        self.channels = channels
+        self.lightning = lightning
+        self.random = random.Random(seed if seed is not None else wsid)
+        r = self.random
+        self.base_temp = r.uniform(5, 15)
+        self.pressure = r.uniform(1000, 1025)
+        self.altitude_offset = r.uniform(20, 60)   # rozdíl relativního a absolutního tlaku
+        self.rain_daily = 0.0
+        self.rain_yearly = r.uniform(0, 400)
+        self.raining_until = None
+        self.storm_until = None
+        self.strikes_day = 0
+        self.last_strike = 0
+        self.wind_dir = r.randrange(360)
+        self.last = None
+
+    def query(self, when=None):
+        """Parametry dotazu (texty) pro upload v čase `when`"""
+        when = when or datetime.now()
+        r = self.random
+        if self.last is not None and when.date() != self.last.date():
+            self.rain_daily = 0.0
+            self.strikes_day = 0
+            if when.year != self.last.year:
+                self.rain_yearly = 0.0
+        step = max(0.0, (when - self.last).total_seconds()) if self.last else 60.0
+        self.last = when
+
+        day = 2 * math.pi * (when.timetuple().tm_yday - 105) / 365
+        hour = 2 * math.pi * (when.hour + when.minute / 60 - 9) / 24
+        temp = self.base_temp + 10 * math.sin(day) + 5 * math.sin(hour) + r.gauss(0, 0.3)
+        humidity = min(100, max(10, 70 - 25 * math.sin(hour) + r.gauss(0, 3)))
+        self.pressure = min(1045, max(975, self.pressure + r.gauss(0, 0.02) * math.sqrt(step / 60)))
+        sun = max(0.0, math.sin(hour)) * (0.6 + 0.4 * math.sin(day))
+        wind = max(0.0, r.gammavariate(2, 1.2))
+        self.wind_dir = (self.wind_dir + int(r.gauss(0, 10))) % 360
+
+        rain_rate = 0.0
+        if self.raining_until and when < self.raining_until:
+            rain_rate = r.uniform(0.5, 12)
+        elif r.random() < 0.002 * step / 60:
+            self.raining_until = when + timedelta(minutes=r.randint(10, 120))
+        rain = rain_rate * step / 3600
+        self.rain_daily += rain
+        self.rain_yearly += rain
+
+        params = {
+            'wsid': self.wsid,
+            'wspw': 'secret',
+            'datetime': when.strftime('%Y-%m-%d %H:%M:%S'),
+            'rbar': f'{self.pressure:.1f}',
+            'abar': f'{self.pressure - self.altitude_offset:.1f}',
+            'intem': f'{21 + r.gauss(0, 0.5):.1f}',
+            'inhum': str(int(45 + r.gauss(0, 3))),
+            'inbat': '1',
+            't1tem': f'{temp:.1f}',
+            't1hum': str(int(humidity)),
+            't1feels': f'{temp - (wind * 0.7 if temp < 10 else 0):.1f}',
+            't1chill': f'{temp - wind * 0.7:.1f}' if temp < 10 else f'{temp:.1f}',
+            't1heat': f'{temp + max(0.0, humidity - 40) * 0.05:.1f}' if temp > 26 else f'{temp:.1f}',
+            't1dew': f'{_dew_point(temp, humidity):.1f}',
+            't1wdir': str(self.wind_dir),
+            't1ws': f'{wind:.1f}',
+            't1ws10mav': f'{wind * 0.8:.1f}',
+            't1wgust': f'{wind * 1.6:.1f}',
+            't1rainra': f'{rain_rate:.1f}',
+            't1rainhr': f'{rain_rate:.1f}',
+            't1raindy': f'{self.rain_daily:.1f}',
+            't1rainwy': f'{self.rain_daily:.1f}',
+            't1rainmth': f'{self.rain_yearly / 12:.1f}',
+            't1rainyr': f'{self.rain_yearly:.1f}',
+            't1uvi': f'{sun * 8:.1f}',
+            't1solrad': str(int(sun * 900)),
+            't1wbgt': f'{temp - 2:.1f}',
+            't1bat': '1',
+            't1cn': '1',
+        }
+
+        if self.lightning:
+            strikes = 0
+            if self.storm_until and when < self.storm_until:
+                strikes = r.randint(0, 5)
+            elif rain_rate > 8 and r.random() < 0.05:
+                self.storm_until = when + timedelta(minutes=r.randint(15, 60))
+            if strikes:
+                self.last_strike = int(when.timestamp())
+            self.strikes_day += strikes
+            params.update({
+                't5lst': str(self.last_strike),
+                't5lskm': str(r.randint(1, 40)) if strikes else '0',
+                't5lsf': str(strikes),
+                't5ls5mtc': str(strikes),
+                't5ls30mtc': str(strikes * 3),
+                't5ls1htc': str(strikes * 6),
+                't5ls1dtc': str(self.strikes_day),
+                't5lsbat': '1',
+                't5lscn': '1',
+            })
+
+        for channel in self.channels:
+            if channel == 2:
+                # Půdní čidlo - pomalejší a tlumenější než vzduch
+                channel_temp, channel_hum = self.base_temp + 4 * math.sin(day), 35 + r.gauss(0, 1)
+            else:
+                channel_temp, channel_hum = temp + r.gauss(0, 0.5), humidity + r.gauss(0, 2)
+            params.update({
+                f't234c{channel}tem': f'{channel_temp:.1f}',
+                f't234c{channel}hum': str(int(min(100, max(0, channel_hum)))),
+                f't234c{channel}bat': '1',
+                f't234c{channel}cn': '1',
+                f't234c{channel}tp': '2' if channel == 2 else '1',
+            })
+        return params
+
+    def query_string(self, when=None):
+        return urlencode(self.query(when))
+
+
+def stations(count, prefix='sim', seed=0):
+    """`count` stanic s různými kombinacemi čidel (každá třetí bez detektoru blesků)"""
+    return [
+        SimulatedStation(f'{prefix}{i:04d}', seed=seed * 100003 + i,
+                         channels=(1, 2) if i % 2 == 0 else (1, 2, 3),
+                         lightning=i % 3 != 2)
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stations', type=int, default=1)
+    parser.add_argument('--uploads', type=int, default=3)
+    parser.add_argument('--interval', type=int, default=60, help='seconds between uploads')
+    args = parser.parse_args()
+
+    start = datetime.now() - timedelta(seconds=args.interval * args.uploads)
+    for station in stations(args.stations):
+        for i in range(args.uploads):
+            print(f"/data/upload.php?{station.query_string(start + timedelta(seconds=args.interval * i))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+# Nastavení poolu (lze přepsat proměnnými prostředí)
+POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+POOL_IDLE_TIMEOUT = float(os.environ.get('DB_POOL_IDLE_TIMEOUT', 300))
+POOL_HEALTH_CHECK_AFTER = float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', 30))
+DATABASE_SSLMODE = os.environ.get('DATABASE_SSLMODE', 'require')
+
+
+class PoolTimeout(Exception):
+    """Pool nevydal spojení v časovém limitu"""
+
+
+class ConnectionPool:
+    """Thread-safe pool spojení s kontrolou zdraví a recyklací nečinných spojení"""
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=10.0,
+                 idle_timeout=300.0, health_check_after=30.0, **connect_kwargs):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.connect_kwargs = connect_kwargs
+        self.pid = os.getpid()
+
+        self._idle = deque()   # (spojení, čas vrácení)
+        self._in_use = set()
+        self._opening = 0       # rezervovaná místa pro právě otevíraná spojení
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.stats = {
+            'connections_created': 0,
+            'connections_closed': 0,
+            'connections_recycled': 0,
+            'health_checks_failed': 0,
+            'borrowed': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+        }
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        with self._cond:
+            self.stats['connections_created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self.stats['connections_closed'] += 1
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if idle_for < self.health_check_after:
+            return True
+        # Spojení leželo déle - ověříme, že ho server mezitím nezavřel
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        """Vypůjčí spojení z poolu, případně otevře nové do velikosti maxconn"""
+        deadline = None
+        while True:
+            candidate = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise psycopg2.InterfaceError("connection pool is closed")
+                    now = time.monotonic()
+                    if self._idle:
+                        candidate, returned_at = self._idle.pop()
+                        self._in_use.add(candidate)
+                        break
+                    if len(self._in_use) + self._opening < self.maxconn:
+                        self._opening += 1
+                        break
+                    # Pool je plný - počkáme, až někdo spojení vrátí
+                    if deadline is None:
+                        deadline = now + self.timeout
+                        self.stats['waits'] += 1
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(f"no connection available within {self.timeout}s")
+                    self._cond.wait(remaining)
+                    self.stats['wait_time_total'] += time.monotonic() - now
+
+            if candidate is None:
+                return self._open_reserved()
+
+            # Kontrola mimo zámek, ať pomalý server neblokuje ostatní vlákna
+            idle_for = time.monotonic() - returned_at
+            if idle_for > self.idle_timeout:
+                reason = 'connections_recycled'
+            elif not self._is_healthy(candidate, idle_for):
+                reason = 'health_checks_failed'
+            else:
+                with self._cond:
+                    self.stats['borrowed'] += 1
+                return candidate
+
+            with self._cond:
+                self._in_use.discard(candidate)
+                self.stats[reason] += 1
+                self._discard(candidate)
+                self._cond.notify()
+
+    def _open_reserved(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._in_use.add(conn)
+            self.stats['borrowed'] += 1
+        return conn
+
+    def putconn(self, conn, broken=False):
+        """Vrátí spojení do poolu; rozbitá spojení zavře"""
+        with self._cond:
+            self._in_use.discard(conn)
+            if not broken and not conn.closed and not self._closed:
+                try:
+                    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                    self._idle.append((conn, time.monotonic()))
+                    self._cond.notify()
+                    return
+                except Exception:
+                    pass
+            self._discard(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            for conn in list(self._in_use):
+                self._discard(conn)
+            self._in_use.clear()
+            self._cond.notify_all()
+
+    def lent(self, conn):
+        """Je `conn` vypůjčené z tohoto poolu? (bez zámku - volá se i v potomkovi po forku)"""
+        return conn in self._in_use
+
+    def metrics(self):
+        """Vrátí aktuální stav a čítače poolu"""
+        with self._cond:
+            return {
+                'pid': self.pid,
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'size': len(self._idle) + len(self._in_use),
+                **self.stats,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Spojení zděděná z rodičovského procesu (gunicorn fork) - nesmíme je zavřít,
+# jinak bychom rodiči ukončili jeho socket
+_inherited = []
+
+
+def get_pool():
+    """Vrátí pool pro aktuální proces (po forku workeru vytvoří nový)"""
+    global _pool
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL:
+        return None
+
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            _inherited.append(_pool)
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool(
+                DATABASE_URL,
+                minconn=POOL_MIN,
+                maxconn=POOL_MAX,
+                timeout=POOL_TIMEOUT,
+                idle_timeout=POOL_IDLE_TIMEOUT,
+                health_check_after=POOL_HEALTH_CHECK_AFTER,
+                sslmode=DATABASE_SSLMODE,
+            )
+        return _pool
+
+
+def get_db_connection():
+    """Vypůjčí spojení z poolu (None, pokud databáze není nastavená)"""
+    pool = get_pool()
+    if pool:
+        return pool.getconn()
+    return None
+
+
+def release_db_connection(conn, broken=False):
+    """Vrátí spojení zpět do poolu
+
+    Spojení vypůjčené v rodiči před forkem se v potomkovi jen zahodí - close
+    by ukončilo socket, který dál používá rodič (odkaz drží jeho pool).
+    """
+    pool = _pool
+    pid = os.getpid()
+    if any(p.pid != pid and p.lent(conn) for p in [pool] + _inherited if p is not None):
+        return
+    if pool is not None and pool.pid == pid:
+        pool.putconn(conn, broken=broken or bool(conn.closed))
+    else:
+        conn.close()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+
+def pool_stats():
+    """Metriky poolu pro aktuální proces"""
+    pool = _pool
+    if pool is None or pool.pid != os.getpid():
+        return {}
+    return pool.metrics()
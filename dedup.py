@@ -0,0 +1,162 @@
+"""Potlačení opakovaných uploadů (idempotentní příjem).
+
+Konzole WSLink upload zopakuje, když nedostane včas odpověď, a opakovaný
+záznam by jinak zdvojil řádek v meteo_data i agregace. Upload určuje
+stanice a čas měření z konzole (wsid, datetime):
+
+- recent_uploads drží posledních DEDUP_CACHE_SIZE klíčů v paměti procesu,
+  takže většina opakování skončí bez dotazu do databáze (klíč je z už
+  převedeného záznamu, stejný jako v databázi),
+- v databázi je klíč v tabulce meteo_upload_keys (primární klíč
+  (wsid, datetime)) a INSERT do meteo_data proběhne jen tehdy, když
+  INSERT ... ON CONFLICT DO NOTHING klíče v téže transakci uspěje.
+  Unikátní index přímo na meteo_data mít nejde - na rozdělené tabulce
+  by musel obsahovat i klíč oddílů received_at, který se při opakování liší.
+
+Záznam bez platného času z konzole (datetime doplněný časem přijetí) klíč
+nemá a ukládá se vždy. Klíče starší než DEDUP_KEY_RETENTION_DAYS maže
+údržba oddílů.
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import execute_values
+
+from schema import as_timestamp
+
+DEDUP_CACHE_SIZE = int(os.environ.get('DEDUP_CACHE_SIZE', 10000))
+DEDUP_KEY_RETENTION_DAYS = int(os.environ.get('DEDUP_KEY_RETENTION_DAYS', 7))
+
+CREATE_UPLOAD_KEYS_SQL = """
+    CREATE TABLE IF NOT EXISTS meteo_upload_keys (
+        wsid VARCHAR(50) NOT NULL,
+        datetime TIMESTAMPTZ NOT NULL,
+        PRIMARY KEY (wsid, datetime)
+    )
+"""
+INSERT_KEYS_SQL = ("INSERT INTO meteo_upload_keys (wsid, datetime) VALUES %s "
+                   "ON CONFLICT DO NOTHING RETURNING wsid, datetime")
+INSERT_KEYS_SQL_ASYNC = ("INSERT INTO meteo_upload_keys (wsid, datetime) "
+                         "SELECT * FROM unnest($1::varchar[], $2::timestamptz[]) "
+                         "ON CONFLICT DO NOTHING RETURNING wsid, datetime")
+
+
+class RecentUploads:
+    """LRU posledních klíčů uploadů v paměti procesu"""
+
+    def __init__(self, size=DEDUP_CACHE_SIZE):
+        self.size = size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'suppressed_memory': 0,
+            'suppressed_db': 0,
+        }
+
+    def seen(self, key):
+        """True pro klíč, který už byl uložen (počítá se jako potlačený duplikát)"""
+        if key is None:
+            return False
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            self.stats['suppressed_memory'] += 1
+            return True
+
+    def remember(self, key):
+        """Zapamatuje klíč až po uložení - neuložený upload konzole smí zopakovat"""
+        if key is None or self.size <= 0:
+            return
+        with self._lock:
+            self._keys[key] = True
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.size:
+                self._keys.popitem(last=False)
+
+    def suppressed_by_db(self, count):
+        with self._lock:
+            self.stats['suppressed_db'] += count
+
+    def metrics(self):
+        with self._lock:
+            return {'cache_size': len(self._keys), **self.stats}
+
+
+recent_uploads = RecentUploads()
+
+
+def record_key(record):
+    """Klíč uloženého záznamu (wsid, datetime s časovou zónou); bez času z konzole None"""
+    station_time = record.get('datetime')
+    if station_time is None:
+        return None
+    try:
+        station_time = as_timestamp(station_time)
+        # parse_wslink bez platného času z konzole použije čas přijetí
+        if station_time == as_timestamp(record.get('received_at')):
+            return None
+    except (TypeError, ValueError):
+        return None
+    return record.get('wsid') or '', station_time
+
+
+def _fresh(rows, keys, inserted):
+    """Záznamy, jejichž klíč se právě vložil (nebo klíč nemají); každý klíč jen jednou"""
+    inserted = {(wsid, as_timestamp(station_time)) for wsid, station_time in inserted}
+    fresh = []
+    for row, key in zip(rows, keys):
+        if key is None:
+            fresh.append(row)
+        elif key in inserted:
+            inserted.discard(key)
+            fresh.append(row)
+    recent_uploads.suppressed_by_db(len(rows) - len(fresh))
+    return fresh
+
+
+def fresh_rows(cur, rows):
+    """Zapíše klíče dávky a vrátí jen záznamy, které v databázi ještě nejsou"""
+    keys = [record_key(row) for row in rows]
+    unique = list(dict.fromkeys(k for k in keys if k is not None))
+    if not unique:
+        return rows
+    inserted = execute_values(cur, INSERT_KEYS_SQL, unique, page_size=len(unique), fetch=True)
+    return _fresh(rows, keys, inserted)
+
+
+async def fresh_rows_async(conn, rows):
+    """Totéž pro asyncpg"""
+    keys = [record_key(row) for row in rows]
+    unique = list(dict.fromkeys(k for k in keys if k is not None))
+    if not unique:
+        return rows
+    inserted = await conn.fetch(INSERT_KEYS_SQL_ASYNC, [k[0] for k in unique], [k[1] for k in unique])
+    return _fresh(rows, keys, [tuple(r) for r in inserted])
+
+
+def create_upload_keys(cur, backfill=True):
+    """Tabulka klíčů s klíči nedávných záznamů, aby se chytila i opakování těsně po nasazení"""
+    cur.execute(CREATE_UPLOAD_KEYS_SQL)
+    if not backfill:
+        return
+    cur.execute("""
+        INSERT INTO meteo_upload_keys (wsid, datetime)
+        SELECT DISTINCT coalesce(wsid, ''), datetime FROM meteo_data
+        WHERE received_at >= now() - make_interval(days => %s)
+          AND datetime IS NOT NULL AND datetime <> received_at
+        ON CONFLICT DO NOTHING
+    """, (DEDUP_KEY_RETENTION_DAYS,))
+
+
+def prune_upload_keys(cur, now=None):
+    """Smaže klíče starší než DEDUP_KEY_RETENTION_DAYS; vrací počet smazaných"""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=DEDUP_KEY_RETENTION_DAYS)
+    cur.execute("DELETE FROM meteo_upload_keys WHERE datetime < %s", (cutoff,))
+    return cur.rowcount
+
+
+def dedup_stats():
+    return recent_uploads.metrics()
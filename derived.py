@@ -0,0 +1,300 @@
+"""Odvozené meteorologické veličiny nad celými sloupci (NumPy).
+
+Pocitovou teplotu, wind chill, heat index, rosný bod a WBGT posílá konzole
+jen někdy - starší záznamy a stanice bez venkovního čidla je mají null.
+Funkce tady berou pole (nebo jednotlivá čísla) a počítají po celých
+sloupcích najednou; chybějící vstup (NaN) dá NaN. Teploty jsou ve °C,
+vlhkost v %, vítr v m/s a tlak v hPa jako v meteo_data.
+
+fill_missing() doplní u záznamů jen hodnoty, které chybí. Používá ho
+dopočet historie (backfill_derived, ``python derived.py``) i /api/series,
+které odvozené veličiny počítá ze surových dat za běhu.
+
+Přepočet mezi absolutním a relativním tlakem potřebuje nadmořskou výšku
+stanice: STATION_ALTITUDE pro všechny stanice, STATION_ALTITUDES pro
+jednotlivé ("garni001=245,garni002=410"). Bez ní se tlak nedopočítává.
+"""
+import argparse
+import os
+
+from psycopg2.extras import execute_values
+
+from db import get_db_connection, release_db_connection
+from logs import get_logger
+from rollups import ROLLUP_METRICS, refresh_metrics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = get_logger(__name__)
+
+STATION_ALTITUDE = float(os.environ['STATION_ALTITUDE']) if os.environ.get('STATION_ALTITUDE') else None
+STATION_ALTITUDES = {
+    wsid: float(altitude) for wsid, altitude in (
+        item.split('=', 1) for item in os.environ.get('STATION_ALTITUDES', '').split(',') if '=' in item
+    )
+}
+DERIVED_BATCH_SIZE = int(os.environ.get('DERIVED_BATCH_SIZE', 5000))
+
+# Magnusův vzorec (Sonntag 1990)
+MAGNUS_A, MAGNUS_B, MAGNUS_C = 6.112, 17.62, 243.12
+# Standardní atmosféra: teplotní gradient K/m a exponent barometrické rovnice
+LAPSE_RATE = 0.0065
+BAROMETRIC_EXPONENT = 5.257
+# Wind chill platí jen pro chladno a vítr, heat index jen pro horko
+WIND_CHILL_MAX_TEMP = 10.0
+WIND_CHILL_MIN_WIND = 4.8 / 3.6
+HEAT_INDEX_MIN_TEMP = 26.7
+
+
+def _array(value):
+    return np.asarray(value, dtype=np.float64)
+
+
+def station_altitude(wsid):
+    """Nadmořská výška stanice v metrech (None, když není nastavená)"""
+    return STATION_ALTITUDES.get(wsid, STATION_ALTITUDE)
+
+
+def altitude_sql():
+    """Výraz SQL s nadmořskou výškou stanice podle wsid (NULL bez nastavené výšky); vrací (sql, parametry)"""
+    params = [value for item in STATION_ALTITUDES.items() for value in item]
+    cases = ''.join(' WHEN %s THEN %s::float8' for _ in STATION_ALTITUDES)
+    sql = f"CASE wsid{cases} ELSE %s::float8 END" if cases else "%s::float8"
+    return sql, params + [STATION_ALTITUDE]
+
+
+def saturation_vapour_pressure(temp):
+    """Tlak nasycených vodních par (hPa)"""
+    temp = _array(temp)
+    return MAGNUS_A * np.exp(MAGNUS_B * temp / (MAGNUS_C + temp))
+
+
+def vapour_pressure(temp, humidity):
+    """Parciální tlak vodní páry (hPa)"""
+    return saturation_vapour_pressure(temp) * _array(humidity) / 100
+
+
+def absolute_humidity(temp, humidity):
+    """Absolutní vlhkost (g/m³)"""
+    return 216.7 * vapour_pressure(temp, humidity) / (_array(temp) + 273.15)
+
+
+def dew_point(temp, humidity):
+    """Rosný bod (°C); vlhkost pod 1 % se počítá jako 1 %"""
+    temp = _array(temp)
+    gamma = np.log(np.clip(_array(humidity), 1, 100) / 100) + MAGNUS_B * temp / (MAGNUS_C + temp)
+    return MAGNUS_C * gamma / (MAGNUS_B - gamma)
+
+
+def wind_chill(temp, wind_speed):
+    """Ochlazování větrem (°C, vzorec JAG/TI); mimo platnost vrací teplotu"""
+    temp = _array(temp)
+    wind_speed = _array(wind_speed)
+    v = np.power(wind_speed * 3.6, 0.16)
+    chill = 13.12 + 0.6215 * temp - 11.37 * v + 0.3965 * temp * v
+    return np.where((temp <= WIND_CHILL_MAX_TEMP) & (wind_speed > WIND_CHILL_MIN_WIND), chill, temp)
+
+
+def heat_index(temp, humidity):
+    """Heat index (°C, regrese NWS včetně korekcí); pod 26,7 °C vrací teplotu"""
+    temp = _array(temp)
+    rh = _array(humidity)
+    t = temp * 9 / 5 + 32
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    full = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+            - 6.83783e-3 * t * t - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+            + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+    with np.errstate(invalid='ignore'):
+        dry = np.sqrt(np.clip((17 - np.abs(t - 95)) / 17, 0, None)) * (13 - rh) / 4
+    full = np.where((rh < 13) & (t >= 80) & (t <= 112), full - dry, full)
+    full = np.where((rh > 85) & (t >= 80) & (t <= 87), full + (rh - 85) / 10 * (87 - t) / 5, full)
+    index_f = np.where((simple + t) / 2 >= 80, full, simple)
+    return np.where(temp >= HEAT_INDEX_MIN_TEMP, (index_f - 32) * 5 / 9, temp)
+
+
+def feels_like(temp, humidity, wind_speed):
+    """Pocitová teplota: wind chill v chladu a větru, heat index v horku, jinak teplota"""
+    temp = _array(temp)
+    cold = (temp <= WIND_CHILL_MAX_TEMP) & (_array(wind_speed) > WIND_CHILL_MIN_WIND)
+    hot = temp >= HEAT_INDEX_MIN_TEMP
+    return np.where(cold, wind_chill(temp, wind_speed), np.where(hot, heat_index(temp, humidity), temp))
+
+
+def wbgt(temp, humidity):
+    """Odhad WBGT ve stínu z teploty a vlhkosti (°C, aproximace australského BoM)"""
+    return 0.567 * _array(temp) + 0.393 * vapour_pressure(temp, humidity) + 3.94
+
+
+def sea_level_pressure(pressure, altitude, temp=15.0):
+    """Tlak přepočtený na hladinu moře (relativní) z tlaku v místě stanice"""
+    h = LAPSE_RATE * _array(altitude)
+    return _array(pressure) * np.power(1 - h / (_array(temp) + h + 273.15), -BAROMETRIC_EXPONENT)
+
+
+def station_pressure(pressure, altitude, temp=15.0):
+    """Opak sea_level_pressure: tlak v místě stanice (absolutní) z relativního"""
+    h = LAPSE_RATE * _array(altitude)
+    return _array(pressure) * np.power(1 - h / (_array(temp) + h + 273.15), BAROMETRIC_EXPONENT)
+
+
+def _pressure_temp(columns):
+    # Bez venkovní teploty počítáme se standardními 15 °C
+    return np.nan_to_num(columns['outdoor_temp'], nan=15.0)
+
+
+# Sloupec meteo_data -> (vstupní sloupce, výpočet ze slovníku sloupců)
+DERIVED_COLUMNS = {
+    'dew_point': (('outdoor_temp', 'outdoor_humidity'),
+                  lambda c: dew_point(c['outdoor_temp'], c['outdoor_humidity'])),
+    'heat_index': (('outdoor_temp', 'outdoor_humidity'),
+                   lambda c: heat_index(c['outdoor_temp'], c['outdoor_humidity'])),
+    'wind_chill': (('outdoor_temp', 'wind_speed'),
+                   lambda c: wind_chill(c['outdoor_temp'], c['wind_speed'])),
+    'feels_like': (('outdoor_temp', 'outdoor_humidity', 'wind_speed'),
+                   lambda c: feels_like(c['outdoor_temp'], c['outdoor_humidity'], c['wind_speed'])),
+    'wbgt_temp': (('outdoor_temp', 'outdoor_humidity'),
+                  lambda c: wbgt(c['outdoor_temp'], c['outdoor_humidity'])),
+    'relative_pressure': (('absolute_pressure', 'outdoor_temp', 'altitude'),
+                          lambda c: sea_level_pressure(c['absolute_pressure'], c['altitude'], _pressure_temp(c))),
+    'absolute_pressure': (('relative_pressure', 'outdoor_temp', 'altitude'),
+                          lambda c: station_pressure(c['relative_pressure'], c['altitude'], _pressure_temp(c))),
+}
+
+# Veličiny, které v tabulce nejsou a počítají se vždy
+COMPUTED_METRICS = {
+    'vapour_pressure': (('outdoor_temp', 'outdoor_humidity'),
+                        lambda c: vapour_pressure(c['outdoor_temp'], c['outdoor_humidity'])),
+    'absolute_humidity': (('outdoor_temp', 'outdoor_humidity'),
+                          lambda c: absolute_humidity(c['outdoor_temp'], c['outdoor_humidity'])),
+}
+
+
+def metric_inputs(metric):
+    """Sloupce meteo_data, ze kterých se veličina čte nebo počítá (bez 'altitude')"""
+    if metric in COMPUTED_METRICS:
+        inputs = COMPUTED_METRICS[metric][0]
+    elif metric in DERIVED_COLUMNS:
+        inputs = (metric,) + DERIVED_COLUMNS[metric][0]
+    else:
+        inputs = (metric,)
+    return tuple(c for c in dict.fromkeys(inputs) if c != 'altitude')
+
+
+def needs_altitude(metric):
+    """Potřebuje výpočet veličiny nadmořskou výšku stanice (přepočet tlaku)?"""
+    return metric in DERIVED_COLUMNS and 'altitude' in DERIVED_COLUMNS[metric][0]
+
+
+def compute_metric(metric, columns):
+    """Hodnoty veličiny ze sloupců; uložené hodnoty mají přednost před dopočtenými"""
+    if metric in COMPUTED_METRICS:
+        return COMPUTED_METRICS[metric][1](columns)
+    values = _array(columns[metric])
+    if metric in DERIVED_COLUMNS and all(c in columns for c in DERIVED_COLUMNS[metric][0]):
+        with np.errstate(invalid='ignore', over='ignore'):
+            values = np.where(np.isnan(values), DERIVED_COLUMNS[metric][1](columns), values)
+    return values
+
+
+def columns_from_records(records, names):
+    """Záznamy (slovníky) jako sloupce float64, None -> NaN"""
+    return {name: np.array([r.get(name) for r in records], dtype=np.float64) for name in names}
+
+
+def altitudes(wsids):
+    """Sloupec nadmořských výšek podle stanic (NaN, když výška není nastavená)"""
+    known = {wsid: station_altitude(wsid) for wsid in set(wsids)}
+    return np.array([np.nan if known[w] is None else known[w] for w in wsids], dtype=np.float64)
+
+
+def fill_missing(columns):
+    """Doplní chybějící odvozené sloupce; vrací {sloupec: pole}, jen pro sloupce, které šly počítat
+
+    Odvozené hodnoty se počítají z uložených vstupů, ne z jiných dopočtených.
+    """
+    filled = {}
+    with np.errstate(invalid='ignore', over='ignore'):
+        for column, (inputs, compute) in DERIVED_COLUMNS.items():
+            if column not in columns or not all(c in columns for c in inputs):
+                continue
+            current = columns[column]
+            filled[column] = np.where(np.isnan(current), np.round(compute(columns), 1), current)
+    return filled
+
+
+def _backfill_batch(cur, after_id, batch_size):
+    inputs = sorted({c for inputs, _ in DERIVED_COLUMNS.values() for c in inputs if c != 'altitude'}
+                    | set(DERIVED_COLUMNS))
+    missing = ' OR '.join(f'{c} IS NULL' for c in DERIVED_COLUMNS)
+    cur.execute(f"""
+        SELECT id, received_at, wsid, {', '.join(inputs)} FROM meteo_data
+        WHERE id > %s AND ({missing})
+        ORDER BY id LIMIT %s
+    """, (after_id, batch_size))
+    rows = cur.fetchall()
+    if not rows:
+        return None, 0, 0
+    last_id, checked = rows[-1][0], len(rows)
+    columns = {name: np.array([r[i + 3] for r in rows], dtype=np.float64) for i, name in enumerate(inputs)}
+    columns['altitude'] = altitudes([r[2] for r in rows])
+    filled = fill_missing(columns)
+    names = list(filled)
+    matrix = np.column_stack([filled[n] for n in names])
+    # Přepisujeme jen řádky, kterým opravdu něco přibylo
+    changed = (np.isnan(np.column_stack([columns[n] for n in names])) & ~np.isnan(matrix)).any(axis=1)
+    if not changed.any():
+        return last_id, checked, 0
+    values = matrix[changed].astype(object)
+    # NaN (vstup chybí) zůstane NULL
+    values[np.isnan(matrix[changed])] = None
+    rows = [r for r, keep in zip(rows, changed) if keep]
+    execute_values(cur, f"""
+        UPDATE meteo_data AS m SET {', '.join(f'{n} = v.{n}' for n in names)}
+        FROM (VALUES %s) AS v(id, received_at, {', '.join(names)})
+        WHERE m.id = v.id AND m.received_at = v.received_at
+    """, [(r[0], r[1], *v) for r, v in zip(rows, values.tolist())],
+        template='(%s, %s::timestamptz, ' + ', '.join(['%s::float8'] * len(names)) + ')')
+    # Doplněné veličiny, které se agregují (relative_pressure), musí dostat i meteo_rollup
+    refresh_metrics(cur, [(r[2], r[1]) for r in rows], [n for n in names if n in ROLLUP_METRICS])
+    return last_id, checked, len(rows)
+
+
+def backfill_derived(conn, batch_size=DERIVED_BATCH_SIZE):
+    """Dopočítá chybějící odvozené hodnoty v meteo_data po dávkách (commit po každé)
+
+    Vrací počet upravených řádků.
+    """
+    cur = conn.cursor()
+    after_id, checked, updated = 0, 0, 0
+    while True:
+        after_id, batch_checked, batch_updated = _backfill_batch(cur, after_id, batch_size)
+        conn.commit()
+        if not batch_checked:
+            break
+        checked += batch_checked
+        updated += batch_updated
+        log.info(f"♻️ Derived values: {updated:,} of {checked:,} checked rows updated")
+    cur.close()
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill missing derived values in meteo_data')
+    parser.add_argument('--batch-size', type=int, default=DERIVED_BATCH_SIZE)
+    args = parser.parse_args()
+    if np is None:
+        raise SystemExit("numpy is not installed (pip install numpy)")
+    conn = get_db_connection()
+    if not conn:
+        raise SystemExit("DATABASE_URL is not set")
+    try:
+        print(f"✅ {backfill_derived(conn, args.batch_size):,} rows backfilled")
+    finally:
+        release_db_connection(conn)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Streamovaný export dat (CSV, NDJSON, Parquet).
+
+Řádky se čtou serverovým (pojmenovaným) kurzorem po dávkách a hned se
+posílají klientovi, takže paměť nezávisí na délce exportovaného období.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+from psycopg2.extras import RealDictCursor
+
+from db import get_db_connection, release_db_connection
+from schema import COLUMN_TYPES, build_data_query
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 5000))
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def iter_batches(columns, station=None, start=None, end=None, fallback=None):
+    """Generátor dávek záznamů (seznamů slovníků) od nejstaršího
+
+    Bez databáze čte záznamy z iterátoru `fallback()`.
+    """
+    conn = get_db_connection()
+    if not conn:
+        records = iter(fallback() if fallback else ())
+        while True:
+            rows = list(islice(records, EXPORT_BATCH_SIZE))
+            if not rows:
+                return
+            yield rows
+
+    sql, params = build_data_query(station, start, end, limit=None, columns=columns, ascending=True)
+    broken = True
+    try:
+        # Pojmenovaný kurzor = řádky zůstávají na serveru, stahujeme je po dávkách
+        cur = conn.cursor(name='meteo_export', cursor_factory=RealDictCursor)
+        cur.itersize = EXPORT_BATCH_SIZE
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+        cur.close()
+        conn.commit()
+        broken = False
+    finally:
+        # I při přerušeném stahování (klient odpojen) vrátíme spojení do poolu
+        release_db_connection(conn, broken=broken)
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def csv_stream(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([_text(row.get(c)) for c in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def ndjson_stream(columns, batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps({c: row.get(c) for c in columns}, ensure_ascii=False, default=_json_default) + '\n'
+            for row in rows
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Zapisovatelný soubor, ze kterého si stream průběžně vybírá zapsané bajty"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parquet_stream(columns, batches):
+    """Každá dávka se zapíše jako samostatná row group a hned odešle"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {'FLOAT': pa.float64(), 'INTEGER': pa.int64(), 'VARCHAR(50)': pa.string(),
+                   'TIMESTAMP': pa.timestamp('us'), 'TIMESTAMPTZ': pa.timestamp('us', tz='UTC')}
+    column_types = dict(COLUMN_TYPES, id='INTEGER', created_at='TIMESTAMP')
+    schema = pa.schema([(c, arrow_types.get(column_types.get(c), pa.string())) for c in columns])
+    timestamps = [c for c in columns if column_types.get(c) == 'TIMESTAMP']
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in batches:
+        records = [{c: row.get(c) for c in columns} for row in rows]
+        for record in records:
+            # Záznamy ze souboru mají čas jako text
+            for c in timestamps:
+                if isinstance(record[c], str):
+                    record[c] = datetime.fromisoformat(record[c])
+        table = pa.Table.from_pylist(records, schema=schema)
+        writer.write_table(table)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
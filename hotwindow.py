@@ -0,0 +1,600 @@
+"""Okno posledních dat v paměti procesu (posledních HOT_WINDOW_HOURS hodin).
+
+Dashboard čte skoro jen čerstvá data - aktuální hodnoty, statistiky za 24 h
+a posledních pár desítek záznamů. Okno je drží po stanicích ve sloupcích:
+každá veličina je souvislé pole float64 (NULL = NaN), id a časy jsou pole
+int64 (mikrosekundy od epochy), záznamy seřazené podle (received_at, id).
+Výběr rozsahu je pak binární hledání a statistiky jsou operace NumPy nad
+výřezy polí místo dotazu do databáze.
+
+Paměť: záznam zabere 8 B na každý číselný sloupec plus id a tři časy, při
+74 veličinách tedy 624 B. Stanice s uploadem jednou za minutu potřebuje
+1440 * 624 B = 0,86 MiB za den, 48 h okno 1,7 MiB. Pole se zvětšují
+zdvojením, nejvýš na HOT_WINDOW_ROWS záznamů na stanici (výchozí 5760 =
+48 h při uploadu každých 30 s, tj. nejvýš 3,4 MiB na stanici); při
+rychlejším uploadu se zahodí nejstarší záznamy a okno pokrývá kratší dobu.
+Skutečné číslo ukáže bench/hot_window.py.
+
+Okno se plní:
+
+- při startu z DB (load) záznamy za posledních HOT_WINDOW_HOURS hodin,
+- po commitu uploadu v tomto procesu (add, s id z INSERT ... RETURNING),
+- dotazem na přírůstky nejvýš jednou za HOT_WINDOW_REFRESH sekund -
+  záznamy z rozsahu okna s vyšším id než dosud viděné nebo přijaté
+  v posledních HOT_WINDOW_LAG sekundách, takže se dostanou i zápisy
+  ostatních workerů a asynchronního příjmu (ingest_async.py).
+
+Záznamy se řadí podle (received_at, id) jako v build_data_query; id podle
+času přijetí neroste (importovaná historie dostane vyšší id, importer.py).
+
+Stanic drží okno nejvýš MAX_STATIONS (wsid posílá klient). Nová stanice
+navíc vytlačí tu s nejstarším posledním záznamem a okno pak pokrývá
+všechny stanice až od jejího posledního záznamu.
+
+Dotaz, který okno nepokryje celý (začátek před oknem, málo záznamů pro
+limit), vrátí None a čte se z databáze jako dřív. Bez databáze se okno
+nenaplní a nepoužije; bez NumPy (nebo s HOT_WINDOW=0) je vypnuté.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import RealDictCursor
+
+from db import get_db_connection, release_db_connection
+from logs import get_logger
+from rollups import ROLLUP_METRICS, new_aggregate
+from schema import COLUMN_TYPES, INSERT_COLUMNS, MAX_STATIONS, QUERYABLE_COLUMNS, as_timestamp
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = get_logger(__name__)
+
+HOT_WINDOW = os.environ.get('HOT_WINDOW', '1') != '0'
+HOT_WINDOW_HOURS = float(os.environ.get('HOT_WINDOW_HOURS', 48))
+HOT_WINDOW_ROWS = int(os.environ.get('HOT_WINDOW_ROWS', 5760))
+HOT_WINDOW_REFRESH = float(os.environ.get('HOT_WINDOW_REFRESH', 5))
+HOT_WINDOW_LAG = float(os.environ.get('HOT_WINDOW_LAG', 60))
+
+# Sloupce okna: celá čísla (id a časy v mikrosekundách) a číselné veličiny
+STAMP_COLUMNS = ('id', 'received_at', 'datetime', 'created_at')
+VALUE_COLUMNS = tuple(c for c in INSERT_COLUMNS if COLUMN_TYPES[c] in ('FLOAT', 'INTEGER'))
+INTEGER_COLUMNS = frozenset(c for c in VALUE_COLUMNS if COLUMN_TYPES[c] == 'INTEGER')
+ROW_BYTES = 8 * (len(STAMP_COLUMNS) + len(VALUE_COLUMNS))
+
+ID, RECEIVED, DATETIME, CREATED = range(len(STAMP_COLUMNS))
+_VALUE_INDEX = {c: i for i, c in enumerate(VALUE_COLUMNS)}
+_RAIN = ('rain_daily', 'rain_yearly')
+
+# NULL v celočíselných polích
+MISSING = -2 ** 63
+MIN_CAPACITY = 256
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_US = timedelta(microseconds=1)
+
+
+def hot_window_available():
+    return np is not None
+
+
+def to_us(value):
+    """Čas (i text ze spill souboru) na mikrosekundy od epochy; naivní čas je místní čas serveru"""
+    return (as_timestamp(value) - _EPOCH) // _US
+
+
+def _created_us(value):
+    # created_at je TIMESTAMP bez zóny - ukládá se tak, jak je
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return (value - _NAIVE_EPOCH) // _US
+
+
+def _stamp(value, convert):
+    if value is None:
+        return MISSING
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def window_query(after_id, since, start=None):
+    """SELECT záznamů přijatých od `start` s id > after_id nebo přijatých od `since`; vrací (sql, parametry)
+
+    Dolní mez `start` (začátek okna) drží dotaz v posledních oddílech - import
+    historie dostane vyšší id, ale do okna nepatří a nemá se ani načítat.
+    """
+    if after_id is None:
+        return 'SELECT * FROM meteo_data WHERE received_at >= %s', [since]
+    return ('SELECT * FROM meteo_data WHERE received_at >= %s AND (id > %s OR received_at >= %s)',
+            [start or since, after_id, since])
+
+
+def load_window(after_id, since, start=None):
+    """Záznamy pro okno z DB (viz window_query); bez databáze None"""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        sql, params = window_query(after_id, since, start)
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        cur.close()
+    except Exception:
+        release_db_connection(conn, broken=conn.closed)
+        raise
+    release_db_connection(conn)
+    return rows
+
+
+class StationWindow:
+    """Záznamy jedné stanice ve sloupcích seřazené podle (received_at, id)"""
+
+    __slots__ = ('stamps', 'values', 'size', 'covered_from')
+
+    def __init__(self, covered_from):
+        self.stamps = np.empty((len(STAMP_COLUMNS), 0), dtype=np.int64)
+        self.values = np.empty((len(VALUE_COLUMNS), 0), dtype=np.float64)
+        self.size = 0
+        # Od tohoto času (µs) má okno všechny záznamy stanice
+        self.covered_from = covered_from
+
+    @property
+    def received(self):
+        return self.stamps[RECEIVED, :self.size]
+
+    @property
+    def ids(self):
+        return self.stamps[ID, :self.size]
+
+    def column(self, name):
+        return self.values[_VALUE_INDEX[name], :self.size]
+
+    def nbytes(self):
+        return self.stamps.nbytes + self.values.nbytes
+
+    def _reserve(self, rows, max_rows):
+        capacity = self.stamps.shape[1]
+        if rows <= capacity:
+            return
+        capacity = min(max(rows, capacity * 2, MIN_CAPACITY), max_rows)
+        stamps = np.empty((len(STAMP_COLUMNS), capacity), dtype=np.int64)
+        values = np.empty((len(VALUE_COLUMNS), capacity), dtype=np.float64)
+        stamps[:, :self.size] = self.stamps[:, :self.size]
+        values[:, :self.size] = self.values[:, :self.size]
+        self.stamps, self.values = stamps, values
+
+    def merge(self, stamps, values, max_rows):
+        """Přidá blok záznamů (sloupce jako 2D pole); už známá id přeskočí"""
+        n = self.size
+        last = (self.stamps[RECEIVED, n - 1], self.stamps[ID, n - 1]) if n else None
+        if stamps.shape[1] == 1 and (last is None or (stamps[RECEIVED, 0], stamps[ID, 0]) > last) \
+                and n < max_rows:
+            # Běžný případ - nový upload na konec
+            self._reserve(n + 1, max_rows)
+            self.stamps[:, n] = stamps[:, 0]
+            self.values[:, n] = values[:, 0]
+            self.size = n + 1
+            return
+
+        stamps = np.concatenate([self.stamps[:, :n], stamps], axis=1)
+        values = np.concatenate([self.values[:, :n], values], axis=1)
+        order = np.lexsort((stamps[ID], stamps[RECEIVED]))
+        stamps, values = stamps[:, order], values[:, order]
+        # Stejné id má i stejný received_at, takže duplikáty jsou po seřazení vedle sebe
+        unique = np.ones(stamps.shape[1], dtype=bool)
+        unique[1:] = stamps[ID, 1:] != stamps[ID, :-1]
+        stamps, values = stamps[:, unique], values[:, unique]
+        if stamps.shape[1] > max_rows:
+            # Plné okno - nejstarší záznamy vypadnou a okno pokrývá kratší dobu
+            stamps, values = stamps[:, -max_rows:], values[:, -max_rows:]
+            self.covered_from = max(self.covered_from, int(stamps[RECEIVED, 0]) + 1)
+        self.size = 0
+        self._reserve(stamps.shape[1], max_rows)
+        self.size = stamps.shape[1]
+        self.stamps[:, :self.size] = stamps
+        self.values[:, :self.size] = values
+
+    def expire(self, cutoff):
+        """Zahodí záznamy přijaté před `cutoff` (µs)"""
+        k = int(np.searchsorted(self.received, cutoff, 'left'))
+        if k:
+            self.stamps[:, :self.size - k] = self.stamps[:, k:self.size]
+            self.values[:, :self.size - k] = self.values[:, k:self.size]
+            self.size -= k
+        self.covered_from = max(self.covered_from, cutoff)
+
+
+def _block(records):
+    """Záznamy jako sloupce (stamps, values) pro StationWindow.merge"""
+    stamps = np.array([
+        (_stamp(r.get('id'), int), _stamp(r.get('received_at'), to_us),
+         _stamp(r.get('datetime'), to_us), _stamp(r.get('created_at'), _created_us))
+        for r in records
+    ], dtype=np.int64).reshape(len(records), len(STAMP_COLUMNS)).T
+    values = np.array([[r.get(c) for c in VALUE_COLUMNS] for r in records],
+                      dtype=np.float64).reshape(len(records), len(VALUE_COLUMNS)).T
+    return stamps, values
+
+
+def _times(values, naive=False):
+    epoch = _NAIVE_EPOCH if naive else _EPOCH
+    return [None if v == MISSING else epoch + timedelta(microseconds=v) for v in values.tolist()]
+
+
+def _numbers(values, integer):
+    missing = np.isnan(values)
+    if not missing.any():
+        return (values.astype(np.int64) if integer else values).tolist()
+    out = np.full(len(values), None, dtype=object)
+    present = values[~missing]
+    out[~missing] = (present.astype(np.int64) if integer else present).tolist()
+    return out.tolist()
+
+
+class HotWindow:
+    """Okna všech stanic; loader(after_id, since, start) vrací záznamy z DB (None = databáze není)"""
+
+    __slots__ = ('loader', 'hours', 'max_rows', 'max_stations', 'refresh_interval', 'lag', 'stats',
+                 '_stations', '_covered_from', '_max_id', '_high_water', '_newest', '_loaded',
+                 '_refreshed_at', '_lock', '_refresh_lock', '_pid')
+
+    def __init__(self, loader, hours=HOT_WINDOW_HOURS, max_rows=HOT_WINDOW_ROWS,
+                 refresh_interval=HOT_WINDOW_REFRESH, lag=HOT_WINDOW_LAG, max_stations=MAX_STATIONS):
+        self.loader = loader
+        self.hours = hours
+        self.max_rows = max_rows
+        self.max_stations = max(1, max_stations)
+        self.refresh_interval = refresh_interval
+        self.lag = lag
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0, 'evictions': 0}
+        self._stations = {}         # wsid -> StationWindow
+        self._covered_from = 0      # µs; od kdy má okno všechny záznamy všech stanic
+        self._max_id = None
+        self._high_water = 0        # nejnovější received_at (µs) načtený z DB
+        self._newest = 0            # nejnovější received_at (µs) v okně
+        self._loaded = False
+        self._refreshed_at = float('-inf')
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def enabled(self):
+        return HOT_WINDOW and np is not None
+
+    def _check_pid(self):
+        # Po forku gunicornu data z předního procesu platí, zámky se ale musí založit znovu
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._refresh_lock = threading.Lock()
+
+    def _cutoff(self):
+        return to_us(datetime.now(timezone.utc) - timedelta(hours=self.hours))
+
+    def load(self):
+        """Naplní okno z DB (při startu); vrací počet záznamů nebo None"""
+        if not self.enabled():
+            return None
+        self._check_pid()
+        started = time.perf_counter()
+        with self._refresh_lock:
+            cutoff = self._cutoff()
+            start = _EPOCH + timedelta(microseconds=cutoff)
+            records = self._load(None, start, start)
+            if records is None:
+                return None
+            with self._lock:
+                self._stations = {}
+                self._covered_from = cutoff
+                self._high_water = cutoff
+                self._max_id = None
+                self._newest = 0
+                self._extend(records, from_db=True)
+                self._loaded = True
+        log.info(f"🔥 Hot window loaded: {len(records)} rows, {len(self._stations)} stations",
+                 extra={'seconds': round(time.perf_counter() - started, 3)})
+        return len(records)
+
+    def refresh(self):
+        """Dotáhne přírůstky z DB a zahodí záznamy starší než okno"""
+        with self._refresh_lock:
+            if time.monotonic() - self._refreshed_at < self.refresh_interval:
+                # Mezitím obnovil jiný požadavek
+                return True
+            since = _EPOCH + timedelta(microseconds=self._high_water) - timedelta(seconds=self.lag)
+            records = self._load(self._max_id, since, _EPOCH + timedelta(microseconds=self._cutoff()))
+            if records is None:
+                return False
+            with self._lock:
+                self._extend(records, from_db=True)
+                cutoff = self._cutoff()
+                for wsid, station in list(self._stations.items()):
+                    station.expire(cutoff)
+                    if not station.size:
+                        del self._stations[wsid]
+                self._covered_from = max(self._covered_from, cutoff)
+                self.stats['refreshes'] += 1
+            return True
+
+    def _load(self, after_id, since, start):
+        self._refreshed_at = time.monotonic()
+        try:
+            return self.loader(after_id, since, start)
+        except Exception as e:
+            log.error(f"❌ Error loading hot window: {e}")
+            self.stats['refresh_errors'] += 1
+            return None
+
+    def add(self, records):
+        """Záznamy uložené tímto procesem (po commitu, s id a created_at)"""
+        if not self._loaded or not records:
+            return
+        self._check_pid()
+        with self._lock:
+            self._extend(records)
+
+    def _extend(self, records, from_db=False):
+        cutoff = self._covered_from
+        by_station = {}
+        for record in records:
+            by_station.setdefault(record.get('wsid'), []).append(record)
+        for wsid, rows in by_station.items():
+            stamps, values = _block(rows)
+            # Importovaná historie dostane nová id, do okna ale nepatří
+            keep = (stamps[RECEIVED] >= cutoff) & (stamps[ID] != MISSING)
+            if from_db and len(rows):
+                self._max_id = max(self._max_id or 0, int(stamps[ID].max()))
+                self._high_water = max(self._high_water, int(stamps[RECEIVED].max()))
+            if not keep.any():
+                continue
+            stamps, values = stamps[:, keep], values[:, keep]
+            station = self._stations.get(wsid)
+            if station is None:
+                if len(self._stations) >= self.max_stations:
+                    self._evict()
+                station = self._stations[wsid] = StationWindow(self._covered_from)
+            station.merge(stamps, values, self.max_rows)
+            self._newest = max(self._newest, int(stamps[RECEIVED].max()))
+
+    def _evict(self):
+        """Vytlačí stanici s nejstarším posledním záznamem"""
+        wsid, station = min(self._stations.items(),
+                            key=lambda item: item[1].received[-1] if item[1].size else MISSING)
+        del self._stations[wsid]
+        # Její záznamy v okně chybí - dotazy přes všechny stanice (a na ni) z dřívějška jdou do DB
+        if station.size:
+            self._covered_from = max(self._covered_from, int(station.received[-1]) + 1)
+        self.stats['evictions'] += 1
+
+    def _sync(self, newest=None):
+        """Obnoví okno, je-li starší než refresh_interval nebo než `newest`; False = číst z DB"""
+        if not self.enabled():
+            return False
+        self._check_pid()
+        if not self._loaded:
+            if time.monotonic() - self._refreshed_at < self.refresh_interval or self.load() is None:
+                return False
+        behind = newest is not None and to_us(newest) > self._newest
+        if behind or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            if behind:
+                self._refreshed_at = float('-inf')
+            if not self.refresh():
+                return False
+        return newest is None or to_us(newest) <= self._newest
+
+    def _result(self, served):
+        self.stats['hits' if served is not None else 'misses'] += 1
+        return served
+
+    def select(self, station=None, start=None, end=None, limit=1000, columns=None, before=None,
+               since=None, newest=None):
+        """Stejný výběr jako load_data (build_data_query), nebo None, když ho okno nepokryje
+
+        `newest` je čas nejnovějšího záznamu, o kterém proces ví (verze dat
+        pro ETag) - okno bez něj by vrátilo zastaralou odpověď pod novou verzí.
+        """
+        if not self._sync(newest):
+            return self._result(None)
+        with self._lock:
+            return self._result(self._select(station, start, end, limit, columns, before, since))
+
+    def _select(self, station, start, end, limit, columns, before, since):
+        if station:
+            windows = {station: self._stations[station]} if station in self._stations else {}
+            covered_from = windows[station].covered_from if windows else self._covered_from
+        else:
+            windows = self._stations
+            covered_from = max([self._covered_from] + [w.covered_from for w in windows.values()])
+        after_id = since if isinstance(since, int) else None
+        after_time = since if isinstance(since, datetime) else None
+        if start is not None and to_us(start) < covered_from:
+            return None
+        if after_time is not None and to_us(after_time) < covered_from:
+            return None
+        if before is not None and before[1] is None:
+            # Kurzor ze záznamu bez id (lokální úložiště)
+            return None
+        after = None
+        if after_id is not None:
+            # since=<id> je kurzor (received_at, id) záznamu s tím id - ten musí být v okně
+            after = self._cursor_of(after_id)
+            if after is None or after[0] < covered_from:
+                return None
+
+        # Kandidáti: (okno, indexy řádků) po filtrech na čas a kurzor
+        picked = []
+        for wsid, w in windows.items():
+            received, ids = w.received, w.ids
+            lo = int(np.searchsorted(received, to_us(start), 'left')) if start is not None else 0
+            hi = int(np.searchsorted(received, to_us(end), 'left')) if end is not None else w.size
+            if after_time is not None:
+                lo = max(lo, int(np.searchsorted(received, to_us(after_time), 'right')))
+            if after is not None:
+                # (received_at, id) > kurzor
+                left = int(np.searchsorted(received, after[0], 'left'))
+                right = int(np.searchsorted(received, after[0], 'right'))
+                lo = max(lo, left + int((ids[left:right] <= after[1]).sum()))
+            if before is not None:
+                # (received_at, id) < kurzor
+                at = to_us(before[0])
+                left = int(np.searchsorted(received, at, 'left'))
+                right = int(np.searchsorted(received, at, 'right'))
+                hi = min(hi, left + int((ids[left:right] < before[1]).sum()))
+            picked.append((wsid, w, np.arange(lo, max(lo, hi))))
+
+        # Pořadí jako v SQL: podle (received_at, id); jedna stanice už je seřazená
+        empty = np.empty(0, dtype=np.int64)
+        rows = np.concatenate([p[2] for p in picked]) if picked else empty
+        owner = np.concatenate([np.full(len(p[2]), i) for i, p in enumerate(picked)]) if picked else empty
+        if len(picked) > 1:
+            order = np.lexsort((np.concatenate([p[1].ids[p[2]] for p in picked]),
+                                np.concatenate([p[1].received[p[2]] for p in picked])))
+            rows, owner = rows[order], owner[order]
+
+        if since is not None:
+            rows, owner = rows[:limit or None], owner[:limit or None]
+        elif start is not None:
+            rows, owner = rows[-limit:] if limit else rows, owner[-limit:] if limit else owner
+        elif not limit or len(rows) < limit:
+            # Posledních N záznamů: když jich okno nemá dost, starší jsou v DB před jeho začátkem
+            return None
+        else:
+            rows, owner = rows[-limit:], owner[-limit:]
+        return self._records(picked, rows, owner, columns)
+
+    def _cursor_of(self, record_id):
+        """(received_at v µs, id) záznamu s daným id, nebo None, když v okně není"""
+        for w in self._stations.values():
+            found = np.flatnonzero(w.ids == record_id)
+            if len(found):
+                return int(w.received[found[0]]), record_id
+        return None
+
+    def _records(self, picked, rows, owner, columns):
+        """Vybrané řádky jako seznam slovníků se stejnými sloupci a typy jako z DB"""
+        names = list(columns) if columns else list(QUERYABLE_COLUMNS)
+        n = len(rows)
+        if not n:
+            return []
+
+        # Sloupce vybraných řádků: jeden výběr z polí každé stanice
+        stamp_index = [STAMP_COLUMNS.index(c) for c in names if c in STAMP_COLUMNS]
+        value_index = [_VALUE_INDEX[c] for c in names if c in _VALUE_INDEX]
+        stamps = np.empty((len(stamp_index), n), dtype=np.int64)
+        values = np.empty((len(value_index), n), dtype=np.float64)
+        for i, (_, w, _) in enumerate(picked):
+            mask = owner == i
+            if mask.any():
+                stamps[:, mask] = w.stamps[np.ix_(stamp_index, rows[mask])]
+                values[:, mask] = w.values[np.ix_(value_index, rows[mask])]
+
+        data = {}
+        stamp_row, value_row = iter(stamps), iter(values)
+        for name in names:
+            if name == 'wsid':
+                data[name] = [picked[i][0] for i in owner.tolist()]
+            elif name == 'id':
+                data[name] = next(stamp_row).tolist()
+            elif name in STAMP_COLUMNS:
+                data[name] = _times(next(stamp_row), naive=name == 'created_at')
+            else:
+                data[name] = _numbers(next(value_row), name in INTEGER_COLUMNS)
+        return [dict(zip(names, row)) for row in zip(*(data[name] for name in names))]
+
+    def latest(self, station=None):
+        """Nejnovější záznam stanice (bez stanice ze všech) nebo None"""
+        if not self._sync():
+            return None
+        with self._lock:
+            candidates = [(wsid, w) for wsid, w in self._stations.items()
+                          if w.size and (station is None or wsid == station)]
+            if not candidates:
+                return None
+            wsid, w = max(candidates, key=lambda item: (item[1].stamps[RECEIVED, item[1].size - 1],
+                                                        item[1].stamps[ID, item[1].size - 1]))
+            return self._records([(wsid, w, None)], np.array([w.size - 1]), np.zeros(1, dtype=np.int64), None)[0]
+
+    def summary(self, start, station=None, newest=None):
+        """Součtová agregace jako ze stats_query (pro format_stats) od `start`, nebo None
+
+        Úhrn srážek počítá přírůstek i proti záznamu těsně před startem, stejně
+        jako průběžné agregace se stavem čítačů.
+        """
+        if not self._sync(newest):
+            return self._result(None)
+        with self._lock:
+            return self._result(self._summary(to_us(start), station))
+
+    def _summary(self, start, station):
+        windows = [w for wsid, w in self._stations.items() if station is None or wsid == station]
+        covered_from = max([self._covered_from] + [w.covered_from for w in windows])
+        if start < covered_from:
+            return None
+        agg = new_aggregate()
+        for w in windows:
+            k = int(np.searchsorted(w.received, start, 'left'))
+            if k == w.size:
+                continue
+            received = w.received[k:]
+            first, last = int(received[0]), int(received[-1])
+            agg['rows'] += w.size - k
+            agg['rain_mm'] += _rain(w, k)
+            agg['first_at'] = _earlier(agg['first_at'], first, min)
+            agg['last_at'] = _earlier(agg['last_at'], last, max)
+            for m in ROLLUP_METRICS:
+                values = w.column(m)[k:]
+                values = values[~np.isnan(values)]
+                if not len(values):
+                    continue
+                low, high = float(values.min()), float(values.max())
+                agg[f'{m}_min'] = low if agg[f'{m}_min'] is None else min(agg[f'{m}_min'], low)
+                agg[f'{m}_max'] = high if agg[f'{m}_max'] is None else max(agg[f'{m}_max'], high)
+                agg[f'{m}_sum'] += float(values.sum())
+                agg[f'{m}_count'] += len(values)
+        for key in ('first_at', 'last_at'):
+            if agg[key] is not None:
+                # Jako v meteo_rollup: místní čas serveru bez zóny
+                agg[key] = (_EPOCH + timedelta(microseconds=agg[key])).astimezone().replace(tzinfo=None)
+        return agg
+
+    def metrics(self):
+        with self._lock:
+            stations = list(self._stations.values())
+            return {
+                'loaded': self._loaded,
+                'stations': len(stations),
+                'rows': sum(w.size for w in stations),
+                'bytes': sum(w.nbytes() for w in stations),
+                **self.stats,
+            }
+
+
+def _earlier(current, value, pick):
+    return value if current is None else pick(current, value)
+
+
+def _rain(w, k):
+    """Srážky z přírůstků kumulativních čítačů (jako rollups.rain_delta) pro záznamy od indexu k"""
+    lo = max(k - 1, 0)
+    total = np.zeros(w.size - lo - 1)
+    done = np.zeros(w.size - lo - 1, dtype=bool)
+    for key in _RAIN:
+        counter = w.column(key)[lo:]
+        current, before = counter[1:], counter[:-1]
+        usable = ~done & ~np.isnan(current) & ~np.isnan(before)
+        total[usable] = np.where(current >= before, current - before, current)[usable]
+        done |= usable
+    return float(total.sum())
+
+
+hot_window = HotWindow(load_window)
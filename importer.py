@@ -0,0 +1,435 @@
+"""Hromadný import historie do meteo_data (COPY, paralelně po měsících).
+
+Načte exporty, které se posílaly mimo běžný příjem, a vloží je do databáze
+bez přehrávání přes /data/upload.php po jednom záznamu:
+
+- ``wslink`` - řádky s parametry uploadu z konzole (samotný query string,
+  celé URL nebo řádek access logu s ``/data/upload.php?...``),
+- ``json`` - pole záznamů jako meteo_data.json z lokálního úložiště,
+- ``ndjson`` - záznam na řádek jako /api/export?format=ndjson,
+- ``csv`` - /api/export?format=csv (hlavička se jmény sloupců) i starší CSV
+  z exportData() dashboardu (hlavička ``Cas,Venkovni_teplota,...``, bez
+  stanice - wsid se zadá přes --wsid).
+
+Import běží ve dvou fázích:
+
+1. každý vstupní soubor zpracuje jeden proces: záznamy převede a ověří
+   stejně jako příjem (parse_wslink, parse_record) a zapíše je do CSV
+   po měsících oddílů (UTC) v pracovním adresáři,
+2. každý měsíc nahraje jeden proces v jedné transakci: COPY FROM STDIN do
+   dočasné tabulky, vyřazení záznamů, které už v meteo_data jsou (stejná
+   stanice a čas z konzole datetime - klíč opakovaných uploadů, dedup.py),
+   INSERT do meteo_data, přičtení do agregací
+   (meteo_rollup) a zápis kontrolního bodu do meteo_import_checkpoints.
+
+Přerušený import se po spuštění se stejnými soubory naváže: hotové soubory
+první fáze i nahrané měsíce (kontrolní body) se přeskočí. Měsíce starší
+než retence (RAW_RETENTION_MONTHS) se nenahrávají. Import obchází klíče
+opakovaných uploadů (meteo_upload_keys) - ty hlídají jen živý příjem.
+Srážky se v agregacích počítají z přírůstků uvnitř importovaného měsíce.
+Importované záznamy dostanou nová id ze sekvence, tedy vyšší než novější
+živá data - API, export i okno posledních dat proto řadí a navazují podle
+(received_at, id), ne podle samotného id.
+Chybějící odvozené hodnoty lze po importu dopočítat přes ``python derived.py``.
+
+    DATABASE_URL=postgresql://... python importer.py --workers 4 wslink-2023.log meteo_data.json
+    python importer.py --wsid garni001 meteodata_2024-01-31.csv
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from urllib.parse import parse_qsl
+
+from psycopg2 import errors
+
+from db import get_db_connection, release_db_connection
+from partitions import (MAINTENANCE_LOCK_ID, add_months, create_default_partition, create_partition,
+                        existing_partitions, is_partitioned, month_start, retention_cutoff)
+from rollups import add_rollups_from
+from schema import INSERT_COLUMNS, parse_record, parse_wslink, station_time
+
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', os.cpu_count() or 1))
+IMPORT_RETRIES = int(os.environ.get('IMPORT_RETRIES', 3))
+# Živě přijatý záznam má received_at (čas serveru) nejvýš tolik hodin od času z konzole
+IMPORT_MATCH_HOURS = float(os.environ.get('IMPORT_MATCH_HOURS', 24))
+
+FORMATS = ('wslink', 'json', 'ndjson', 'csv')
+_EXTENSIONS = {'.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv'}
+
+# Hlavička CSV z původního exportData() dashboardu -> sloupec meteo_data
+LEGACY_CSV_COLUMNS = {
+    'Cas': 'received_at',
+    'Venkovni_teplota': 'outdoor_temp',
+    'Venkovni_vlhkost': 'outdoor_humidity',
+    'Vnitrni_teplota': 'indoor_temp',
+    'Vnitrni_vlhkost': 'indoor_humidity',
+    'Relativni_tlak': 'relative_pressure',
+    'Absolutni_tlak': 'absolute_pressure',
+    'Rychlost_vetru': 'wind_speed',
+    'Smer_vetru': 'wind_direction',
+    'Intenzita_deste': 'rain_rate',
+    'Denny_dest': 'rain_daily',
+    'UV_index': 'uv_index',
+    'Slunecni_zareni': 'solar_radiation',
+    'Vzdalenost_blesku': 'lightning_distance_km',
+}
+# toLocaleString('cs-CZ'), místní čas prohlížeče
+LEGACY_TIME_FORMAT = '%d. %m. %Y %H:%M:%S'
+
+CREATE_CHECKPOINTS_SQL = """
+    CREATE TABLE IF NOT EXISTS meteo_import_checkpoints (
+        source VARCHAR(40) NOT NULL,
+        slice VARCHAR(7) NOT NULL,
+        rows INTEGER NOT NULL,
+        imported_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (source, slice)
+    )
+"""
+COPY_SQL = f"COPY import_rows ({', '.join(INSERT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+_DONE = 'done.json'
+
+
+def detect_format(path):
+    return _EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'wslink')
+
+
+def source_id(paths):
+    """Identifikace importu podle souborů (cesta, velikost, čas změny) pro navázání"""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f'{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+
+# --- čtení vstupů ---------------------------------------------------------
+
+def wslink_items(f):
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        # Query string může být samotný, v URL nebo v řádku access logu
+        query = (line.split('?', 1)[1] if '?' in line else line).split()
+        if query:
+            yield dict(parse_qsl(query[0].strip('"'), keep_blank_values=True))
+
+
+def parse_wslink_item(args, wsid=None):
+    if wsid and not args.get('wsid'):
+        args['wsid'] = wsid
+    # Čas přijetí už neznáme - bereme čas měření z konzole
+    received_at = station_time(args.get('datetime'), args.get('wsid'))
+    if received_at is None:
+        raise ValueError("missing datetime")
+    return parse_wslink(args, now=received_at)
+
+
+def json_items(f, chunk_size=1 << 20):
+    """Prvky pole JSON po jednom, bez načtení celého souboru do paměti"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    started = False
+    while True:
+        # Oddělovače mezi prvky
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+            if buffer[pos] == '[':
+                started = True
+            elif buffer[pos] == ']':
+                return
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                raise ValueError("expected a JSON array")
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Prvek na konci bufferu může být useknutý (číslo) - dočteme
+                if end < len(buffer) or eof:
+                    yield item
+                    pos = end
+                    continue
+        if eof:
+            return
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def ndjson_items(f):
+    for line in f:
+        if line.strip():
+            yield line
+
+
+def parse_ndjson_item(line, wsid=None):
+    return parse_record(json.loads(line), wsid)
+
+
+def csv_items(f):
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if not header:
+        return
+    header = [LEGACY_CSV_COLUMNS.get(name, name) for name in (header[0].lstrip('\ufeff'), *header[1:])]
+    for row in reader:
+        if row:
+            yield dict(zip(header, row))
+
+
+def parse_csv_item(values, wsid=None):
+    received_at = values.get('received_at')
+    # Starší CSV má čas ve formátu "7. 6. 2025 11:17:22"
+    if received_at and '. ' in received_at:
+        values['received_at'] = datetime.strptime(received_at.strip(), LEGACY_TIME_FORMAT)
+    return parse_record(values, wsid)
+
+
+# Formát -> (čtení položek souboru, převod položky na záznam)
+READERS = {
+    'wslink': (wslink_items, parse_wslink_item),
+    'json': (json_items, parse_record),
+    'ndjson': (ndjson_items, parse_ndjson_item),
+    'csv': (csv_items, parse_csv_item),
+}
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# --- fáze 1: převod souborů na CSV po měsících ----------------------------
+
+def split_file(task):
+    """Převede jeden vstupní soubor na CSV po měsících v `out_dir`; vrací statistiku"""
+    path, fmt, wsid, out_dir = task
+    done = os.path.join(out_dir, _DONE)
+    if os.path.exists(done):
+        with open(done) as f:
+            return dict(json.load(f), resumed=True)
+    # Nedokončený převod začne znovu
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    started = time.perf_counter()
+    files, writers, months = {}, {}, {}
+    rows = skipped = 0
+    try:
+        items, parse = READERS[fmt]
+        with open(path, newline='', encoding='utf-8') as f:
+            for item in items(f):
+                try:
+                    record = parse(item, wsid)
+                except (TypeError, ValueError, AttributeError):
+                    # Vadný záznam přeskočíme, zbytek souboru se načte dál
+                    skipped += 1
+                    continue
+                month = month_start(record['received_at']).strftime('%Y-%m')
+                writer = writers.get(month)
+                if writer is None:
+                    files[month] = open(os.path.join(out_dir, f'{month}.csv'), 'w', newline='', encoding='utf-8')
+                    writer = writers[month] = csv.writer(files[month])
+                    months[month] = 0
+                writer.writerow([_text(record.get(c)) for c in INSERT_COLUMNS])
+                months[month] += 1
+                rows += 1
+    finally:
+        for f in files.values():
+            f.close()
+    stats = {'path': path, 'rows': rows, 'skipped': skipped, 'months': months,
+             'seconds': time.perf_counter() - started}
+    with open(done, 'w') as f:
+        json.dump(stats, f)
+    return stats
+
+
+# --- fáze 2: nahrání měsíců -----------------------------------------------
+
+class _Shards:
+    """Soubory jednoho měsíce ze všech vstupů jako jeden proud pro COPY"""
+
+    def __init__(self, paths):
+        self._paths = list(paths)
+        self._current = None
+
+    def read(self, size=-1):
+        while True:
+            if self._current is None:
+                if not self._paths:
+                    return ''
+                self._current = open(self._paths.pop(0), newline='', encoding='utf-8')
+            data = self._current.read(size)
+            if data:
+                return data
+            self._current.close()
+            self._current = None
+
+
+def _load_slice(cur, paths, month):
+    cur.execute("CREATE TEMP TABLE import_rows (LIKE meteo_data INCLUDING DEFAULTS) ON COMMIT DROP")
+    cur.copy_expert(COPY_SQL, _Shards(paths))
+    cur.execute("ANALYZE import_rows")
+    # Duplicity uvnitř importu (stejný export ve více souborech) ...
+    cur.execute("""
+        DELETE FROM import_rows a USING import_rows b
+        WHERE a.wsid = b.wsid AND a.datetime = b.datetime AND a.id > b.id
+    """)
+    # ... a záznamy, které už v meteo_data jsou. Klíč je (wsid, datetime) jako
+    # u živého příjmu: WSLink log má jako received_at čas z konzole, živý
+    # záznam čas serveru. Hledá se jen v received_at blízko času z konzole
+    # (index (wsid, received_at), oddíly kolem importovaného měsíce).
+    tolerance = timedelta(hours=IMPORT_MATCH_HOURS)
+    cur.execute("""
+        DELETE FROM import_rows s USING meteo_data m
+        WHERE m.wsid = s.wsid AND m.datetime = s.datetime
+          AND m.received_at >= s.datetime - %s AND m.received_at < s.datetime + %s
+          AND m.received_at >= %s AND m.received_at < %s
+    """, (tolerance, tolerance, month - tolerance, add_months(month, 1) + tolerance))
+    cur.execute("INSERT INTO meteo_data SELECT * FROM import_rows")
+    rows = cur.rowcount
+    add_rollups_from(cur, 'import_rows')
+    return rows
+
+
+def import_slice(task):
+    """Nahraje jeden měsíc v jedné transakci i s kontrolním bodem; vrací statistiku"""
+    source, month_key, paths = task
+    month = datetime.strptime(month_key, '%Y-%m').replace(tzinfo=timezone.utc)
+    started = time.perf_counter()
+    # Aspoň jeden pokus i při IMPORT_RETRIES=0
+    retries = max(1, IMPORT_RETRIES)
+    for attempt in range(1, retries + 1):
+        conn = get_db_connection()
+        if conn is None:
+            raise RuntimeError("DATABASE_URL is not set")
+        broken = True
+        try:
+            cur = conn.cursor()
+            rows = _load_slice(cur, paths, month)
+            cur.execute("INSERT INTO meteo_import_checkpoints (source, slice, rows) VALUES (%s, %s, %s)",
+                        (source, month_key, rows))
+            conn.commit()
+            cur.close()
+            broken = False
+            return {'slice': month_key, 'rows': rows, 'seconds': time.perf_counter() - started}
+        except (errors.DeadlockDetected, errors.SerializationFailure):
+            # Souběžné měsíce mohou sdílet agregaci (den/týden přes hranici měsíce)
+            conn.rollback()
+            broken = False
+            if attempt == retries:
+                raise
+            time.sleep(attempt)
+        finally:
+            release_db_connection(conn, broken=broken)
+
+
+def prepare_slices(conn, source, months):
+    """Založí chybějící oddíly; vrací (měsíce k nahrání, hotové, před retencí)"""
+    cur = conn.cursor()
+    cur.execute(CREATE_CHECKPOINTS_SQL)
+    cur.execute("SELECT slice FROM meteo_import_checkpoints WHERE source = %s", (source,))
+    done = {slice_ for (slice_,) in cur.fetchall()}
+    pending = sorted(set(months) - done)
+    expired = []
+    if is_partitioned(cur):
+        # Se současnou údržbou oddílů by se mohly srazit na stejném měsíci
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MAINTENANCE_LOCK_ID,))
+        create_default_partition(cur)
+        cutoff = retention_cutoff()
+        existing = existing_partitions(cur)
+        for key in list(pending):
+            month = datetime.strptime(key, '%Y-%m').replace(tzinfo=timezone.utc)
+            if cutoff is not None and month < cutoff:
+                pending.remove(key)
+                expired.append(key)
+            elif month not in existing:
+                create_partition(cur, month)
+    conn.commit()
+    cur.close()
+    return pending, sorted(done & set(months)), expired
+
+
+def _rate(rows, seconds):
+    return f"{rows / seconds:,.0f} rows/s" if seconds > 0 else "-"
+
+
+def run_import(paths, fmt=None, wsid=None, workers=IMPORT_WORKERS, work_dir=None, keep=False):
+    """Celý import; vrací počet nově vložených záznamů"""
+    source = source_id(paths)
+    work_dir = work_dir or os.path.join(tempfile.gettempdir(), f'meteo-import-{source[:12]}')
+    # Bez databáze skončit hned, ne až po rozdělení souborů v každém workeru
+    conn = get_db_connection()
+    if not conn:
+        raise SystemExit("DATABASE_URL is not set - the import writes directly to the database")
+    release_db_connection(conn)
+    os.makedirs(work_dir, exist_ok=True)
+
+    tasks = [(path, fmt or detect_format(path), wsid, os.path.join(work_dir, str(i)))
+             for i, path in enumerate(paths)]
+    started = time.perf_counter()
+    shards, parsed = {}, 0
+    with Pool(min(workers, len(tasks))) as pool:
+        for stats, (_, _, _, out_dir) in zip(pool.imap(split_file, tasks), tasks):
+            note = ' (already parsed)' if stats.get('resumed') else f", {_rate(stats['rows'], stats['seconds'])}"
+            print(f"📄 {stats['path']}: {stats['rows']:,} rows, {stats['skipped']:,} skipped{note}")
+            parsed += stats['rows']
+            for month in stats['months']:
+                shards.setdefault(month, []).append(os.path.join(out_dir, f'{month}.csv'))
+    seconds = time.perf_counter() - started
+    print(f"✅ Parsed {parsed:,} rows in {seconds:.1f} s ({_rate(parsed, seconds)})")
+
+    conn = get_db_connection()
+    try:
+        pending, done, expired = prepare_slices(conn, source, shards)
+    finally:
+        release_db_connection(conn)
+    if done:
+        print(f"⏭️ Already imported: {', '.join(done)}")
+    if expired:
+        print(f"⚠️ Skipped months before raw data retention: {', '.join(expired)}")
+
+    started = time.perf_counter()
+    inserted = 0
+    if pending:
+        with Pool(min(workers, len(pending))) as pool:
+            slices = [(source, month, shards[month]) for month in pending]
+            for stats in pool.imap_unordered(import_slice, slices):
+                inserted += stats['rows']
+                print(f"📥 {stats['slice']}: {stats['rows']:,} rows in {stats['seconds']:.1f} s "
+                      f"({_rate(stats['rows'], stats['seconds'])}), total {inserted:,}")
+    seconds = time.perf_counter() - started
+    print(f"✅ Imported {inserted:,} new rows in {seconds:.1f} s ({_rate(inserted, seconds)})")
+    if not keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import WSLink logs, JSON and CSV exports into meteo_data')
+    parser.add_argument('paths', nargs='+', help='input files')
+    parser.add_argument('--format', choices=FORMATS, help='input format (default: by file extension, wslink otherwise)')
+    parser.add_argument('--wsid', help='station for records without wsid (old dashboard CSV)')
+    parser.add_argument('--workers', type=int, default=IMPORT_WORKERS)
+    parser.add_argument('--work-dir', help='directory for intermediate files (kept between resumed runs)')
+    parser.add_argument('--keep', action='store_true', help='keep intermediate files after a successful import')
+    args = parser.parse_args()
+    run_import(args.paths, args.format, args.wsid, max(args.workers, 1), args.work_dir, args.keep)
+
+
+if __name__ == '__main__':
+    main()
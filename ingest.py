@@ -0,0 +1,368 @@
+import atexit
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from db import get_db_connection, release_db_connection
+from dedup import fresh_rows, record_key, recent_uploads
+from hotwindow import hot_window
+from live import notify
+from logs import get_logger
+from metrics import timer
+from rollups import update_rollups
+from schema import COLUMN_TYPES, INSERT_COLUMNS
+
+log = get_logger(__name__)
+
+# Nastavení dávkového zápisu (lze přepsat proměnnými prostředí)
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', 100))
+INGEST_FLUSH_MS = int(os.environ.get('INGEST_FLUSH_MS', 1000))
+INGEST_SPILL_DIR = os.environ.get('INGEST_SPILL_DIR', 'ingest_spill')
+INGEST_FSYNC = os.environ.get('INGEST_FSYNC', '1') != '0'
+
+# Jednotlivé záznamy (bez dávkování) jdou přes serverový prepared statement.
+# Poslední parametr říká, jestli má záznam klíč (wsid, datetime) - pak se
+# řádek vloží jen tehdy, když klíč v meteo_upload_keys ještě nebyl (dedup.py).
+INSERT_STATEMENT = 'meteo_insert'
+_PARAMS = {c: f'${i}' for i, c in enumerate(INSERT_COLUMNS, 1)}
+_KEYED = f'${len(INSERT_COLUMNS) + 1}'
+PREPARE_INSERT_SQL = (f"PREPARE {INSERT_STATEMENT} "
+                      f"({', '.join(COLUMN_TYPES[c] for c in INSERT_COLUMNS)}, boolean) AS "
+                      f"WITH fresh AS (INSERT INTO meteo_upload_keys (wsid, datetime) "
+                      f"SELECT coalesce({_PARAMS['wsid']}, ''), {_PARAMS['datetime']} WHERE {_KEYED} "
+                      f"ON CONFLICT DO NOTHING RETURNING 1) "
+                      f"INSERT INTO meteo_data ({', '.join(INSERT_COLUMNS)}) "
+                      f"SELECT {', '.join(_PARAMS.values())} WHERE NOT {_KEYED} OR EXISTS (SELECT 1 FROM fresh) "
+                      f"RETURNING id, created_at")
+EXECUTE_INSERT_SQL = f"EXECUTE {INSERT_STATEMENT} ({', '.join(['%s'] * (len(INSERT_COLUMNS) + 1))})"
+
+# Spojení, na kterých už je INSERT připravený (zavřené spojení ze slovníku samo zmizí)
+_prepared = weakref.WeakKeyDictionary()
+
+
+def insert_record(cur, record):
+    """Vloží jeden záznam a vrátí (id, created_at); None, pokud je to opakovaný upload
+
+    Příkaz se na každém spojení z poolu připraví jen jednou, další INSERTy
+    už server neparsuje ani neplánuje. Sloupce jsou vždy celý INSERT_COLUMNS,
+    chybějící hodnoty jdou jako NULL.
+    """
+    conn = cur.connection
+    if conn not in _prepared:
+        # PREPARE není transakční - zůstane i po rollbacku
+        cur.execute(PREPARE_INSERT_SQL)
+        _prepared[conn] = True
+    keyed = record_key(record) is not None
+    cur.execute(EXECUTE_INSERT_SQL, [record.get(c) for c in INSERT_COLUMNS] + [keyed])
+    row = cur.fetchone()
+    if row is None:
+        recent_uploads.suppressed_by_db(1)
+    return row
+
+
+def write_batch(rows):
+    """Zapíše dávku záznamů jedním vícepočetním INSERTem a jedním commitem
+
+    Opakované uploady (klíč už je v meteo_upload_keys) se vynechají.
+    """
+    columns = INSERT_COLUMNS
+    with timer('db_connect'):
+        conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("DATABASE_URL is not set")
+    try:
+        cur = conn.cursor()
+        with timer('insert'):
+            rows = fresh_rows(cur, rows)
+            if rows:
+                ids = execute_values(
+                    cur,
+                    f"INSERT INTO meteo_data ({', '.join(columns)}) VALUES %s RETURNING id, created_at",
+                    [tuple(row.get(c) for c in columns) for row in rows],
+                    page_size=len(rows),
+                    fetch=True,
+                )
+                rows = [dict(row, id=row_id, created_at=created_at) for row, (row_id, created_at) in zip(rows, ids)]
+                update_rollups(cur, rows)
+                # Živý kanál dostane záznamy až s commitem, i s jejich id
+                notify(cur, rows)
+        with timer('commit'):
+            conn.commit()
+        cur.close()
+        hot_window.add(rows)
+    except Exception:
+        release_db_connection(conn, broken=conn.closed)
+        raise
+    release_db_connection(conn)
+
+
+class IngestBuffer:
+    """Fronta přijatých záznamů s průběžným zápisem na disk a dávkovým uložením do DB
+
+    Každý záznam se před potvrzením stanici připíše do spill souboru
+    ``<pid>.ndjson``. Při flush se soubor přejmenuje na ``<pid>.<běh>-<n>.flushing``
+    a smaže se až po úspěšném commitu, takže pád procesu nic neztratí -
+    nezapsané soubory po mrtvých procesech převezme další start. Soubory
+    ``*.handoff`` od jiných procesů (spill_rows) převezme kterýkoli worker
+    i za běhu.
+    """
+
+    def __init__(self, spill_dir=INGEST_SPILL_DIR, batch_size=INGEST_BATCH_SIZE,
+                 flush_interval=INGEST_FLUSH_MS / 1000, fsync=INGEST_FSYNC, writer=write_batch):
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.writer = writer
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._segments = []     # spill soubory, jejichž záznamy jsou v _pending
+        self._seq = 0
+        self._run_id = time.time_ns()   # odliší segmenty od předchozího běhu se stejným PID
+        self._stopped = False
+
+        self.stats = {
+            'queued': 0,
+            'flushes': 0,
+            'flushed_rows': 0,
+            'flush_errors': 0,
+            'rejected_rows': 0,
+            'recovered_rows': 0,
+        }
+
+        os.makedirs(spill_dir, exist_ok=True)
+        self._spill_path = os.path.join(spill_dir, f'{self.pid}.ndjson')
+        self._recover()
+        self._spill = open(self._spill_path, 'a', encoding='utf-8')
+
+        self._thread = threading.Thread(target=self._run, name='ingest-flush', daemon=True)
+        self._thread.start()
+
+    def _next_segment_path(self):
+        self._seq += 1
+        return os.path.join(self.spill_dir, f'{self.pid}.{self._run_id}-{self._seq}.flushing')
+
+    def _recover(self):
+        """Převezme spill soubory po procesech, které už neběží"""
+        recovered = 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, '*.ndjson'))
+                           + glob.glob(os.path.join(self.spill_dir, '*.flushing'))):
+            owner = os.path.basename(path).split('.', 1)[0]
+            if not owner.isdigit() or _pid_alive(int(owner), self.pid):
+                continue
+            recovered += self._claim(path)
+        recovered += self._claim_handoffs()
+
+        if recovered:
+            log.info(f"♻️ Recovered {recovered} buffered rows from {self.spill_dir}")
+
+    def _claim_handoffs(self):
+        """Převezme hotové soubory od jiných procesů (spill_rows); vrací počet záznamů"""
+        return sum(self._claim(path) for path in sorted(glob.glob(os.path.join(self.spill_dir, '*.handoff'))))
+
+    def _claim(self, path):
+        """Přejmenuje spill soubor na vlastní segment a zařadí jeho záznamy do fronty"""
+        with self._cond:
+            claimed = self._next_segment_path()
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            # Soubor mezitím převzal jiný worker
+            return 0
+
+        rows = []
+        with open(claimed, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # Useknutý poslední řádek po pádu
+                    log.warning(f"⚠️ Skipping corrupt spill line in {path}")
+        with self._cond:
+            self._pending.extend(rows)
+            self._segments.append(claimed)
+            self.stats['recovered_rows'] += len(rows)
+        return len(rows)
+
+    def add(self, weather_data):
+        """Zařadí záznam do fronty; po návratu je bezpečně na disku"""
+        line = json.dumps(weather_data, ensure_ascii=False, default=str)
+        with self._cond:
+            self._spill.write(line + '\n')
+            self._spill.flush()
+            if self.fsync:
+                os.fsync(self._spill.fileno())
+            self._pending.append(weather_data)
+            self.stats['queued'] += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopped and len(self._pending) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopped:
+                    return
+                errors = self.stats['flush_errors']
+            if self._claim_handoffs():
+                log.info("♻️ Picked up rows handed off by another process")
+            self.flush()
+            with self._cond:
+                if self.stats['flush_errors'] > errors and not self._stopped:
+                    # Databáze nejde - nezahltíme ji okamžitým opakováním
+                    self._cond.wait(self.flush_interval)
+
+    def flush(self):
+        """Zapíše všechny čekající záznamy do databáze"""
+        with self._flush_lock:
+            with self._cond:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, []
+                # Aktuální spill soubor odložíme a nové záznamy půjdou do čistého
+                self._spill.close()
+                if os.path.exists(self._spill_path):
+                    segment = self._next_segment_path()
+                    os.replace(self._spill_path, segment)
+                    self._segments.append(segment)
+                self._spill = open(self._spill_path, 'a', encoding='utf-8')
+                segments, self._segments = self._segments, []
+
+            written = len(batch)
+            try:
+                try:
+                    self.writer(batch)
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    raise
+                except psycopg2.Error as e:
+                    # Chyba v datech - jeden vadný záznam nesmí zablokovat celou frontu
+                    log.warning(f"⚠️ Batch rejected ({e.__class__.__name__}), retrying row by row")
+                    written = self._write_rows_individually(batch)
+            except Exception as e:
+                log.error(f"❌ Batch insert error ({len(batch)} rows, will retry): {e}")
+                with self._cond:
+                    self._pending = batch + self._pending
+                    self._segments = segments + self._segments
+                    self.stats['flush_errors'] += 1
+                return 0
+
+            for segment in segments:
+                try:
+                    os.remove(segment)
+                except FileNotFoundError:
+                    pass
+            with self._cond:
+                self.stats['flushes'] += 1
+                self.stats['flushed_rows'] += written
+            return written
+
+    def _write_rows_individually(self, batch):
+        written = 0
+        for row in batch:
+            try:
+                self.writer([row])
+                written += 1
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                raise
+            except psycopg2.Error as e:
+                log.error(f"❌ Dropping invalid row from {row.get('wsid')}: {e}")
+                with self._cond:
+                    self.stats['rejected_rows'] += 1
+        return written
+
+    def close(self):
+        """Zastaví vlákno a zapíše zbytek fronty"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._cond:
+            self._spill.close()
+            if not self._pending and os.path.exists(self._spill_path) \
+                    and os.path.getsize(self._spill_path) == 0:
+                os.remove(self._spill_path)
+
+    def has_pending(self):
+        return bool(self._pending)
+
+    def metrics(self):
+        with self._cond:
+            return {'pending': len(self._pending), **self.stats}
+
+
+_handoff_seq = itertools.count(1)
+
+
+def spill_rows(rows, spill_dir=INGEST_SPILL_DIR, fsync=INGEST_FSYNC):
+    """Předá záznamy frontě IngestBuffer jiného procesu (ingest_async.py, když nejde DB)
+
+    Soubor se zapíše celý pod dočasným jménem a teprve pak přejmenuje na
+    ``.handoff``, takže ho worker nikdy nenačte rozepsaný.
+    """
+    os.makedirs(spill_dir, exist_ok=True)
+    name = f'{os.getpid()}.{time.time_ns()}-{next(_handoff_seq)}'
+    tmp_path = os.path.join(spill_dir, f'{name}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(spill_dir, f'{name}.handoff'))
+
+
+def _pid_alive(pid, own_pid):
+    # Vlastní PID z předchozího běhu (typicky PID 1 v kontejneru) bereme jako mrtvý
+    if pid == own_pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_ingest_buffer():
+    """Vrátí frontu pro aktuální proces (None, pokud je dávkový zápis vypnutý)"""
+    global _buffer
+    if not os.environ.get('DATABASE_URL') or os.environ.get('INGEST_BUFFER', '1') == '0':
+        return None
+
+    buffer = _buffer
+    if buffer is not None and buffer.pid == os.getpid():
+        return buffer
+
+    with _buffer_lock:
+        if _buffer is None or _buffer.pid != os.getpid():
+            _buffer = IngestBuffer()
+            atexit.register(_buffer.close)
+        return _buffer
+
+
+def ingest_stats():
+    buffer = _buffer
+    if buffer is None or buffer.pid != os.getpid():
+        return {}
+    return buffer.metrics()
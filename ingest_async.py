@@ -0,0 +1,261 @@
+"""Asynchronní příjem dat z meteostanic (ASGI) pro velký počet stanic.
+
+Samostatná ASGI aplikace jen s endpointem ``/data/upload.php`` - dashboard
+a API dál běží ve Flasku (app.py), parser i sloupce jsou společné ze
+schema.py. Požadavek zařadí záznam do fronty a počká na commit dávky, do
+které padl (skupinový commit): stanice dostane OK až ve chvíli, kdy je
+záznam v databázi, ale jeden commit se dělí mezi všechny souběžné uploady.
+ASYNC_INGEST_WRITERS zapisovačů zapisuje dávky souběžně, každý na svém
+asyncpg spojení; INSERT, agregace i NOTIFY jdou v jedné transakci a
+executemany posílá příkazy za sebou bez čekání na jednotlivé odpovědi.
+
+Když databáze nejde, záznamy se předají do spill adresáře dávkového zápisu
+Flasku (ingest.spill_rows, společný INGEST_SPILL_DIR) a do DB je dopíše
+IngestBuffer některého workeru app.py. Bez DATABASE_URL jdou do lokálního
+úložiště jako ve Flasku. Schéma zakládá a migruje app.py, tento server ho
+jen používá.
+
+    pip install asyncpg uvicorn
+    DATABASE_URL=postgresql://... uvicorn ingest_async:app --host 0.0.0.0 --port 8001
+"""
+import asyncio
+import json
+import os
+from urllib.parse import parse_qsl
+
+import asyncpg
+
+from db import DATABASE_SSLMODE
+from dedup import dedup_stats, fresh_rows_async, record_key, recent_uploads
+from ingest import spill_rows
+from live import notify_async
+from localstore import get_local_store
+from logs import get_logger
+from rollups import update_rollups_async
+from schema import INSERT_COLUMNS, parse_wslink
+
+log = get_logger(__name__)
+
+ASYNC_INGEST_BATCH_SIZE = int(os.environ.get('ASYNC_INGEST_BATCH_SIZE', 500))
+ASYNC_INGEST_FLUSH_MS = float(os.environ.get('ASYNC_INGEST_FLUSH_MS', 10))
+ASYNC_INGEST_WRITERS = int(os.environ.get('ASYNC_INGEST_WRITERS', 4))
+
+INSERT_SQL = (f"INSERT INTO meteo_data (id, {', '.join(INSERT_COLUMNS)}) "
+              f"VALUES ({', '.join(f'${i}' for i in range(1, len(INSERT_COLUMNS) + 2))})")
+
+# Chyby v datech - týkají se jen některých záznamů dávky, ne spojení
+DATA_ERRORS = (asyncpg.exceptions.DataError, asyncpg.exceptions.IntegrityConstraintViolationError)
+
+
+class AsyncIngest:
+    """Fronta uploadů se skupinovým commitem do PostgreSQL přes asyncpg"""
+
+    def __init__(self, dsn, batch_size=ASYNC_INGEST_BATCH_SIZE, flush_interval=ASYNC_INGEST_FLUSH_MS / 1000,
+                 writers=ASYNC_INGEST_WRITERS):
+        self.dsn = dsn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writers = writers
+        self.pool = None
+        self._queue = asyncio.Queue()
+        self._tasks = []
+        self.stats = {
+            'received': 0,
+            'batches': 0,
+            'written_rows': 0,
+            'batch_errors': 0,
+            'rejected_rows': 0,
+            'fallback_rows': 0,
+        }
+
+    async def start(self):
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=self.writers, max_size=self.writers,
+                                              ssl=DATABASE_SSLMODE)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.writers)]
+
+    async def add(self, weather_data):
+        """Zařadí záznam a vrátí se až po jeho uložení"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((weather_data, future))
+        self.stats['received'] += 1
+        await future
+
+    async def _next_batch(self):
+        """Počká na první záznam, pak sbírá další až do batch_size nebo flush_interval"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._store([row for row, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _store(self, rows):
+        try:
+            await self._write(rows)
+        except DATA_ERRORS as e:
+            # Jeden vadný záznam nesmí shodit celou dávku
+            log.warning(f"⚠️ Batch rejected ({e.__class__.__name__}), retrying row by row")
+            self.stats['batch_errors'] += 1
+            for row in rows:
+                try:
+                    await self._write([row])
+                except DATA_ERRORS as e:
+                    log.error(f"❌ Dropping invalid row from {row.get('wsid')}: {e}")
+                    self.stats['rejected_rows'] += 1
+                except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                    await self._fallback([row])
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            log.error(f"❌ Batch insert error ({len(rows)} rows, handing off to the ingest spill): {e}")
+            self.stats['batch_errors'] += 1
+            await self._fallback(rows)
+
+    async def _write(self, rows):
+        """Jedna transakce: klíče uploadů, id ze sekvence, INSERT nových záznamů, agregace a NOTIFY"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await fresh_rows_async(conn, rows)
+                if not rows:
+                    return
+                ids = [r[0] for r in await conn.fetch(
+                    "SELECT nextval('meteo_data_id_seq') FROM generate_series(1, $1)", len(rows))]
+                await conn.executemany(INSERT_SQL, [
+                    (row_id,) + tuple(row.get(c) for c in INSERT_COLUMNS) for row_id, row in zip(ids, rows)
+                ])
+                await update_rollups_async(conn, rows)
+                await notify_async(conn, [dict(row, id=row_id) for row_id, row in zip(ids, rows)])
+        self.stats['batches'] += 1
+        self.stats['written_rows'] += len(rows)
+
+    async def _fallback(self, rows):
+        # Lokální úložiště aplikace s databází nečte - záznamy dopíše fronta ve Flasku
+        await asyncio.get_running_loop().run_in_executor(None, spill_rows, rows)
+        self.stats['fallback_rows'] += len(rows)
+
+    async def close(self):
+        """Dopíše frontu a zavře spojení"""
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.pool.close()
+
+    def metrics(self):
+        return {'pending': self._queue.qsize(), **self.stats}
+
+
+async def save_locally(rows):
+    """Zápis do lokálního úložiště (blokující I/O mimo smyčku událostí)"""
+    store = get_local_store()
+
+    def append():
+        for row in rows:
+            store.append(row)
+
+    await asyncio.get_running_loop().run_in_executor(None, append)
+
+
+_ingest = None
+
+
+async def _lifespan(receive, send):
+    global _ingest
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if os.environ.get('DATABASE_URL'):
+                try:
+                    _ingest = AsyncIngest(os.environ['DATABASE_URL'])
+                    await _ingest.start()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _ingest is not None:
+                await _ingest.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def _respond(send, status, body, content_type='text/plain; charset=utf-8'):
+    body = body.encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode()),
+                            (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def query_args(query_string):
+    """Parametry dotazu jako slovník (u opakovaného parametru platí první, jako ve Flasku)"""
+    args = {}
+    for key, value in parse_qsl(query_string.decode('latin-1'), keep_blank_values=True):
+        args.setdefault(key, value)
+    return args
+
+
+async def app(scope, receive, send):
+    """ASGI vstupní bod"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    if scope['path'] == '/api/ingest':
+        stats = dict(_ingest.metrics() if _ingest else {}, dedup=dedup_stats())
+        await _respond(send, 200, json.dumps(stats), 'application/json')
+        return
+    if scope['path'] != '/data/upload.php':
+        await _respond(send, 404, 'Not Found')
+        return
+    if scope['method'] not in ('GET', 'HEAD'):
+        await _respond(send, 405, 'Method Not Allowed')
+        return
+
+    weather_data = parse_wslink(query_args(scope['query_string']))
+    key = record_key(weather_data)
+    if recent_uploads.seen(key):
+        # Opakovaný upload, který už je uložený - konzoli stačí OK
+        await _respond(send, 200, 'OK')
+        return
+
+    try:
+        if _ingest is not None:
+            await _ingest.add(weather_data)
+        else:
+            await save_locally([weather_data])
+    except Exception as e:
+        log.error(f"❌ Upload from {weather_data.get('wsid')} not stored: {e}")
+        # Konzole upload zopakuje
+        await _respond(send, 503, 'Service Unavailable')
+        return
+    recent_uploads.remember(key)
+    await _respond(send, 200, 'OK')
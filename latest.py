@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from schema import MAX_STATIONS, TIMESTAMP_MIN, as_timestamp
+
+# Jak dlouho věříme záznamu v paměti, než ho ověříme v DB (jiný worker mohl přijmout novější)
+LATEST_CACHE_TTL = float(os.environ.get('LATEST_CACHE_TTL', 5))
+
+
+def _as_datetime(value):
+    try:
+        return as_timestamp(value)
+    except (TypeError, ValueError):
+        return TIMESTAMP_MIN
+
+
+class LatestReadings:
+    """Poslední záznam každé stanice (a celkově nejnovější) v paměti procesu
+
+    Příjem dat volá update() při každém uploadu, čtení jde z paměti. Do DB
+    sahá jen stanice, kterou proces ještě nezná nebo jejíž záznam je starší
+    než `ttl` - nejvýš jeden dotaz LIMIT 1 za ttl a stanici.
+
+    Stanic drží nejvýš `max_stations`; nejdéle neaktualizovaná vypadne a příště
+    se načte z DB.
+    """
+
+    def __init__(self, loader, ttl=LATEST_CACHE_TTL, max_stations=MAX_STATIONS):
+        self.loader = loader    # loader(station) -> poslední záznam nebo None
+        self.ttl = ttl
+        self.max_stations = max(1, max_stations)
+        self._entries = OrderedDict()   # stanice (None = všechny) -> (received_at, záznam, ověřeno)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'updates': 0, 'evictions': 0}
+
+    def _store(self, key, record, checked_at):
+        received_at = _as_datetime(record['received_at']) if record else TIMESTAMP_MIN
+        entry = self._entries.get(key)
+        if entry is None or received_at >= entry[0]:
+            self._entries[key] = (received_at, record, checked_at)
+        else:
+            # V paměti máme novější záznam (DB ho ještě nemá z dávkového zápisu)
+            self._entries[key] = (entry[0], entry[1], checked_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) - (None in self._entries) > self.max_stations:
+            oldest = next(k for k in self._entries if k is not None)
+            del self._entries[oldest]
+            self.stats['evictions'] += 1
+
+    def update(self, record):
+        """Zaznamená právě přijatý záznam"""
+        now = time.monotonic()
+        with self._lock:
+            self._store(record.get('wsid'), record, now)
+            self._store(None, record, now)
+            self.stats['updates'] += 1
+
+    def get(self, station=None):
+        """Vrátí poslední záznam stanice (bez stanice nejnovější ze všech)"""
+        entry = self._entries.get(station)
+        if entry is not None and time.monotonic() - entry[2] < self.ttl:
+            self.stats['hits'] += 1
+            return entry[1]
+
+        with self._refresh_lock:
+            # Mezitím mohl záznam obnovit jiný požadavek
+            entry = self._entries.get(station)
+            if entry is not None and time.monotonic() - entry[2] < self.ttl:
+                self.stats['hits'] += 1
+                return entry[1]
+            self.stats['misses'] += 1
+            record = self.loader(station)
+            with self._lock:
+                self._store(station, record, time.monotonic())
+                return self._entries[station][1]
+
+    def metrics(self):
+        return {'stations': len(self._entries) - (None in self._entries), **self.stats}
@@ -0,0 +1,170 @@
+"""Živý kanál nových záznamů pro dashboardy (Server-Sent Events).
+
+S databází se každý uložený záznam posílá přes Postgres NOTIFY ve stejné
+transakci jako INSERT, takže ho klienti dostanou až po commitu a se svým
+id. Každý worker má jedno vlákno s LISTEN, které záznamy rozdá svým
+odběratelům - rozesílání mezi gunicorn workery tak nepotřebuje žádný další
+broker a počet připojených obrazovek nepřidává dotazy do DB. Bez databáze se
+záznamy rozesílají jen v rámci procesu.
+
+SSE spojení drží vlákno po celou dobu, proto gunicorn spouštěj s vlákny
+nebo gevent workery (např. ``-k gthread --threads 200``).
+"""
+import json
+import os
+import queue
+import select
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from db import DATABASE_SSLMODE
+from logs import get_logger
+from responses import epoch_ms
+
+log = get_logger(__name__)
+
+LIVE_CHANNEL = 'meteo_live'
+LIVE_QUEUE_SIZE = int(os.environ.get('LIVE_QUEUE_SIZE', 100))
+LIVE_KEEPALIVE = float(os.environ.get('LIVE_KEEPALIVE', 15))
+LIVE_FEED = os.environ.get('LIVE_FEED', '1') != '0'
+
+# NOTIFY payload musí být menší než 8000 bajtů
+MAX_PAYLOAD = 7900
+
+
+def _json_default(value):
+    # Časy stejně jako v API - epoch milisekundy
+    if isinstance(value, datetime):
+        return epoch_ms(value)
+    return str(value)
+
+
+def encode_event(record):
+    payload = json.dumps(record, ensure_ascii=False, default=_json_default)
+    if len(payload.encode('utf-8')) > MAX_PAYLOAD:
+        # Klient si celý záznam dotáhne přes /api/data
+        payload = json.dumps({k: record.get(k) for k in ('id', 'wsid', 'received_at')},
+                             default=_json_default)
+    return payload
+
+
+def notify(cur, records):
+    """Pošle uložené záznamy do kanálu (volat ve stejné transakci jako INSERT)"""
+    if not LIVE_FEED or not records:
+        return
+    execute_values(cur, f"SELECT pg_notify('{LIVE_CHANNEL}', p) FROM (VALUES %s) AS v (p)",
+                   [(encode_event(r),) for r in records])
+
+
+async def notify_async(conn, records):
+    """notify pro asyncpg spojení (volat ve stejné transakci jako INSERT)"""
+    if not LIVE_FEED or not records:
+        return
+    await conn.execute(f"SELECT pg_notify('{LIVE_CHANNEL}', p) FROM unnest($1::text[]) AS p",
+                       [encode_event(r) for r in records])
+
+
+class LiveFeed:
+    """Odběratelé živých záznamů v rámci procesu"""
+
+    def __init__(self, queue_size=LIVE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener_pid = None
+        self.stats = {'published': 0, 'dropped': 0, 'listener_errors': 0}
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        self._ensure_listener()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish_local(self, payload):
+        """Předá záznam (JSON text) všem odběratelům tohoto procesu"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.stats['published'] += 1
+        for q in subscribers:
+            try:
+                q.put_nowait(payload)
+            except queue.Full:
+                # Pomalý klient - zahodíme nejstarší záznam, ať nestojí ostatní
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                q.put_nowait(payload)
+                self.stats['dropped'] += 1
+
+    def _ensure_listener(self):
+        if not os.environ.get('DATABASE_URL') or self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen, name='live-listen', daemon=True).start()
+
+    def _listen(self):
+        """LISTEN na vlastním spojení mimo pool; po výpadku se znovu připojí"""
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(os.environ['DATABASE_URL'], sslmode=DATABASE_SSLMODE)
+                conn.autocommit = True
+                conn.cursor().execute(f'LISTEN {LIVE_CHANNEL}')
+                backoff = 1
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.publish_local(conn.notifies.pop(0).payload)
+            except Exception as e:
+                self.stats['listener_errors'] += 1
+                log.error(f"❌ Live feed listener error: {e}")
+            finally:
+                if conn is not None:
+                    conn.close()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def stream(self, initial=None, station=None):
+        """Generátor SSE zpráv pro jednoho klienta"""
+        q = self.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            if initial:
+                yield f'event: latest\ndata: {encode_event(initial)}\n\n'
+            while True:
+                try:
+                    payload = q.get(timeout=LIVE_KEEPALIVE)
+                except queue.Empty:
+                    # Komentář udrží spojení přes proxy a odhalí odpojené klienty
+                    yield ': keepalive\n\n'
+                    continue
+                record = json.loads(payload)
+                if station and record.get('wsid') != station:
+                    continue
+                prefix = f"id: {record['id']}\n" if record.get('id') is not None else ''
+                yield f'{prefix}data: {payload}\n\n'
+        finally:
+            self.unsubscribe(q)
+
+    def metrics(self):
+        with self._lock:
+            return {'subscribers': len(self._subscribers), **self.stats}
+
+
+live_feed = LiveFeed()
@@ -0,0 +1,275 @@
+"""Lokální úložiště dat pro provoz bez databáze.
+
+Záznamy se jen připisují na konec NDJSON segmentů (``segment-000001.ndjson``,
+...); po dosažení LOCAL_STORE_SEGMENT_BYTES začne nový segment. Ke každému
+segmentu patří řídký časový index (``.idx``): řádek "received_at<TAB>offset"
+vždy, když zápis přejde hranici LOCAL_STORE_INDEX_INTERVAL bajtů. Čtení
+posledních záznamů jde od konce souboru a časový rozsah začíná seekem podle
+indexu, takže ani jedno nečte celou historii.
+"""
+import fcntl
+import glob
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from logs import get_logger
+from schema import as_timestamp
+
+log = get_logger(__name__)
+
+LOCAL_STORE_DIR = os.environ.get('LOCAL_STORE_DIR', 'meteo_store')
+LOCAL_STORE_SEGMENT_BYTES = int(os.environ.get('LOCAL_STORE_SEGMENT_BYTES', 16 * 1024 * 1024))
+LOCAL_STORE_INDEX_INTERVAL = int(os.environ.get('LOCAL_STORE_INDEX_INTERVAL', 64 * 1024))
+LOCAL_STORE_RETENTION_DAYS = int(os.environ.get('LOCAL_STORE_RETENTION_DAYS', 0))
+LOCAL_STORE_FSYNC = os.environ.get('LOCAL_STORE_FSYNC', '0') != '0'
+
+# Záznamy z různých workerů nemusí přijít přesně v časovém pořadí
+ORDER_SLACK = timedelta(minutes=5)
+READ_BLOCK = 64 * 1024
+
+
+def _timestamp(record):
+    try:
+        return as_timestamp(record['received_at'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _bound(value):
+    # Meze dotazu bez zóny jsou místní čas serveru, stejně jako staré záznamy
+    return as_timestamp(value) if value is not None else None
+
+
+def _parse(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        # Nedopsaný řádek po pádu procesu
+        return None
+
+
+class LocalStore:
+    """Append-only úložiště záznamů rozdělené do segmentů s časovým indexem"""
+
+    def __init__(self, path=LOCAL_STORE_DIR, segment_bytes=LOCAL_STORE_SEGMENT_BYTES,
+                 index_interval=LOCAL_STORE_INDEX_INTERVAL, retention_days=LOCAL_STORE_RETENTION_DAYS,
+                 fsync=LOCAL_STORE_FSYNC):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.index_interval = index_interval
+        self.retention_days = retention_days
+        self.fsync = fsync
+        self._thread_lock = threading.Lock()
+        self._lock_file = None
+        self._lock_pid = None
+        self._index_cache = {}  # segment -> (velikost .idx, [(čas, offset)])
+        os.makedirs(path, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        """Zámek pro zápis - mezi vlákny i mezi procesy (gunicorn workery)"""
+        with self._thread_lock:
+            if self._lock_pid != os.getpid():
+                # Po forku nesmíme sdílet popisovač zámku s rodičem
+                self._lock_file = open(os.path.join(self.path, 'store.lock'), 'a')
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.path, 'segment-*.ndjson')))
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, f'segment-{number:06d}.ndjson')
+
+    def _writable_segment(self, size):
+        segments = self.segments()
+        if not segments:
+            return self._segment_path(1)
+        current = segments[-1]
+        if os.path.getsize(current) + size <= self.segment_bytes:
+            return current
+        number = int(os.path.basename(current)[8:14]) + 1
+        self._apply_retention(segments)
+        return self._segment_path(number)
+
+    def _apply_retention(self, segments):
+        """Smaže segmenty, jejichž všechny záznamy jsou starší než retence"""
+        if not self.retention_days:
+            return
+        cutoff = datetime.now().astimezone() - timedelta(days=self.retention_days)
+        # Segment končí tam, kde začíná následující
+        for segment, following in zip(segments, segments[1:]):
+            index = self._index(following)
+            if not index or index[0][0] >= cutoff:
+                break
+            for path in (segment, segment[:-len('.ndjson')] + '.idx'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._index_cache.pop(segment, None)
+
+    def append(self, record):
+        """Připíše záznam na konec aktuálního segmentu"""
+        with self._locked():
+            self._write(record)
+
+    def _write(self, record):
+        line = (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        segment = self._writable_segment(len(line))
+        with open(segment, 'ab') as f:
+            offset = f.tell()
+            f.write(line)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+        interval = self.index_interval
+        if offset == 0 or offset // interval != (offset + len(line)) // interval:
+            received_at = record.get('received_at')
+            if received_at is not None:
+                if isinstance(received_at, datetime):
+                    received_at = received_at.isoformat()
+                with open(segment[:-len('.ndjson')] + '.idx', 'a', encoding='utf-8') as f:
+                    f.write(f'{received_at}\t{offset}\n')
+
+    def _index(self, segment):
+        """Načte (a v paměti podrží) časový index segmentu"""
+        path = segment[:-len('.ndjson')] + '.idx'
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return []
+        cached = self._index_cache.get(segment)
+        if cached and cached[0] == size:
+            return cached[1]
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    received_at, offset = line.rstrip('\n').split('\t')
+                    entries.append((as_timestamp(received_at), int(offset)))
+                except ValueError:
+                    continue
+        entries.sort()
+        self._index_cache[segment] = (size, entries)
+        return entries
+
+    def _matches(self, record, station, start, end):
+        if record is None or (station and record.get('wsid') != station):
+            return None
+        received_at = _timestamp(record)
+        if received_at is None:
+            return None
+        if (start is not None and received_at < start) or (end is not None and received_at >= end):
+            return None
+        return received_at
+
+    def scan(self, station=None, start=None, end=None):
+        """Záznamy v rozsahu [start, end) od nejstaršího"""
+        start, end = _bound(start), _bound(end)
+        segments = self.segments()
+        for i, segment in enumerate(segments):
+            if start is not None and i + 1 < len(segments):
+                following = self._index(segments[i + 1])
+                if following and following[0][0] < start - ORDER_SLACK:
+                    continue
+
+            index = self._index(segment)
+            offset = 0
+            if start is not None and index:
+                position = bisect_left(index, (start - ORDER_SLACK, -1)) - 1
+                if position >= 0:
+                    offset = index[position][1]
+            if end is not None and index and index[0][0] >= end + ORDER_SLACK:
+                return
+
+            with open(segment, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    record = _parse(line)
+                    received_at = _timestamp(record) if record is not None else None
+                    if end is not None and received_at is not None and received_at >= end + ORDER_SLACK:
+                        return
+                    if self._matches(record, station, start, end):
+                        yield record
+
+    def tail(self, station=None, end=None):
+        """Záznamy před `end` od nejnovějšího (čte segmenty odzadu)"""
+        end = _bound(end)
+        for segment in reversed(self.segments()):
+            index = self._index(segment)
+            if end is not None and index and index[0][0] >= end + ORDER_SLACK:
+                continue
+            stop = None
+            if end is not None and index:
+                position = bisect_right(index, (end + ORDER_SLACK, float('inf')))
+                if position < len(index):
+                    stop = index[position][1]
+
+            for line in _read_reverse(segment, stop):
+                record = _parse(line)
+                if self._matches(record, station, None, end):
+                    yield record
+
+    def is_empty(self):
+        return not any(os.path.getsize(s) for s in self.segments())
+
+    def import_legacy_json(self, path):
+        """Jednorázově převezme záznamy ze starého meteo_data.json (jen do prázdného úložiště)"""
+        with self._locked():
+            if not self.is_empty() or not os.path.exists(path):
+                return 0
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    records = json.load(f)
+            except ValueError:
+                return 0
+            for record in records:
+                self._write(record)
+            return len(records)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_local_store(legacy_file=None):
+    """Sdílené lokální úložiště (vytvoří se až při prvním použití)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = LocalStore()
+                if legacy_file:
+                    imported = store.import_legacy_json(legacy_file)
+                    if imported:
+                        log.info(f"✅ Imported {imported} records from {legacy_file} into {store.path}")
+                _store = store
+    return _store
+
+
+def _read_reverse(path, stop=None):
+    """Řádky souboru od konce (nebo od offsetu `stop`) k začátku"""
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END) if stop is None else stop
+        remainder = b''
+        while position > 0:
+            size = min(READ_BLOCK, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + remainder).split(b'\n')
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line
+        if remainder:
+            yield remainder
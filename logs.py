@@ -0,0 +1,126 @@
+"""Strukturované logování s úrovněmi a vzorkováním.
+
+Moduly logují přes get_logger(__name__). Záznam se ve volajícím vlákně
+jen zařadí do fronty, na stderr ho zapisuje samostatné vlákno, takže
+request nečeká na I/O terminálu ani journald.
+
+Dodatečná pole se předávají v `extra` a vypisují se u zprávy:
+LOG_FORMAT=json dává jeden JSON objekt na řádek (ts, level, logger, msg
+a pole), LOG_FORMAT=text čitelný řádek s pole=hodnota. Časté události
+(každý upload) se logují přes extra=sampled(...) - projde jich jen podíl
+LOG_SAMPLE_RATE, chyby se nevzorkují.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))
+
+ROOT_LOGGER = 'meteo'
+
+# Atributy, které má každý LogRecord - všechno ostatní přišlo v extra
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sample'}
+
+_listener = None
+_listener_pid = None
+_setup_lock = threading.Lock()
+
+
+def record_fields(record):
+    """Pole předaná v extra"""
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+            **record_fields(record),
+        }
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        extra = record_fields(record)
+        if extra:
+            line += ' ' + ' '.join(f'{k}={v}' for k, v in extra.items())
+        return line
+
+
+class SampleFilter(logging.Filter):
+    """Propustí záznam s extra=sampled(...) jen s danou pravděpodobností"""
+
+    def filter(self, record):
+        rate = getattr(record, 'sample', 1.0)
+        return rate >= 1 or random.random() < rate
+
+
+def sampled(rate=None, **fields):
+    """`extra` pro častou událost: pole záznamu + míra vzorkování"""
+    return {'sample': LOG_SAMPLE_RATE if rate is None else rate, **fields}
+
+
+def setup_logging():
+    """Nastaví frontu a zapisovací vlákno pro aktuální proces (po forku znovu)"""
+    global _listener, _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _setup_lock:
+        if _listener_pid == os.getpid():
+            return
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, handler)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+        queue_handler = QueueHandler(log_queue)
+        # Vzorkuje se ještě před frontou, zahozené záznamy nic nestojí
+        queue_handler.addFilter(SampleFilter())
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.handlers = [queue_handler]
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+
+
+def _stop_listener():
+    """Při ukončení dopíše frontu"""
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+
+
+def _after_fork():
+    """V potomkovi (gunicorn --preload, multiprocessing) zapisovací vlákno není - založíme nové"""
+    global _setup_lock
+    # Zámek mohlo v okamžiku forku držet jiné vlákno rodiče
+    _setup_lock = threading.Lock()
+    if _listener_pid is not None:
+        setup_logging()
+
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def get_logger(name):
+    """Logger modulu pod společným 'meteo' (nastaví logování při prvním použití)"""
+    setup_logging()
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
@@ -0,0 +1,93 @@
+"""Histogramy dob zpracování ve formátu Prometheus (GET /metrics).
+
+meteo_stage_seconds měří jednotlivé fáze příjmu a čtení dat - parse,
+db_connect, insert, commit, query, serialize - a meteo_http_request_seconds
+celé požadavky podle endpointu. Hodnoty jsou za aktuální proces - s více
+workery gunicornu vrací /metrics čísla workeru, který požadavek obsloužil.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+class Histogram:
+    """Histogram s pevnými hranicemi košů; hodnoty pro každou kombinaci labelů zvlášť"""
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}   # labely -> [počty v koších..., +Inf], součet
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                label_text = _label_text(self.labelnames + ('le',), labels + (bound,))
+                lines.append(f'{self.name}_bucket{label_text} {cumulative}')
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {total}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('meteo_stage_seconds', 'Duration of ingest and read stages', ('stage',))
+REQUEST_SECONDS = Histogram('meteo_http_request_seconds', 'HTTP request duration until the response is returned',
+                            ('endpoint', 'method', 'status'))
+HISTOGRAMS = [STAGE_SECONDS, REQUEST_SECONDS]
+
+
+def timer(stage):
+    """with timer('insert'): ... - doba fáze do meteo_stage_seconds"""
+    return STAGE_SECONDS.time(stage)
+
+
+def render(gauges=None):
+    """Text pro /metrics; `gauges` jsou stavové slovníky (pool, fronta...) jako {prefix: dict}"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for prefix, values in (gauges or {}).items():
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or key == 'pid':
+                continue
+            name = f'meteo_{prefix}_{key}'
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,160 @@
+"""Verzované změny schématu meteo_data.
+
+Každá migrace se spustí jen jednou; hotové verze se zapisují do tabulky
+schema_migrations. Novou změnu přidej na konec seznamu MIGRATIONS s další
+verzí - už nasazené migrace neměň.
+
+Migrace, které by přestavěly meteo_data i s daty (REWRITES), se při startu
+aplikace (init_database) přeskočí - s miliony řádků by kopie běžela v
+každém workeru pod zámkem a s limitem na start workeru. Spouští se
+samostatně a jednou:
+
+    DATABASE_URL=postgresql://... python migrations.py
+
+Pozdější migrace na nich proto nesmějí záviset.
+"""
+import argparse
+
+from db import get_db_connection, release_db_connection
+from dedup import create_upload_keys
+from logs import get_logger
+from partitions import column_types, is_partitioned, partition_meteo_data, rebuild_meteo_data
+from rollups import create_rollups
+from schema import add_missing_columns_sql, create_table_sql
+
+log = get_logger(__name__)
+
+# Libovolné pevné číslo pro pg_advisory_xact_lock, ať migrace nespouští víc workerů naráz
+MIGRATION_LOCK_ID = 741852
+
+
+STATION_TIME_INDEX = """
+    CREATE INDEX IF NOT EXISTS meteo_data_wsid_received_at_idx
+        ON meteo_data (wsid, received_at)
+"""
+# Pořadí bez filtru stanice (build_data_query); id podle času přijetí neroste
+TIME_ID_INDEX = """
+    CREATE INDEX IF NOT EXISTS meteo_data_received_at_id_idx
+        ON meteo_data (received_at, id)
+"""
+TIME_BRIN_INDEX = """
+    CREATE INDEX IF NOT EXISTS meteo_data_received_at_brin
+        ON meteo_data USING BRIN (received_at)
+"""
+
+
+def create_indexes(cur):
+    # Indexy zanikají se starou tabulkou při přestavbě; na rozdělené se propíšou do všech oddílů
+    cur.execute(STATION_TIME_INDEX)
+    cur.execute(TIME_BRIN_INDEX)
+    cur.execute(TIME_ID_INDEX)
+
+
+def partition_by_month(cur):
+    partition_meteo_data(cur)
+    create_indexes(cur)
+
+
+def needs_partitioning(cur):
+    return not is_partitioned(cur)
+
+
+def needs_timestamp_rebuild(cur):
+    types = column_types(cur)
+    return not types.get('datetime') == types.get('received_at') == 'timestamp with time zone'
+
+
+def timestamps_with_time_zone(cur):
+    if not needs_timestamp_rebuild(cur):
+        # Nová instalace nebo tabulku už převedla migrace 4
+        return
+    # Typ klíče oddílů nejde změnit na místě - tabulka se přestaví i s daty
+    rebuild_meteo_data(cur)
+    create_indexes(cur)
+    # Start aplikace mezitím mohl spustit migraci 6 bez klíčů (backfill=False)
+    cur.execute("SELECT to_regclass('meteo_upload_keys') IS NOT NULL")
+    if cur.fetchone()[0]:
+        create_upload_keys(cur)
+
+
+def upload_keys(cur):
+    # Klíče z textového datetime (před migrací 5) nepřevádíme
+    create_upload_keys(cur, backfill=not needs_timestamp_rebuild(cur))
+
+
+MIGRATIONS = [
+    (1, 'index for per-station time queries', STATION_TIME_INDEX),
+    (2, 'BRIN index for time range scans', TIME_BRIN_INDEX),
+    (3, 'rollup tables with backfill from raw data', create_rollups),
+    (4, 'monthly partitions of meteo_data', partition_by_month),
+    (5, 'datetime and received_at as TIMESTAMPTZ', timestamps_with_time_zone),
+    (6, 'upload keys for duplicate suppression', upload_keys),
+    (7, 'index for time-ordered queries without a station', TIME_ID_INDEX),
+]
+
+# Verze migrace -> test, zda by přestavěla meteo_data (na nové instalaci nic nepřestavují)
+REWRITES = {
+    4: needs_partitioning,
+    5: needs_timestamp_rebuild,
+}
+
+
+def migrate(conn, rewrite=False):
+    """Spustí migrace, které v databázi ještě neproběhly; vrátí seznam verzí
+
+    Bez `rewrite` přeskočí migrace, které by přestavěly meteo_data (REWRITES).
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT version FROM schema_migrations")
+    done = {row[0] for row in cur.fetchall()}
+
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        needs_rewrite = REWRITES.get(version)
+        if not rewrite and needs_rewrite and needs_rewrite(cur):
+            log.warning(f"⚠️ Migration {version} ({name}) rewrites meteo_data and was skipped, "
+                        f"run it with: python migrations.py")
+            continue
+        if callable(step):
+            step(cur)
+        else:
+            cur.execute(step)
+        cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        applied.append(version)
+        log.info(f"✅ Migration {version} applied: {name}")
+
+    conn.commit()
+    cur.close()
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending migrations, including ones that rewrite meteo_data')
+    parser.parse_args()
+    conn = get_db_connection()
+    if not conn:
+        raise SystemExit("DATABASE_URL is not set")
+    try:
+        cur = conn.cursor()
+        cur.execute(create_table_sql())
+        cur.execute(add_missing_columns_sql())
+        conn.commit()
+        cur.close()
+        applied = migrate(conn, rewrite=True)
+        print(f"✅ {len(applied)} migrations applied" + (f": {', '.join(map(str, applied))}" if applied else ''))
+    finally:
+        release_db_connection(conn)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""Měsíční oddíly tabulky meteo_data a retence surových dat.
+
+meteo_data je rozdělená podle received_at (PARTITION BY RANGE) na oddíly
+``meteo_data_pRRRRMM``, jeden na kalendářní měsíc v UTC. Oddíly se zakládají
+dopředu na PARTITION_MONTHS_AHEAD měsíců; záznam, pro který oddíl ještě není,
+spadne do ``meteo_data_default`` a při další údržbě se přesune do nově
+založeného oddílu. Vacuum a údržba indexů tak pracují hlavně s aktuálním
+měsícem a stará data se mažou zahozením celého oddílu místo DELETE.
+
+S RAW_RETENTION_MONTHS > 0 se oddíly, které skončily před více než tolika
+celými měsíci, zahazují - ale jen pokud jsou všechny jejich záznamy
+započtené v agregacích (meteo_rollup), takže statistiky za dlouhá
+období zůstanou zachované.
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from db import get_db_connection, release_db_connection
+from dedup import prune_upload_keys
+from logs import get_logger
+from schema import (INSERT_COLUMNS, STATION_TIMEZONES, create_table_sql, server_timezone_name,
+                    station_timezone_name)
+
+log = get_logger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3))
+RAW_RETENTION_MONTHS = int(os.environ.get('RAW_RETENTION_MONTHS', 0))
+PARTITION_MAINTENANCE_INTERVAL = float(os.environ.get('PARTITION_MAINTENANCE_INTERVAL', 6 * 3600))
+
+# Údržbu dělá vždy jen jeden worker (jiné číslo než zámek migrací)
+MAINTENANCE_LOCK_ID = 741853
+
+DEFAULT_PARTITION = 'meteo_data_default'
+_PARTITION_NAME = re.compile(r'meteo_data_p(\d{4})(\d{2})$')
+
+
+def month_start(ts):
+    """Začátek měsíce v UTC (hranice oddílů)"""
+    return ts.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    month = month.astimezone(timezone.utc)
+    return f'meteo_data_p{month.year:04d}{month.month:02d}'
+
+
+def partition_month(name):
+    """Měsíc oddílu podle jeho názvu (None pro výchozí a cizí tabulky)"""
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+
+def retention_cutoff(now=None, months=RAW_RETENTION_MONTHS):
+    """Začátek nejstaršího měsíce, který se ještě drží (None = bez retence)"""
+    if not months:
+        return None
+    return add_months(month_start(now or datetime.now(timezone.utc)), -months)
+
+
+def is_partitioned(cur):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('meteo_data')")
+    row = cur.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def existing_partitions(cur):
+    """Měsíce, pro které už oddíl existuje"""
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'meteo_data'::regclass
+    """)
+    months = (partition_month(name) for (name,) in cur.fetchall())
+    return {month for month in months if month is not None}
+
+
+def create_default_partition(cur):
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF meteo_data DEFAULT")
+
+
+def create_partition(cur, month):
+    """Založí oddíl pro měsíc; záznamy toho měsíce z výchozího oddílu do něj přesune
+
+    Oddíl nejde připojit, dokud výchozí oddíl obsahuje záznamy z jeho rozsahu,
+    proto se nejdřív založí jako samostatná tabulka a připojí se až s daty.
+    """
+    name = partition_name(month)
+    bounds = (month, add_months(month, 1))
+    cur.execute(f"CREATE TABLE {name} (LIKE meteo_data INCLUDING DEFAULTS)")
+    cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE received_at >= %s AND received_at < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, bounds)
+    cur.execute(f"ALTER TABLE meteo_data ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+
+
+def ensure_partitions(cur, now=None, ahead=PARTITION_MONTHS_AHEAD):
+    """Založí oddíly od aktuálního měsíce dopředu a pro záznamy z výchozího oddílu
+
+    Vrací seznam měsíců, pro které oddíl vznikl.
+    """
+    create_default_partition(cur)
+    current = month_start(now or datetime.now(timezone.utc))
+    wanted = {add_months(current, i) for i in range(ahead + 1)}
+    # Zpožděné nebo importované záznamy z měsíců, které oddíl ještě nemají
+    cur.execute(f"SELECT DISTINCT date_trunc('month', received_at, 'UTC') FROM {DEFAULT_PARTITION}")
+    wanted.update(month_start(month) for (month,) in cur.fetchall())
+
+    cutoff = retention_cutoff(now)
+    created = []
+    for month in sorted(wanted - existing_partitions(cur)):
+        if cutoff is not None and month < cutoff:
+            # Záznamy před retencí ve výchozím oddílu smaže drop_expired_partitions
+            continue
+        create_partition(cur, month)
+        created.append(month)
+    return created
+
+
+def rolled_up(cur, month):
+    """Jsou všechny záznamy oddílu započtené v hodinových agregacích?"""
+    cur.execute(f"SELECT count(*) FROM {partition_name(month)}")
+    raw_rows = cur.fetchone()[0]
+    # Agregace mají intervaly v místním čase serveru bez zóny; hodinové sedí
+    # na hranice měsíců v UTC (na rozdíl od denních)
+    bounds = [b.astimezone().replace(tzinfo=None) for b in (month, add_months(month, 1))]
+    cur.execute("""
+        SELECT coalesce(sum(rows), 0) FROM meteo_rollup
+        WHERE resolution = 'hour' AND bucket >= %s AND bucket < %s
+    """, bounds)
+    return cur.fetchone()[0] >= raw_rows
+
+
+def drop_expired_partitions(cur, now=None, months=RAW_RETENTION_MONTHS):
+    """Zahodí oddíly starší než retence; vrací seznam zahozených měsíců"""
+    cutoff = retention_cutoff(now, months)
+    if cutoff is None:
+        return []
+    dropped = []
+    for month in sorted(existing_partitions(cur)):
+        if add_months(month, 1) > cutoff:
+            break
+        if not rolled_up(cur, month):
+            log.warning(f"⚠️ Keeping {partition_name(month)}: not all rows are in rollups yet")
+            continue
+        cur.execute(f"DROP TABLE {partition_name(month)}")
+        dropped.append(month)
+    # Agregace se počítají ve stejné transakci jako INSERT, i pro záznamy ve výchozím oddílu
+    cur.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE received_at < %s", (cutoff,))
+    return dropped
+
+
+def column_types(cur, table='meteo_data'):
+    cur.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+    """, (table,))
+    return dict(cur.fetchall())
+
+
+# Převod textu na čas, který u neplatné hodnoty vrátí NULL místo chyby celé migrace
+TRY_TIMESTAMP_SQL = """
+    CREATE OR REPLACE FUNCTION pg_temp.meteo_try_timestamp(value text) RETURNS timestamp AS $$
+    BEGIN
+        RETURN value::timestamp;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql IMMUTABLE
+"""
+
+
+def _copy_expressions(cur, table):
+    """Výrazy pro SELECT ze staré tabulky, které časy převedou na TIMESTAMPTZ
+
+    Vrací (received_at, {sloupec: výraz}, parametry výrazů v pořadí sloupců).
+    Staré received_at bez zóny je místní čas serveru, text v datetime je
+    místní čas stanice; neplatný datetime nahradí čas přijetí.
+    """
+    types = column_types(cur, table)
+    received_at, received_params = 'received_at', []
+    if types.get('received_at') == 'timestamp without time zone':
+        received_at, received_params = 'received_at AT TIME ZONE %s', [server_timezone_name()]
+
+    expressions = {'received_at': (received_at, received_params)}
+    if types.get('datetime') != 'timestamp with time zone':
+        cur.execute(TRY_TIMESTAMP_SQL)
+        zone, zone_params = '%s', [station_timezone_name(None)]
+        if STATION_TIMEZONES:
+            zone = 'CASE wsid ' + 'WHEN %s THEN %s ' * len(STATION_TIMEZONES) + 'ELSE %s END'
+            zone_params = [v for item in STATION_TIMEZONES.items() for v in item] + zone_params
+        source = 'datetime::text' if types.get('datetime') == 'timestamp without time zone' else 'datetime'
+        expressions['datetime'] = (
+            f'coalesce(pg_temp.meteo_try_timestamp({source}) AT TIME ZONE {zone}, {received_at})',
+            zone_params + received_params,
+        )
+
+    columns = ('id',) + INSERT_COLUMNS + ('created_at',)
+    select, params = [], []
+    for column in columns:
+        expression, expression_params = expressions.get(column, (column, []))
+        select.append(expression)
+        params.extend(expression_params)
+    return expressions['received_at'], columns, select, params
+
+
+def rebuild_meteo_data(cur):
+    """Přestaví meteo_data podle aktuálního create_table_sql a převede do ní data
+
+    Slouží pro starou tabulku bez oddílů nebo se staršími typy sloupců (typ
+    klíče oddílů nejde změnit na místě). Id zůstanou zachovaná. Indexy staré
+    tabulky zaniknou - volající je musí založit znovu.
+    """
+    previous = 'meteo_data_previous'
+    partitioned = is_partitioned(cur)
+    if partitioned:
+        cur.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'meteo_data'::regclass
+        """)
+        children = [name for (name,) in cur.fetchall()]
+    else:
+        children = []
+        cur.execute("""
+            UPDATE meteo_data SET received_at = coalesce(created_at, CURRENT_TIMESTAMP)
+            WHERE received_at IS NULL
+        """)
+
+    cur.execute(f"ALTER TABLE meteo_data RENAME TO {previous}")
+    cur.execute(f"ALTER TABLE {previous} RENAME CONSTRAINT meteo_data_pkey TO {previous}_pkey")
+    # Uvolníme názvy oddílů i indexů pro novou tabulku
+    for name in children:
+        cur.execute(f"ALTER TABLE {name} RENAME TO {previous}{name[len('meteo_data'):]}")
+    cur.execute("DROP INDEX IF EXISTS meteo_data_wsid_received_at_idx, meteo_data_received_at_brin, "
+                "meteo_data_received_at_id_idx")
+    # Nová tabulka převezme sekvenci id, takže id zůstanou a navazují
+    cur.execute(create_table_sql())
+    create_default_partition(cur)
+
+    (received_at, received_params), columns, select, params = _copy_expressions(cur, previous)
+    cur.execute(f"SELECT DISTINCT date_trunc('month', {received_at}, 'UTC') FROM {previous}", received_params)
+    for month in sorted({month_start(month) for (month,) in cur.fetchall()}):
+        create_partition(cur, month)
+    ensure_partitions(cur)
+
+    cur.execute(f"INSERT INTO meteo_data ({', '.join(columns)}) SELECT {', '.join(select)} FROM {previous}",
+                params)
+    cur.execute(f"DROP TABLE {previous}")
+
+
+def partition_meteo_data(cur):
+    """Převede starou nerozdělenou tabulku meteo_data na měsíční oddíly i s daty"""
+    if is_partitioned(cur):
+        # Nová instalace - tabulku už založil init_database
+        ensure_partitions(cur)
+        return
+    rebuild_meteo_data(cur)
+
+
+def maintain_partitions(conn, now=None):
+    """Založí chybějící oddíly, zahodí oddíly po retenci a staré klíče uploadů; vrací (založené, zahozené)"""
+    cur = conn.cursor()
+    cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (MAINTENANCE_LOCK_ID,))
+    if not cur.fetchone()[0] or not is_partitioned(cur):
+        # Údržbu právě dělá jiný worker, nebo ještě neproběhla migrace
+        conn.rollback()
+        cur.close()
+        return [], []
+    created = ensure_partitions(cur, now)
+    dropped = drop_expired_partitions(cur, now)
+    prune_upload_keys(cur, now)
+    conn.commit()
+    cur.close()
+    for month in created:
+        log.info(f"✅ Partition {partition_name(month)} created")
+    for month in dropped:
+        log.info(f"🗑️ Partition {partition_name(month)} dropped by retention")
+    return created, dropped
+
+
+def run_maintenance():
+    conn = get_db_connection()
+    if not conn:
+        return
+    try:
+        maintain_partitions(conn)
+    except Exception as e:
+        log.error(f"❌ Partition maintenance error: {e}")
+        release_db_connection(conn, broken=conn.closed)
+        return
+    release_db_connection(conn)
+
+
+_maintenance_pid = None
+_maintenance_lock = threading.Lock()
+
+
+def _maintenance_loop():
+    while True:
+        time.sleep(PARTITION_MAINTENANCE_INTERVAL)
+        run_maintenance()
+
+
+def start_partition_maintenance():
+    """Spustí v aktuálním procesu vlákno, které pravidelně udržuje oddíly"""
+    global _maintenance_pid
+    if not os.environ.get('DATABASE_URL'):
+        return
+    with _maintenance_lock:
+        if _maintenance_pid == os.getpid():
+            return
+        _maintenance_pid = os.getpid()
+    threading.Thread(target=_maintenance_loop, name='partition-maintenance', daemon=True).start()
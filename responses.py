@@ -0,0 +1,115 @@
+"""Kompaktní kódování a komprese odpovědí JSON API.
+
+Sloupcový formát posílá názvy sloupců jen jednou a vynechá sloupce, které
+jsou ve všech záznamech prázdné (stanice bez venkovního čidla jich má přes
+polovinu). Komprese gzip/brotli se vyjednává podle Accept-Encoding.
+
+Časy posílá API jako epoch milisekundy (UTC), aby je klient nemusel
+parsovat z textu - ``new Date(ms)`` i porovnání čísel jsou zadarmo.
+"""
+import gzip
+from datetime import datetime, timedelta, timezone
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Menší odpovědi nemá smysl komprimovat
+COMPRESS_MIN_BYTES = 500
+COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack', 'text/csv', 'text/html',
+                      'application/x-ndjson')
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def epoch_ms(value):
+    """datetime jako epoch milisekundy; naivní čas je místní čas serveru"""
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return (value - EPOCH) // timedelta(milliseconds=1)
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return epoch_ms(value)
+    return value
+
+
+class ApiJSONProvider(DefaultJSONProvider):
+    """jsonify s časy jako epoch milisekundy místo textu podle RFC 822"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return epoch_ms(o)
+        return DefaultJSONProvider.default(o)
+
+
+def columnar(records):
+    """Záznamy jako {"count": n, "columns": {sloupec: [hodnoty]}, "empty": [sloupce]}
+
+    Sloupce, které jsou ve všech záznamech null, mají v "empty" jen název.
+    """
+    names = list(records[0]) if records else []
+    filled = set()
+    for record in records:
+        filled.update(name for name, value in record.items() if value is not None)
+    return {
+        'count': len(records),
+        'columns': {name: [_value(r.get(name)) for r in records] for name in names if name in filled},
+        'empty': [name for name in names if name not in filled],
+    }
+
+
+def msgpack_available():
+    return msgpack is not None
+
+
+def pack(data):
+    return msgpack.packb(data, default=_value, use_bin_type=True)
+
+
+def negotiate_encoding(accept_encodings):
+    """Nejlepší podporované kódování z Accept-Encoding (nebo None)"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, accept_encodings):
+    """Zkomprimuje hotovou (ne streamovanou) odpověď, pokud o to klient stojí"""
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    encoding = negotiate_encoding(accept_encodings)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == 'br':
+        body = brotli.compress(body, quality=5)
+    else:
+        body = gzip.compress(body, compresslevel=6)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Zkomprimovaná odpověď není bajtově shodná s nekomprimovanou
+        response.set_etag(etag, weak=True)
+    return response
+
@@ -0,0 +1,403 @@
+"""Průběžné agregace měření po minutách, hodinách a dnech.
+
+Tabulka meteo_rollup drží pro každou stanici a interval min/max/součet/počet
+vybraných veličin a úhrn srážek. Úhrn se počítá z přírůstků kumulativních
+čítačů rain_daily (případně rain_yearly) mezi po sobě jdoucími záznamy;
+poslední hodnoty čítačů si pamatuje tabulka meteo_rollup_state. Agregace se
+aktualizují ve stejné transakci jako INSERT surových dat, takže statistiky
+za libovolně dlouhé období jsou součtem pár desítek řádků.
+
+Intervaly agregací (a časy v nich) jsou v místním čase serveru bez zóny,
+aby dny začínaly o místní půlnoci.
+"""
+from datetime import timedelta
+
+from psycopg2.extras import execute_values
+
+from schema import as_timestamp, server_timezone_name
+
+ROLLUP_METRICS = (
+    'outdoor_temp',
+    'outdoor_humidity',
+    'indoor_temp',
+    'indoor_humidity',
+    'relative_pressure',
+    'wind_speed',
+    'wind_gust',
+    'solar_radiation',
+    'uv_index',
+    'soil_temp',
+    'lightning_connection',
+)
+
+RESOLUTIONS = ('minute', 'hour', 'day')
+
+
+def bucket_start(ts, resolution):
+    if resolution == 'minute':
+        return ts.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def resolution_for(span):
+    """Nejhrubší agregace, která pro dané období dá rozumně přesný výsledek"""
+    if span <= timedelta(hours=3):
+        return 'minute'
+    if span <= timedelta(days=14):
+        return 'hour'
+    return 'day'
+
+
+def _metric_columns():
+    for m in ROLLUP_METRICS:
+        yield f'{m}_min', 'FLOAT'
+        yield f'{m}_max', 'FLOAT'
+        yield f'{m}_sum', 'FLOAT NOT NULL DEFAULT 0'
+        yield f'{m}_count', 'INTEGER NOT NULL DEFAULT 0'
+
+
+METRIC_COLUMNS = tuple(name for name, _ in _metric_columns())
+UPSERT_COLUMNS = ('wsid', 'resolution', 'bucket', 'rows', 'rain_mm', 'first_at', 'last_at') + METRIC_COLUMNS
+
+
+def create_rollup_tables_sql():
+    columns = ',\n    '.join(f'{name} {sql_type}' for name, sql_type in _metric_columns())
+    return [
+        f"""CREATE TABLE IF NOT EXISTS meteo_rollup (
+    wsid VARCHAR(50) NOT NULL,
+    resolution VARCHAR(10) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    rain_mm FLOAT NOT NULL DEFAULT 0,
+    first_at TIMESTAMP,
+    last_at TIMESTAMP,
+    {columns},
+    PRIMARY KEY (wsid, resolution, bucket)
+)""",
+        "CREATE INDEX IF NOT EXISTS meteo_rollup_resolution_bucket_idx ON meteo_rollup (resolution, bucket)",
+        """CREATE TABLE IF NOT EXISTS meteo_rollup_state (
+    wsid VARCHAR(50) PRIMARY KEY,
+    received_at TIMESTAMP,
+    rain_daily FLOAT,
+    rain_yearly FLOAT
+)""",
+    ]
+
+
+def _upsert_updates():
+    updates = [
+        'rows = meteo_rollup.rows + EXCLUDED.rows',
+        'rain_mm = meteo_rollup.rain_mm + EXCLUDED.rain_mm',
+        'first_at = LEAST(meteo_rollup.first_at, EXCLUDED.first_at)',
+        'last_at = GREATEST(meteo_rollup.last_at, EXCLUDED.last_at)',
+    ]
+    for m in ROLLUP_METRICS:
+        updates += [
+            f'{m}_min = LEAST(meteo_rollup.{m}_min, EXCLUDED.{m}_min)',
+            f'{m}_max = GREATEST(meteo_rollup.{m}_max, EXCLUDED.{m}_max)',
+            f'{m}_sum = meteo_rollup.{m}_sum + EXCLUDED.{m}_sum',
+            f'{m}_count = meteo_rollup.{m}_count + EXCLUDED.{m}_count',
+        ]
+    return 'ON CONFLICT (wsid, resolution, bucket) DO UPDATE SET ' + ', '.join(updates)
+
+
+def _upsert_sql(values):
+    return f"INSERT INTO meteo_rollup ({', '.join(UPSERT_COLUMNS)}) VALUES {values} {_upsert_updates()}"
+
+
+UPSERT_SQL = _upsert_sql('%s')
+# Totéž pro asyncpg (executemany s číslovanými parametry)
+UPSERT_SQL_ASYNC = _upsert_sql('(' + ', '.join(f'${i}' for i in range(1, len(UPSERT_COLUMNS) + 1)) + ')')
+
+
+def _as_datetime(value):
+    """Čas záznamu jako místní čas serveru bez zóny"""
+    value = as_timestamp(value)
+    return value.astimezone().replace(tzinfo=None)
+
+
+def rain_delta(previous, row):
+    """Srážky mezi dvěma záznamy z kumulativních čítačů (nulování čítače = nový den/rok)"""
+    for key in ('rain_daily', 'rain_yearly'):
+        current, before = row.get(key), previous.get(key)
+        if current is not None and before is not None:
+            return current - before if current >= before else current
+    return 0.0
+
+
+def new_aggregate():
+    agg = {'rows': 0, 'rain_mm': 0.0, 'first_at': None, 'last_at': None}
+    for m in ROLLUP_METRICS:
+        agg[f'{m}_min'] = None
+        agg[f'{m}_max'] = None
+        agg[f'{m}_sum'] = 0.0
+        agg[f'{m}_count'] = 0
+    return agg
+
+
+def accumulate(agg, row, received_at, rain_mm):
+    """Přičte jeden záznam do agregace"""
+    agg['rows'] += 1
+    agg['rain_mm'] += rain_mm
+    if agg['first_at'] is None or received_at < agg['first_at']:
+        agg['first_at'] = received_at
+    if agg['last_at'] is None or received_at > agg['last_at']:
+        agg['last_at'] = received_at
+    for m in ROLLUP_METRICS:
+        value = row.get(m)
+        if value is None:
+            continue
+        if agg[f'{m}_min'] is None or value < agg[f'{m}_min']:
+            agg[f'{m}_min'] = value
+        if agg[f'{m}_max'] is None or value > agg[f'{m}_max']:
+            agg[f'{m}_max'] = value
+        agg[f'{m}_sum'] += value
+        agg[f'{m}_count'] += 1
+
+
+def _ordered(rows):
+    """Záznamy s časem přijetí seřazené po stanicích a čase; vrací (záznamy, stanice)"""
+    rows = sorted(
+        ((row, _as_datetime(row['received_at'])) for row in rows),
+        key=lambda item: (item[0].get('wsid') or '', item[1]),
+    )
+    return rows, sorted({row.get('wsid') or '' for row, _ in rows})
+
+
+def _rollup_values(rows, state):
+    """Přírůstky agregací pro UPSERT; `state` (čítače srážek po stanicích) aktualizuje na místě"""
+    buckets = {}
+    for row, received_at in rows:
+        wsid = row.get('wsid') or ''
+        previous = state[wsid]
+        rain_mm = 0.0
+        if previous['received_at'] is None or received_at > previous['received_at']:
+            if previous['received_at'] is not None:
+                rain_mm = rain_delta(previous, row)
+            state[wsid] = {'received_at': received_at,
+                           'rain_daily': row.get('rain_daily'),
+                           'rain_yearly': row.get('rain_yearly')}
+        # Záznam starší než stav (zpožděná dávka jiného workera) srážky nepřičítá
+
+        for resolution in RESOLUTIONS:
+            key = (wsid, resolution, bucket_start(received_at, resolution))
+            agg = buckets.get(key)
+            if agg is None:
+                agg = buckets[key] = new_aggregate()
+            accumulate(agg, row, received_at, rain_mm)
+
+    return [key + tuple(agg[c] for c in UPSERT_COLUMNS[3:]) for key, agg in sorted(buckets.items())]
+
+
+def update_rollups(cur, rows):
+    """Započítá nově vložené záznamy do agregací (volat ve stejné transakci jako INSERT)"""
+    if not rows:
+        return
+    rows, stations = _ordered(rows)
+
+    # Zamkneme stav čítačů srážek - souběžné dávky stejné stanice se seřadí za sebou
+    execute_values(cur, "INSERT INTO meteo_rollup_state (wsid) VALUES %s ON CONFLICT DO NOTHING",
+                   [(s,) for s in stations])
+    cur.execute("""
+        SELECT wsid, received_at, rain_daily, rain_yearly FROM meteo_rollup_state
+        WHERE wsid = ANY(%s) ORDER BY wsid FOR UPDATE
+    """, (stations,))
+    state = {wsid: {'received_at': received_at, 'rain_daily': daily, 'rain_yearly': yearly}
+             for wsid, received_at, daily, yearly in cur.fetchall()}
+
+    execute_values(cur, UPSERT_SQL, _rollup_values(rows, state))
+    execute_values(cur, """
+        UPDATE meteo_rollup_state AS s
+        SET received_at = v.received_at, rain_daily = v.rain_daily, rain_yearly = v.rain_yearly
+        FROM (VALUES %s) AS v (wsid, received_at, rain_daily, rain_yearly)
+        WHERE s.wsid = v.wsid
+    """, [(wsid, s['received_at'], s['rain_daily'], s['rain_yearly']) for wsid, s in sorted(state.items())],
+        template='(%s, %s::timestamp, %s::float, %s::float)')
+
+
+async def update_rollups_async(conn, rows):
+    """update_rollups pro asyncpg spojení (volat ve stejné transakci jako INSERT)"""
+    if not rows:
+        return
+    rows, stations = _ordered(rows)
+    await conn.executemany("INSERT INTO meteo_rollup_state (wsid) VALUES ($1) ON CONFLICT DO NOTHING",
+                           [(s,) for s in stations])
+    records = await conn.fetch("""
+        SELECT wsid, received_at, rain_daily, rain_yearly FROM meteo_rollup_state
+        WHERE wsid = ANY($1::varchar[]) ORDER BY wsid FOR UPDATE
+    """, stations)
+    state = {r['wsid']: {'received_at': r['received_at'], 'rain_daily': r['rain_daily'],
+                         'rain_yearly': r['rain_yearly']} for r in records}
+
+    await conn.executemany(UPSERT_SQL_ASYNC, _rollup_values(rows, state))
+    await conn.executemany("""
+        UPDATE meteo_rollup_state SET received_at = $2, rain_daily = $3, rain_yearly = $4
+        WHERE wsid = $1
+    """, [(wsid, s['received_at'], s['rain_daily'], s['rain_yearly']) for wsid, s in sorted(state.items())])
+
+
+def _delta_sql(counter):
+    return (f"CASE WHEN {counter} >= prev_{counter} THEN {counter} - prev_{counter} "
+            f"ELSE {counter} END")
+
+
+def _local_received_at(cur, source):
+    """Výraz pro received_at jako místní čas serveru bez zóny (jako _as_datetime); vrací (sql, parametry)
+
+    Intervaly agregací jsou naivní místní čas serveru - TIMESTAMPTZ se musí
+    převést explicitně, jinak by rozhodovala časová zóna session databáze.
+    Stará tabulka (před migrací 5) má received_at bez zóny už v místním čase.
+    """
+    cur.execute("SELECT atttypid::regtype::text FROM pg_attribute "
+                "WHERE attrelid = %s::regclass AND attname = 'received_at'", (source,))
+    if cur.fetchone()[0] == 'timestamp with time zone':
+        return 'received_at AT TIME ZONE %s', [server_timezone_name()]
+    return 'received_at', []
+
+
+def _rollup_from_sql(source, local_at, conflict):
+    """INSERT agregací spočítaných v SQL ze všech záznamů tabulky `source`"""
+    metric_select = ', '.join(
+        f'min({m}), max({m}), coalesce(sum({m}), 0), count({m})' for m in ROLLUP_METRICS
+    )
+    rain = (f"CASE WHEN rain_daily IS NOT NULL AND prev_rain_daily IS NOT NULL THEN {_delta_sql('rain_daily')} "
+            f"WHEN rain_yearly IS NOT NULL AND prev_rain_yearly IS NOT NULL THEN {_delta_sql('rain_yearly')} "
+            f"ELSE 0 END")
+    return f"""
+            INSERT INTO meteo_rollup ({', '.join(UPSERT_COLUMNS)})
+            SELECT coalesce(wsid, ''), %s, date_trunc(%s, local_at), count(*),
+                   coalesce(sum(rain_mm), 0), min(local_at), max(local_at), {metric_select}
+            FROM (
+                SELECT *, {rain} AS rain_mm
+                FROM (
+                    SELECT *,
+                           {local_at} AS local_at,
+                           lag(rain_daily) OVER w AS prev_rain_daily,
+                           lag(rain_yearly) OVER w AS prev_rain_yearly
+                    FROM {source}
+                    WHERE received_at IS NOT NULL
+                    WINDOW w AS (PARTITION BY wsid ORDER BY received_at, id)
+                ) AS ordered
+            ) AS with_rain
+            GROUP BY 1, 3
+            {conflict}
+        """
+
+
+def _rollups_from(cur, source, conflict):
+    local_at, params = _local_received_at(cur, source)
+    sql = _rollup_from_sql(source, local_at, conflict)
+    for resolution in RESOLUTIONS:
+        cur.execute(sql, [resolution, resolution] + params)
+
+
+def backfill_rollups(cur):
+    """Spočítá agregace ze surových dat, která v DB už jsou (jednorázově při migraci)"""
+    _rollups_from(cur, 'meteo_data', 'ON CONFLICT (wsid, resolution, bucket) DO NOTHING')
+    cur.execute("""
+        INSERT INTO meteo_rollup_state (wsid, received_at, rain_daily, rain_yearly)
+        SELECT DISTINCT ON (wsid) coalesce(wsid, ''), received_at, rain_daily, rain_yearly
+        FROM meteo_data
+        WHERE received_at IS NOT NULL
+        ORDER BY wsid, received_at DESC, id DESC
+        ON CONFLICT (wsid) DO NOTHING
+    """)
+
+
+def add_rollups_from(cur, table):
+    """Přičte k agregacím záznamy z `table` se sloupci meteo_data (import historie)
+
+    Srážky se počítají jen z přírůstků mezi záznamy této tabulky. Stav čítačů
+    pro živý příjem (meteo_rollup_state) se nemění.
+    """
+    _rollups_from(cur, table, _upsert_updates())
+
+
+def refresh_metrics(cur, rows, metrics):
+    """Přepočítá min/max/součet/počet `metrics` v intervalech, kam patří `rows` [(wsid, received_at)]
+
+    Pro hodnoty doplněné do meteo_data dodatečně (dopočet odvozených veličin) -
+    přičítat je nejde, protože záznamy už v agregacích jsou, jen bez nich.
+    Počty záznamů a srážky se nemění.
+    """
+    keys = {(wsid or '', resolution, bucket_start(_as_datetime(received_at), resolution))
+            for wsid, received_at in rows for resolution in RESOLUTIONS}
+    if not keys or not metrics:
+        return
+    tz = cur.mogrify('%s', (server_timezone_name(),)).decode()
+    columns = [f'{m}_{suffix}' for m in metrics for suffix in ('min', 'max', 'sum', 'count')]
+    aggregates = ', '.join(
+        f'min(m.{m}), max(m.{m}), coalesce(sum(m.{m}), 0), count(m.{m})' for m in metrics
+    )
+    execute_values(cur, f"""
+        UPDATE meteo_rollup AS r SET {', '.join(f'{c} = a.{c}' for c in columns)}
+        FROM (
+            SELECT v.wsid, v.resolution, v.bucket, {aggregates}
+            FROM (VALUES %s) AS v(wsid, resolution, bucket)
+            LEFT JOIN meteo_data AS m
+                ON coalesce(m.wsid, '') = v.wsid
+                AND m.received_at >= v.bucket AT TIME ZONE {tz}
+                AND m.received_at < (v.bucket + ('1 ' || v.resolution)::interval) AT TIME ZONE {tz}
+            GROUP BY v.wsid, v.resolution, v.bucket
+        ) AS a(wsid, resolution, bucket, {', '.join(columns)})
+        WHERE r.wsid = a.wsid AND r.resolution = a.resolution AND r.bucket = a.bucket
+    """, sorted(keys), template='(%s, %s, %s::timestamp)')
+
+
+def create_rollups(cur):
+    for statement in create_rollup_tables_sql():
+        cur.execute(statement)
+    backfill_rollups(cur)
+
+
+def stats_query(resolution, start, station=None):
+    """SELECT, který sečte agregace od `start`; vrací (sql, parametry)"""
+    select = ['sum(rows) AS rows', 'sum(rain_mm) AS rain_mm',
+              'min(first_at) AS first_at', 'max(last_at) AS last_at']
+    for m in ROLLUP_METRICS:
+        select += [f'min({m}_min) AS {m}_min', f'max({m}_max) AS {m}_max',
+                   f'sum({m}_sum) AS {m}_sum', f'sum({m}_count) AS {m}_count']
+    sql = f"SELECT {', '.join(select)} FROM meteo_rollup WHERE resolution = %s AND bucket >= %s"
+    params = [resolution, start]
+    if station:
+        sql += ' AND wsid = %s'
+        params.append(station)
+    return sql, params
+
+
+def summarize(records):
+    """Agregace nad seznamem záznamů v paměti (když neběží databáze)"""
+    agg = new_aggregate()
+    previous = {}
+    for row in sorted(records, key=lambda r: (r.get('wsid') or '', str(r.get('received_at')))):
+        try:
+            received_at = _as_datetime(row['received_at'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        wsid = row.get('wsid') or ''
+        rain_mm = rain_delta(previous[wsid], row) if wsid in previous else 0.0
+        previous[wsid] = row
+        accumulate(agg, row, received_at, rain_mm)
+    return agg
+
+
+def format_stats(agg):
+    """Převede součtovou agregaci na min/max/průměr pro API"""
+    metrics = {}
+    for m in ROLLUP_METRICS:
+        count = int(agg.get(f'{m}_count') or 0)
+        metrics[m] = {
+            'min': agg.get(f'{m}_min'),
+            'max': agg.get(f'{m}_max'),
+            'avg': agg[f'{m}_sum'] / count if count else None,
+            'count': count,
+        }
+    return {
+        'count': int(agg.get('rows') or 0),
+        'first_at': agg.get('first_at'),
+        'last_at': agg.get('last_at'),
+        'rain_mm': agg.get('rain_mm') or 0.0,
+        'metrics': metrics,
+    }
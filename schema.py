@@ -0,0 +1,429 @@
+"""Popis parametrů protokolu WSLink a tabulky meteo_data.
+
+Jediná tabulka FIELDS určuje, jak se parametr z dotazu meteostanice převede
+na sloupec (typ, jednotka, platný rozsah). Z ní se skládá parser
+``parse_wslink``, ``CREATE TABLE`` i seznam sloupců pro INSERT.
+"""
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+Field = namedtuple('Field', 'key column type unit valid_range')
+
+SQL_TYPES = {float: 'FLOAT', int: 'INTEGER', str: 'VARCHAR(50)'}
+
+# Konzole posílá datetime v místním čase bez časové zóny. STATION_TIMEZONE je
+# výchozí pásmo stanic (bez něj pásmo serveru), STATION_TIMEZONES ho přepíše
+# pro jednotlivé stanice: "garni001=Europe/Prague,garni002=Europe/London".
+STATION_TIMEZONE = os.environ.get('STATION_TIMEZONE') or None
+STATION_TIMEZONES = dict(
+    item.split('=', 1) for item in os.environ.get('STATION_TIMEZONES', '').split(',') if '=' in item
+)
+
+# wsid posílá klient - paměťové struktury po stanicích (latest.py, hotwindow.py)
+# drží nejvýš tolik stanic, jinak by je zahltily uploady s vymyšlenými wsid
+MAX_STATIONS = int(os.environ.get('MAX_STATIONS', 100))
+
+# Platné rozsahy - hodnoty mimo rozsah ukládáme jako NULL
+TEMP = (-60.0, 80.0)
+HUMIDITY = (0, 100)
+PRESSURE = (300.0, 1200.0)
+PERCENT = (0, 100)
+WIND_SPEED = (0.0, 120.0)
+RAIN = (0.0, 100000.0)
+COUNT = (0, 1000000)
+ANY = None
+
+FIELDS = (
+    # Tlak
+    Field('rbar', 'relative_pressure', float, 'hPa', PRESSURE),
+    Field('abar', 'absolute_pressure', float, 'hPa', PRESSURE),
+
+    # Vnitřní senzory
+    Field('intem', 'indoor_temp', float, '°C', TEMP),
+    Field('inhum', 'indoor_humidity', int, '%', HUMIDITY),
+    Field('inbat', 'console_battery', int, None, ANY),
+
+    # Venkovní senzory (Type1)
+    Field('t1tem', 'outdoor_temp', float, '°C', TEMP),
+    Field('t1hum', 'outdoor_humidity', int, '%', HUMIDITY),
+    Field('t1feels', 'feels_like', float, '°C', TEMP),
+    Field('t1chill', 'wind_chill', float, '°C', TEMP),
+    Field('t1heat', 'heat_index', float, '°C', TEMP),
+    Field('t1dew', 'dew_point', float, '°C', TEMP),
+
+    # Vítr
+    Field('t1wdir', 'wind_direction', int, '°', (0, 360)),
+    Field('t1ws', 'wind_speed', float, 'm/s', WIND_SPEED),
+    Field('t1ws10mav', 'wind_speed_10min_avg', float, 'm/s', WIND_SPEED),
+    Field('t1wgust', 'wind_gust', float, 'm/s', WIND_SPEED),
+
+    # Déšť
+    Field('t1rainra', 'rain_rate', float, 'mm/h', (0.0, 2000.0)),
+    Field('t1rainhr', 'rain_hourly', float, 'mm', RAIN),
+    Field('t1raindy', 'rain_daily', float, 'mm', RAIN),
+    Field('t1rainwy', 'rain_weekly', float, 'mm', RAIN),
+    Field('t1rainmth', 'rain_monthly', float, 'mm', RAIN),
+    Field('t1rainyr', 'rain_yearly', float, 'mm', RAIN),
+
+    # Ostatní
+    Field('t1uvi', 'uv_index', float, None, (0.0, 30.0)),
+    Field('t1solrad', 'solar_radiation', float, 'W/m²', (0.0, 2000.0)),
+    Field('t1wbgt', 'wbgt_temp', float, '°C', TEMP),
+    Field('t1bat', 'outdoor_battery', int, None, ANY),
+    Field('t1cn', 'outdoor_connection', int, None, ANY),
+
+    # Lightning Sensor (Type5)
+    Field('t5lst', 'lightning_last_strike_time', int, 's', ANY),
+    Field('t5lskm', 'lightning_distance_km', int, 'km', (0, 100)),
+    Field('t5lsf', 'lightning_strikes_1hour', int, None, COUNT),
+    Field('t5ls5mtc', 'lightning_count_5min', int, None, COUNT),
+    Field('t5ls30mtc', 'lightning_count_30min', int, None, COUNT),
+    Field('t5ls1htc', 'lightning_count_1hour', int, None, COUNT),
+    Field('t5ls1dtc', 'lightning_count_1day', int, None, COUNT),
+    Field('t5lsbat', 'lightning_battery', int, '%', PERCENT),
+    Field('t5lscn', 'lightning_connection', int, None, ANY),
+)
+
+# Dodatečné senzory (Type2,3,4) - prvních 7 kanálů
+CHANNELS = range(1, 8)
+CHANNEL_FIELDS = (
+    ('tem', 'temp', float, '°C', TEMP),
+    ('hum', 'humidity', int, '%', HUMIDITY),
+    ('bat', 'battery', int, None, ANY),
+    ('cn', 'connection', int, None, ANY),
+    ('tp', 'type', int, None, ANY),
+)
+# Kanál 2 je obvykle půdní teplota a vlhkost
+SOIL_CHANNEL = 2
+SOIL_COLUMNS = {'temp': 'soil_temp', 'humidity': 'soil_humidity',
+                'battery': 'soil_battery', 'connection': 'soil_connection'}
+
+
+def channel_fields(channel):
+    return tuple(
+        Field(f't234c{channel}{suffix}', f'ch{channel}_{name}', type_, unit, valid_range)
+        for suffix, name, type_, unit, valid_range in CHANNEL_FIELDS
+    )
+
+
+def _soil_fields():
+    return tuple(
+        Field(None, SOIL_COLUMNS[name], type_, unit, valid_range)
+        for _, name, type_, unit, valid_range in CHANNEL_FIELDS
+        if name in SOIL_COLUMNS
+    )
+
+
+# Pořadí sloupců v tabulce (kanály 3-7 byly přidány později, proto jsou na konci)
+DATA_FIELDS = (
+    FIELDS
+    + channel_fields(1)
+    + channel_fields(2)
+    + _soil_fields()
+    + sum((channel_fields(i) for i in CHANNELS if i > 2), ())
+)
+
+# Sloupce, které plní server, ne parametry měření
+META_COLUMNS = (
+    ('wsid', 'VARCHAR(50)'),
+    ('datetime', 'TIMESTAMPTZ'),
+    ('received_at', 'TIMESTAMPTZ'),
+)
+
+# Sloupce s časem - API je posílá jako epoch milisekundy
+TIMESTAMP_COLUMNS = ('datetime', 'received_at', 'created_at')
+
+# Podle tohoto sloupce je meteo_data rozdělená na měsíční oddíly
+PARTITION_KEY = 'received_at'
+
+INSERT_COLUMNS = tuple(name for name, _ in META_COLUMNS) + tuple(f.column for f in DATA_FIELDS)
+COLUMN_TYPES = dict(META_COLUMNS, **{f.column: SQL_TYPES[f.type] for f in DATA_FIELDS})
+
+
+def create_table_sql():
+    """CREATE TABLE pro meteo_data složený z tabulky polí
+
+    Tabulka je rozdělená po měsících podle received_at (viz partitions.py),
+    primární klíč proto musí obsahovat i received_at. Id dál přiděluje
+    sekvence meteo_data_id_seq, kterou měla i původní tabulka se SERIAL.
+    """
+    columns = ["id INTEGER NOT NULL DEFAULT nextval('meteo_data_id_seq')"]
+    columns += [f'{name} {COLUMN_TYPES[name]}' + (' NOT NULL' if name == PARTITION_KEY else '')
+                for name in INSERT_COLUMNS]
+    columns.append('created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP')
+    columns.append(f'PRIMARY KEY (id, {PARTITION_KEY})')
+    return (
+        'CREATE SEQUENCE IF NOT EXISTS meteo_data_id_seq;\n'
+        'CREATE TABLE IF NOT EXISTS meteo_data (\n    ' + ',\n    '.join(columns) + '\n)'
+        f' PARTITION BY RANGE ({PARTITION_KEY});\n'
+        'ALTER SEQUENCE meteo_data_id_seq OWNED BY meteo_data.id'
+    )
+
+
+def add_missing_columns_sql():
+    """ALTER TABLE pro sloupce, které ve starší tabulce ještě nejsou"""
+    return 'ALTER TABLE meteo_data ' + ', '.join(
+        f'ADD COLUMN IF NOT EXISTS {name} {COLUMN_TYPES[name]}' for name in INSERT_COLUMNS
+    )
+
+
+_ZONES = {wsid: ZoneInfo(name) for wsid, name in STATION_TIMEZONES.items()}
+_DEFAULT_ZONE = ZoneInfo(STATION_TIMEZONE) if STATION_TIMEZONE else None
+# Nejmenší čas s časovou zónou (místo datetime.min, které nejde porovnat s časy se zónou)
+TIMESTAMP_MIN = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def server_timezone_name():
+    """Název časového pásma serveru (pro převod starých časů bez zóny v SQL)"""
+    name = os.environ.get('TZ', '').lstrip(':')
+    if name:
+        return name
+    try:
+        target = os.path.realpath('/etc/localtime')
+    except OSError:
+        return 'UTC'
+    if '/zoneinfo/' in target:
+        return target.split('/zoneinfo/', 1)[1]
+    return 'UTC'
+
+
+def station_timezone_name(wsid):
+    return STATION_TIMEZONES.get(wsid) or STATION_TIMEZONE or server_timezone_name()
+
+
+def as_timestamp(value):
+    """Čas jako datetime s časovou zónou; naivní čas je místní čas serveru
+
+    Text v neplatném formátu vyhodí ValueError.
+    """
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value
+
+
+def station_time(value, wsid=None):
+    """Čas z konzole stanice (místní čas bez zóny) jako datetime s časovou zónou
+
+    Neplatnou hodnotu vrátí jako None.
+    """
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            try:
+                # Některé konzole neposílají úvodní nuly ("2025-6-7 9:05:00")
+                parsed = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+            except (TypeError, ValueError):
+                return None
+    if parsed.tzinfo is None:
+        zone = _ZONES.get(wsid, _DEFAULT_ZONE)
+        parsed = parsed.replace(tzinfo=zone) if zone else parsed.astimezone()
+    return parsed
+
+
+def with_timestamps(record):
+    """Záznam z lokálního úložiště (časy jako text) s časy převedenými na datetime"""
+    record = dict(record)
+    for column in TIMESTAMP_COLUMNS:
+        value = record.get(column)
+        if isinstance(value, str):
+            if column == 'datetime':
+                record[column] = station_time(value, record.get('wsid'))
+            else:
+                try:
+                    record[column] = as_timestamp(value)
+                except ValueError:
+                    record[column] = None
+    return record
+
+
+# Předkompilovaná tabulka pro parser: parametr -> (sloupec, převod, min, max, kanál)
+_WIRE = {}
+for _field in FIELDS:
+    _WIRE[_field.key] = (_field.column, _field.type) + (_field.valid_range or (None, None)) + (None,)
+for _channel in CHANNELS:
+    for _field in channel_fields(_channel):
+        _WIRE[_field.key] = (_field.column, _field.type) + (_field.valid_range or (None, None)) + (_channel,)
+
+del _field, _channel
+
+_BASE_TEMPLATE = {f.column: None for f in FIELDS}
+_CHANNEL_TEMPLATES = {i: {f.column: None for f in channel_fields(i)} for i in CHANNELS}
+_CHANNEL_GATES = {i: f't234c{i}tem' for i in CHANNELS}
+_SOIL_MAP = {f'ch{SOIL_CHANNEL}_{name}': column for name, column in SOIL_COLUMNS.items()}
+
+
+def parse_wslink(args, now=None):
+    """Převede parametry dotazu z meteostanice na záznam pro tabulku meteo_data
+
+    Projde parametry jen jednou; neznámé parametry ignoruje, neplatné nebo
+    nesmyslné hodnoty uloží jako None. Kanály t234c se do záznamu dostanou
+    jen tehdy, když stanice posílá jejich teplotu. Časy jsou datetime
+    s časovou zónou; datetime stanice se čte v jejím pásmu (viz STATION_TIMEZONE).
+    """
+    now = now or datetime.now().astimezone()
+    weather_data = {
+        'wsid': 'unknown',
+        'datetime': None,
+        'received_at': now,
+    }
+    weather_data.update(_BASE_TEMPLATE)
+    channels = None
+
+    for key, raw in args.items():
+        spec = _WIRE.get(key)
+        if spec is None:
+            if key == 'wsid' or key == 'datetime':
+                weather_data[key] = raw
+            continue
+
+        column, convert, low, high, channel = spec
+        try:
+            value = convert(raw)
+        except ValueError:
+            value = None
+        else:
+            if low is not None and not low <= value <= high:
+                value = None
+
+        if channel is None:
+            weather_data[column] = value
+        else:
+            if channels is None:
+                channels = {}
+            channels.setdefault(channel, {})[column] = value
+
+    # Bez (platného) času stanice použijeme čas přijetí
+    weather_data['datetime'] = station_time(weather_data['datetime'], weather_data['wsid']) or now
+
+    if channels:
+        for channel in sorted(channels):
+            if not args.get(_CHANNEL_GATES[channel]):
+                continue
+            values = channels[channel]
+            weather_data.update(_CHANNEL_TEMPLATES[channel])
+            weather_data.update(values)
+            if channel == SOIL_CHANNEL:
+                for column, soil_column in _SOIL_MAP.items():
+                    weather_data[soil_column] = weather_data[column]
+
+    return weather_data
+
+
+# Typ a platný rozsah každého datového sloupce (pro záznamy se jmény sloupců)
+_COLUMN_SPECS = {f.column: (f.type,) + (f.valid_range or (None, None)) for f in DATA_FIELDS}
+
+
+def _convert(convert, raw):
+    if convert is int and not isinstance(raw, int):
+        # CSV a JSON mohou mít celé číslo zapsané jako "62.0"
+        value = float(raw)
+        if not value.is_integer():
+            raise ValueError(f"not an integer: {raw}")
+        return int(value)
+    return convert(raw)
+
+
+def parse_record(values, wsid=None):
+    """Převede záznam se jmény sloupců (meteo_data.json, CSV export) na záznam pro meteo_data
+
+    Hodnoty se ověří stejně jako v parse_wslink: převod na typ sloupce,
+    mimo platný rozsah nebo neplatné jako None; neznámé sloupce se vynechají.
+    Hodnoty kanálu SOIL_CHANNEL se doplní i do sloupců soil_*. Záznam bez
+    wsid dostane `wsid`. Bez platného received_at vyhodí ValueError.
+    """
+    received_at = values.get('received_at')
+    if received_at in (None, ''):
+        raise ValueError("missing received_at")
+    record = {
+        'wsid': values.get('wsid') or wsid or 'unknown',
+        'received_at': as_timestamp(received_at),
+    }
+    record['datetime'] = station_time(values.get('datetime'), record['wsid']) or record['received_at']
+    for column, (convert, low, high) in _COLUMN_SPECS.items():
+        raw = values.get(column)
+        value = None
+        if raw is not None and raw != '':
+            try:
+                value = _convert(convert, raw)
+            except (TypeError, ValueError):
+                value = None
+            else:
+                if low is not None and not low <= value <= high:
+                    value = None
+        record[column] = value
+    # Půdní čidlo je kanál SOIL_CHANNEL (jako v parse_wslink); starší exporty soil_* nemají
+    if any(record[column] is not None for column in _SOIL_MAP):
+        for column, soil_column in _SOIL_MAP.items():
+            if record[soil_column] is None:
+                record[soil_column] = record[column]
+    return record
+
+
+# Sloupce, které lze vybírat v dotazech na data
+QUERYABLE_COLUMNS = ('id',) + INSERT_COLUMNS + ('created_at',)
+
+
+def build_data_query(station=None, start=None, end=None, limit=1000, columns=None, before=None,
+                     ascending=False, after_id=None, after_time=None):
+    """Sestaví SELECT nad meteo_data; vrací dvojici (sql, parametry)
+
+    Řadí se vždy podle (received_at, id) - id podle času přijetí růst nemusí
+    (import historie, importer.py, dostane nová id). S filtrem stanice
+    slouží index (wsid, received_at), bez něj index (received_at, id), takže
+    posledních N záznamů je zpětný průchod indexem místo řazení celé
+    tabulky. Časový rozsah pokrývá BRIN index na received_at.
+
+    `before` je kurzor (received_at, id) posledního záznamu předchozí
+    stránky; vrátí se jen starší záznamy (keyset stránkování). S `ascending`
+    se řadí od nejstarších (export), indexy se pak prochází dopředu.
+
+    `after_id` / `after_time` omezí výsledek na záznamy novější než záznam
+    s daným id (jeho (received_at, id)) nebo než čas přijetí - přírůstky
+    pro klienta, který už starší data má. Neznámé id (záznam smazaný
+    retencí) se porovná jen s id jako dřív.
+    """
+    if columns:
+        unknown = [c for c in columns if c not in QUERYABLE_COLUMNS]
+        if unknown:
+            raise ValueError(f"unknown columns: {', '.join(unknown)}")
+        select = ', '.join(columns)
+    else:
+        select = '*'
+
+    where, params = [], []
+    if station:
+        where.append('wsid = %s')
+        params.append(station)
+    if start:
+        where.append('received_at >= %s')
+        params.append(start)
+    if end:
+        where.append('received_at < %s')
+        params.append(end)
+    if before:
+        where.append('(received_at, id) < (%s, %s)')
+        params.extend(before)
+    if after_id is not None:
+        where.append('((received_at, id) > (SELECT received_at, id FROM meteo_data WHERE id = %s) '
+                     'OR (id > %s AND NOT EXISTS (SELECT 1 FROM meteo_data WHERE id = %s)))')
+        params.extend([after_id] * 3)
+    if after_time is not None:
+        where.append('received_at > %s')
+        params.append(after_time)
+
+    sql = f'SELECT {select} FROM meteo_data'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    direction = 'ASC' if ascending else 'DESC'
+    sql += f' ORDER BY received_at {direction}, id {direction}'
+    if limit:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    return sql, params
@@ -0,0 +1,187 @@
+"""Časové řady pro grafy (/api/series).
+
+Pro požadovaný rozsah a počet bodů se vybere nejhrubší zdroj, který má
+pořád aspoň tolik hodnot, kolik se má vykreslit: denní, hodinové nebo
+minutové agregace z meteo_rollup (průměr za interval, navíc min a max),
+a teprve pro krátké rozsahy surová data. Výsledek se zmenší na N bodů
+algoritmem Largest-Triangle-Three-Buckets, který z každého koše vybere
+bod s největší plochou trojúhelníku se sousedy - špičky a propady tak
+v grafu zůstanou, na rozdíl od průměrování nebo vynechání každého k-tého.
+
+Řada se drží v polích NumPy (pip install numpy); bez něj endpoint vrací 501.
+"""
+import os
+from datetime import timedelta
+
+from derived import (COMPUTED_METRICS, altitude_sql, altitudes, columns_from_records, compute_metric,
+                     metric_inputs, needs_altitude)
+from rollups import RESOLUTIONS, ROLLUP_METRICS
+from schema import COLUMN_TYPES, as_timestamp, server_timezone_name
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SERIES_DEFAULT_POINTS = int(os.environ.get('SERIES_DEFAULT_POINTS', 1000))
+SERIES_MAX_POINTS = int(os.environ.get('SERIES_MAX_POINTS', 5000))
+# Surová data se čtou celá (fetchall) - delší rozsah jen z agregací
+SERIES_RAW_MAX_DAYS = float(os.environ.get('SERIES_RAW_MAX_DAYS', 7))
+RAW_MAX_SPAN = timedelta(days=SERIES_RAW_MAX_DAYS)
+
+# Číselné sloupce a veličiny odvozené z nich (derived.py), které jde vykreslit
+SERIES_METRICS = (tuple(c for c, sql_type in COLUMN_TYPES.items() if sql_type in ('FLOAT', 'INTEGER'))
+                  + tuple(COMPUTED_METRICS))
+SOURCES = ('raw',) + RESOLUTIONS
+
+RESOLUTION_STEPS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+
+def series_available():
+    return np is not None
+
+
+def select_source(metric, span, points):
+    """Nejhrubší agregace s aspoň `points` intervaly v rozsahu, jinak surová data
+
+    Agregace existují jen pro ROLLUP_METRICS, ostatní veličiny se čtou vždy
+    surové - a proto jen pro rozsahy do RAW_MAX_SPAN (kontroluje /api/series).
+    """
+    if metric in ROLLUP_METRICS:
+        for resolution in reversed(RESOLUTIONS):
+            if span / RESOLUTION_STEPS[resolution] >= points:
+                return resolution
+    return 'raw'
+
+
+def series_query(metric, source, start, end, station=None):
+    """SELECT (čas v epoch sekundách, hodnota[, min, max]) od nejstaršího; vrací (sql, parametry)
+
+    Surová data vrací místo hodnoty sloupce metric_inputs(metric) (u přepočtu
+    tlaku navíc nadmořskou výšku stanice), ze kterých raw_series hodnotu
+    doplní nebo spočítá. Agregace bez stanice průměrují všechny stanice
+    (součty a počty za interval).
+    """
+    if metric not in SERIES_METRICS:
+        raise ValueError(f"unknown metric: {metric}")
+    if source == 'raw':
+        inputs = metric_inputs(metric)
+        present = ' OR '.join(f'{c} IS NOT NULL' for c in inputs)
+        selected, params = list(inputs), []
+        if needs_altitude(metric):
+            altitude, params = altitude_sql()
+            selected.append(altitude)
+        sql = (f"SELECT extract(epoch FROM received_at)::float8, {', '.join(selected)} FROM meteo_data "
+               f"WHERE received_at >= %s AND received_at < %s AND ({present})")
+        params += [start, end]
+        if station:
+            sql += ' AND wsid = %s'
+            params.append(station)
+        return sql + ' ORDER BY received_at', params
+
+    # Intervaly agregací jsou v místním čase serveru bez zóny
+    sql = (f"SELECT extract(epoch FROM bucket AT TIME ZONE %s)::float8, "
+           f"sum({metric}_sum) / sum({metric}_count), min({metric}_min), max({metric}_max) FROM meteo_rollup "
+           f"WHERE resolution = %s AND bucket >= %s AND bucket < %s AND {metric}_count > 0")
+    params = [server_timezone_name(), source, _local(start), _local(end)]
+    if station:
+        sql += ' AND wsid = %s'
+        params.append(station)
+    return sql + ' GROUP BY bucket ORDER BY bucket', params
+
+
+def _local(ts):
+    return as_timestamp(ts).astimezone().replace(tzinfo=None)
+
+
+def to_arrays(rows, width):
+    """Řádky dotazu o `width` sloupcích jako sloupce float64"""
+    table = np.array(rows, dtype=np.float64).reshape(len(rows), width)
+    return tuple(table[:, i] for i in range(width))
+
+
+def raw_inputs(metric):
+    """Sloupce surového dotazu za časem (viz series_query)"""
+    return metric_inputs(metric) + (('altitude',) if needs_altitude(metric) else ())
+
+
+def raw_series(columns, metric):
+    """(čas, vstupní sloupce...) surového dotazu na (čas, hodnota); řádky bez hodnoty vypadnou"""
+    values = compute_metric(metric, dict(zip(raw_inputs(metric), columns[1:])))
+    present = ~np.isnan(values)
+    return columns[0][present], values[present]
+
+
+def records_to_arrays(records, metric):
+    """Totéž ze záznamů lokálního úložiště (bez databáze jsou jen surová data)"""
+    columns = columns_from_records(records, metric_inputs(metric))
+    if needs_altitude(metric):
+        columns['altitude'] = altitudes([r.get('wsid') for r in records])
+    times = np.array([as_timestamp(r['received_at']).timestamp() for r in records], dtype=np.float64)
+    return raw_series((times,) + tuple(columns.values()), metric)
+
+
+def lttb(x, y, points):
+    """Indexy bodů vybraných algoritmem Largest-Triangle-Three-Buckets
+
+    První a poslední bod zůstávají vždy, zbytek se rozdělí do `points` - 2
+    košů. Bod z koše závisí na bodu vybraném z předchozího, takže se koše
+    procházejí postupně, ale každý koš se spočítá jednou vektorovou operací
+    nad předem připravenou maticí kandidátů.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    buckets = points - 2
+    edges = (np.arange(buckets + 1) * ((n - 2) / buckets)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    starts, sizes = edges[:-1], np.diff(edges)
+
+    # Průměr následujícího koše (pro poslední koš je to poslední bod)
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], starts - 1)[1:] / sizes[1:], x[-1])
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], starts - 1)[1:] / sizes[1:], y[-1])
+
+    # Kandidáti košů v matici; kratší koše doplní opakování posledního bodu,
+    # argmax vrací první maximum, takže doplněk nikdy nevyhraje navíc
+    candidates = starts[:, None] + np.minimum(np.arange(sizes.max()), sizes[:, None] - 1)
+    cand_x, cand_y = x[candidates], y[candidates]
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a_x, a_y = x[0], y[0]
+    for i in range(buckets):
+        bx, by = cand_x[i], cand_y[i]
+        area = np.abs((a_x - avg_x[i]) * (by - a_y) - (a_x - bx) * (avg_y[i] - a_y))
+        best = area.argmax()
+        selected[i + 1] = candidates[i, best]
+        a_x, a_y = bx[best], by[best]
+    return selected
+
+
+def downsample(columns, points):
+    """Zmenší sloupce (čas, hodnota, ...) na `points` bodů podle LTTB nad hodnotou"""
+    index = lttb(columns[0], columns[1], points)
+    return tuple(column[index] for column in columns)
+
+
+def series_response(columns, metric, source, station, start, end):
+    """JSON pro API: časy jako epoch milisekundy, hodnoty jako sloupce"""
+    result = {
+        'metric': metric,
+        'station': station,
+        'source': source,
+        'from': start,
+        'to': end,
+        'count': len(columns[0]),
+        'time': np.rint(columns[0] * 1000).astype(np.int64).tolist(),
+        'value': columns[1].tolist(),
+    }
+    if len(columns) == 4:
+        result['min'] = columns[2].tolist()
+        result['max'] = columns[3].tolist()
+    return result
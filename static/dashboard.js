@@ -0,0 +1,547 @@
+let allData = [];
+let initialLoaded = false;
+
+// Nejvýš tolik posledních záznamů držíme v allData
+const MAX_RECORDS = 1000;
+
+// Sloupce, které si CSV export stahuje ze serveru
+const EXPORT_FIELDS = ['outdoor_temp', 'outdoor_humidity', 'indoor_temp', 'indoor_humidity',
+                       'relative_pressure', 'absolute_pressure', 'wind_speed', 'wind_direction',
+                       'rain_rate', 'rain_daily', 'uv_index', 'solar_radiation', 'lightning_distance_km'];
+
+function showTab(tabName) {
+    // Hide all tabs
+    document.querySelectorAll('.tab-content').forEach(tab => {
+        tab.classList.remove('active');
+    });
+    document.querySelectorAll('.nav-tab').forEach(tab => {
+        tab.classList.remove('active');
+    });
+
+    // Show selected tab
+    document.getElementById(tabName).classList.add('active');
+    document.querySelector(`[onclick="showTab('${tabName}')"]`).classList.add('active');
+
+    if (tabName === 'history') {
+        loadHistoryData();
+    } else if (tabName === 'stats') {
+        loadStatsData();
+    }
+}
+
+function refreshData() {
+    if (document.getElementById('current').classList.contains('active')) {
+        loadCurrentData();
+    } else if (document.getElementById('history').classList.contains('active')) {
+        loadHistoryData();
+    } else if (document.getElementById('stats').classList.contains('active')) {
+        loadStatsData();
+    }
+}
+
+// Podmíněné dotazy: server odpoví 304, pokud od minula nepřišel nový záznam.
+// Dotazy se since mění URL s každým novým záznamem - pod jedním klíčem (key)
+// se drží jen poslední URL, aby cache s během stránky nerostla.
+const responseCache = {};
+
+async function fetchJson(url, key = url) {
+    const cached = responseCache[key];
+    const headers = cached && cached.url === url ? { 'If-None-Match': cached.etag } : {};
+    const response = await fetch(url, { headers: headers, cache: 'no-store' });
+    if (response.status === 304 && cached) {
+        return { data: cached.data, changed: false, nextSince: cached.nextSince };
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+    const data = await response.json();
+    const nextSince = response.headers.get('X-Next-Since');
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        responseCache[key] = { url: url, etag: etag, data: data, nextSince: nextSince };
+    }
+    return { data: data, changed: true, nextSince: nextSince };
+}
+
+// Sloupcová odpověď /api/data?format=columns zpět na seznam záznamů
+function fromColumns(payload) {
+    const names = Object.keys(payload.columns);
+    const records = [];
+    for (let i = 0; i < payload.count; i++) {
+        const record = {};
+        names.forEach(name => {
+            record[name] = payload.columns[name][i];
+        });
+        payload.empty.forEach(name => {
+            record[name] = null;
+        });
+        records.push(record);
+    }
+    return records;
+}
+
+function isNewer(record, last) {
+    // Pořadí jako na serveru: (čas přijetí, id) - importovaná historie má vyšší id
+    // než novější živé záznamy. Záznamy z lokálního úložiště id nemají.
+    if (record.received_at !== last.received_at || record.id == null || last.id == null) {
+        return record.received_at > last.received_at;
+    }
+    return record.id > last.id;
+}
+
+// Připojí nové záznamy na konec allData (přeskočí ty, které už máme)
+function mergeData(records) {
+    let added = 0;
+    records.forEach(record => {
+        if (allData.length === 0 || isNewer(record, allData[allData.length - 1])) {
+            allData.push(record);
+            added++;
+        }
+    });
+    if (allData.length > MAX_RECORDS) {
+        allData.splice(0, allData.length - MAX_RECORDS);
+    }
+    return added > 0;
+}
+
+// Celé okno stáhneme jen poprvé, pak už jen záznamy novější než poslední známý
+async function syncData() {
+    if (!initialLoaded || allData.length === 0) {
+        const { data } = await fetchJson('/api/data?format=columns');
+        initialLoaded = true;
+        return mergeData(fromColumns(data));
+    }
+    let changed = false;
+    while (true) {
+        const last = allData[allData.length - 1];
+        const since = last.id != null ? last.id : new Date(last.received_at).toISOString();
+        const { data, nextSince } = await fetchJson(
+            `/api/data?format=columns&since=${encodeURIComponent(since)}`, 'since');
+        changed = mergeData(fromColumns(data)) || changed;
+        if (!nextSince) {
+            return changed;
+        }
+    }
+}
+
+async function loadCurrentData() {
+    try {
+        const changed = await syncData();
+        if (!changed && document.querySelector('#current-content .grid')) {
+            return;
+        }
+        renderCurrentData();
+    } catch (error) {
+        console.error('Chyba při načítání dat:', error);
+        document.getElementById('current-content').innerHTML = `
+            <div class="card">
+                <h3>Chyba</h3>
+                <p>Nepodařilo se načíst data. Zkus obnovit stránku.</p>
+            </div>
+        `;
+    }
+}
+
+function renderCurrentData() {
+    const data = allData;
+    try {
+        if (data.length === 0) {
+            document.getElementById('current-content').innerHTML = `
+                <div class="card">
+                    <h3>Žádná data</h3>
+                    <p>Zatím nebyla přijata žádná data z meteostanice.</p>
+                    <p>Zkontroluj nastavení v aplikaci WSLink:</p>
+                    <ul>
+                        <li>URL: https://[IP_ADRESA_TOHOTO_SERVERU]:8000/data/upload.php</li>
+                        <li>ID meteostanice: libovolné</li>
+                        <li>Heslo: libovolné</li>
+                    </ul>
+                </div>
+            `;
+            return;
+        }
+
+        const latest = data[data.length - 1];
+
+        let html = '<div class="grid">';
+
+        // Základní informace
+        html += `
+            <div class="card">
+                <h3>📊 Základní informace</h3>
+                <div><strong>ID stanice:</strong> ${latest.wsid || 'N/A'}</div>
+                <div><strong>Posledních záznamů:</strong> ${data.length}</div>
+                <div><strong>Připojení:</strong> 
+                    <span class="status ${latest.outdoor_connection ? 'ok' : 'error'}">
+                        ${latest.outdoor_connection ? 'Připojeno' : 'Odpojeno'}
+                    </span>
+                </div>
+            </div>
+        `;
+
+        // Teploty
+        html += `
+            <div class="card">
+                <h3>🌡️ Teploty</h3>
+                ${latest.outdoor_temp !== null ? `<div class="value">${latest.outdoor_temp}°C <span class="unit">venkovní</span></div>` : ''}
+                ${latest.indoor_temp !== null ? `<div class="value">${latest.indoor_temp}°C <span class="unit">vnitřní</span></div>` : ''}
+                ${latest.soil_temp !== null ? `<div class="value">${latest.soil_temp}°C <span class="unit">půdní</span></div>` : ''}
+                ${latest.feels_like !== null ? `<div>Pocitová: ${latest.feels_like}°C</div>` : ''}
+                ${latest.dew_point !== null ? `<div>Rosný bod: ${latest.dew_point}°C</div>` : ''}
+            </div>
+        `;
+
+        // Vlhkost
+        html += `
+            <div class="card">
+                <h3>💧 Vlhkost</h3>
+                ${latest.outdoor_humidity !== null ? `<div class="value">${latest.outdoor_humidity}% <span class="unit">venkovní</span></div>` : ''}
+                ${latest.indoor_humidity !== null ? `<div class="value">${latest.indoor_humidity}% <span class="unit">vnitřní</span></div>` : ''}
+                ${latest.soil_humidity !== null ? `<div class="value">${latest.soil_humidity}% <span class="unit">půdní</span></div>` : ''}
+            </div>
+        `;
+
+        // Tlak
+        html += `
+            <div class="card">
+                <h3>🌪️ Atmosférický tlak</h3>
+                ${latest.relative_pressure !== null ? `<div class="value">${latest.relative_pressure} <span class="unit">hPa relativní</span></div>` : ''}
+                ${latest.absolute_pressure !== null ? `<div class="value">${latest.absolute_pressure} <span class="unit">hPa absolutní</span></div>` : ''}
+            </div>
+        `;
+
+        // Vítr
+        html += `
+            <div class="card">
+                <h3>🌪️ Vítr</h3>
+                ${latest.wind_speed !== null ? `<div class="value">${latest.wind_speed} <span class="unit">m/s rychlost</span></div>` : ''}
+                ${latest.wind_gust !== null ? `<div>Náraz: ${latest.wind_gust} m/s</div>` : ''}
+                ${latest.wind_direction !== null ? `<div>Směr: ${latest.wind_direction}°</div>` : ''}
+                ${latest.wind_speed_10min_avg !== null ? `<div>Průměr 10min: ${latest.wind_speed_10min_avg} m/s</div>` : ''}
+            </div>
+        `;
+
+        // Déšť
+        html += `
+            <div class="card">
+                <h3>🌧️ Srážky</h3>
+                ${latest.rain_rate !== null ? `<div class="value">${latest.rain_rate} <span class="unit">mm/h intenzita</span></div>` : ''}
+                ${latest.rain_daily !== null ? `<div>Dnes: ${latest.rain_daily} mm</div>` : ''}
+                ${latest.rain_hourly !== null ? `<div>Hodinové: ${latest.rain_hourly} mm</div>` : ''}
+                ${latest.rain_monthly !== null ? `<div>Měsíční: ${latest.rain_monthly} mm</div>` : ''}
+            </div>
+        `;
+
+        // Blesky
+        if (latest.lightning_connection) {
+            html += `
+                <div class="card">
+                    <h3>⚡ Detekce blesků</h3>
+                    <div><strong>Připojení:</strong> 
+                        <span class="status ${latest.lightning_connection ? 'ok' : 'error'}">
+                            ${latest.lightning_connection ? 'Aktivní' : 'Neaktivní'}
+                        </span>
+                    </div>
+                    ${latest.lightning_distance_km !== null ? `<div class="value">${latest.lightning_distance_km} <span class="unit">km vzdálenost</span></div>` : ''}
+                    ${latest.lightning_strikes_1hour !== null ? `<div>Úderů za hodinu: ${latest.lightning_strikes_1hour}</div>` : ''}
+                    ${latest.lightning_count_5min !== null ? `<div>Za 5 min: ${latest.lightning_count_5min}</div>` : ''}
+                    ${latest.lightning_count_30min !== null ? `<div>Za 30 min: ${latest.lightning_count_30min}</div>` : ''}
+                    ${latest.lightning_battery !== null ? `<div>Baterie: ${latest.lightning_battery}%</div>` : ''}
+                </div>
+            `;
+        }
+
+        // UV a sluneční záření
+        if (latest.uv_index !== null || latest.solar_radiation !== null) {
+            html += `
+                <div class="card">
+                    <h3>☀️ UV & Sluneční záření</h3>
+                    ${latest.uv_index !== null ? `<div class="value">${latest.uv_index} <span class="unit">UV index</span></div>` : ''}
+                    ${latest.solar_radiation !== null ? `<div class="value">${latest.solar_radiation} <span class="unit">W/m² sluneční záření</span></div>` : ''}
+                </div>
+            `;
+        }
+
+        html += '</div>';
+
+        // Poslední aktualizace
+        html += `
+            <div class="last-update">
+                Poslední aktualizace: ${new Date(latest.received_at).toLocaleString('cs-CZ')}
+            </div>
+        `;
+
+        document.getElementById('current-content').innerHTML = html;
+
+    } catch (error) {
+        console.error('Chyba při načítání dat:', error);
+        document.getElementById('current-content').innerHTML = `
+            <div class="card">
+                <h3>Chyba</h3>
+                <p>Nepodařilo se načíst data. Zkus obnovit stránku.</p>
+            </div>
+        `;
+    }
+}
+
+async function loadHistoryData() {
+    try {
+        document.getElementById('history-content').innerHTML = '<div class="loading">Načítám historická data...</div>';
+
+        // Tabulka se skládá z allData - ze serveru se stáhnou jen nové záznamy
+        await syncData();
+        const recordCount = document.getElementById('recordCount').value;
+        const data = recordCount === 'all' ? allData.slice() : allData.slice(-parseInt(recordCount));
+
+        if (data.length === 0) {
+            document.getElementById('history-content').innerHTML = `
+                <div class="card">
+                    <h3>Žádná data</h3>
+                    <p>Zatím nebyla přijata žádná data z meteostanice.</p>
+                </div>
+            `;
+            return;
+        }
+
+        const displayData = data;
+
+        let html = `
+            <div style="overflow-x: auto;">
+                <table class="history-table">
+                    <thead>
+                        <tr>
+                            <th>Čas</th>
+                            <th>Teplota (°C)</th>
+                            <th>Vlhkost (%)</th>
+                            <th>Tlak (hPa)</th>
+                            <th>Vítr (m/s)</th>
+                            <th>Déšť (mm)</th>
+                            <th>UV index</th>
+                            <th>Blesky</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+        `;
+
+        displayData.reverse().forEach(record => {
+            const time = new Date(record.received_at).toLocaleString('cs-CZ');
+            html += `
+                <tr>
+                    <td>${time}</td>
+                    <td>${record.outdoor_temp !== null ? record.outdoor_temp : '-'}</td>
+                    <td>${record.outdoor_humidity !== null ? record.outdoor_humidity : '-'}</td>
+                    <td>${record.relative_pressure !== null ? record.relative_pressure : '-'}</td>
+                    <td>${record.wind_speed !== null ? record.wind_speed : '-'}</td>
+                    <td>${record.rain_rate !== null ? record.rain_rate : '-'}</td>
+                    <td>${record.uv_index !== null ? record.uv_index : '-'}</td>
+                    <td>${record.lightning_distance_km !== null ? record.lightning_distance_km + ' km' : '-'}</td>
+                </tr>
+            `;
+        });
+
+        html += `
+                    </tbody>
+                </table>
+            </div>
+        `;
+
+        document.getElementById('history-content').innerHTML = html;
+
+    } catch (error) {
+        console.error('Chyba při načítání historie:', error);
+        document.getElementById('history-content').innerHTML = `
+            <div class="card">
+                <h3>Chyba</h3>
+                <p>Nepodařilo se načíst historická data.</p>
+            </div>
+        `;
+    }
+}
+
+async function loadStatsData() {
+    try {
+        document.getElementById('stats-content').innerHTML = '<div class="loading">Počítám statistiky...</div>';
+
+        // Statistiky počítá server z průběžných agregací
+        const { data } = await fetchJson('/api/stats?period=24h');
+
+        if (!data.count) {
+            document.getElementById('stats-content').innerHTML = `
+                <div class="card">
+                    <h3>Žádná data</h3>
+                    <p>Zatím nebyla přijata žádná data pro statistiky.</p>
+                </div>
+            `;
+            return;
+        }
+
+        const stats = formatStats(data);
+
+        let html = `
+            <div class="stats-grid">
+                <div class="stat-card">
+                    <div class="stat-value">${stats.temp.min}°C</div>
+                    <div class="stat-label">Min. teplota</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.temp.max}°C</div>
+                    <div class="stat-label">Max. teplota</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.temp.avg}°C</div>
+                    <div class="stat-label">Průměr teplota</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.humidity.min}%</div>
+                    <div class="stat-label">Min. vlhkost</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.humidity.max}%</div>
+                    <div class="stat-label">Max. vlhkost</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.humidity.avg}%</div>
+                    <div class="stat-label">Průměr vlhkost</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.pressure.min}</div>
+                    <div class="stat-label">Min. tlak (hPa)</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.pressure.max}</div>
+                    <div class="stat-label">Max. tlak (hPa)</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.pressure.avg}</div>
+                    <div class="stat-label">Průměr tlak (hPa)</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.wind.max}</div>
+                    <div class="stat-label">Max. vítr (m/s)</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.wind.avg}</div>
+                    <div class="stat-label">Průměr vítr (m/s)</div>
+                </div>
+                <div class="stat-card">
+                    <div class="stat-value">${stats.rain.total}</div>
+                    <div class="stat-label">Celkem déšť (mm)</div>
+                </div>
+            </div>
+
+            <div class="card">
+                <h3>📊 Přehled za posledních 24 hodin</h3>
+                <div class="grid">
+                    <div>
+                        <strong>Celkem záznamů:</strong> ${data.count}<br>
+                        <strong>První záznam:</strong> ${new Date(data.first_at).toLocaleString('cs-CZ')}<br>
+                        <strong>Poslední záznam:</strong> ${new Date(data.last_at).toLocaleString('cs-CZ')}
+                    </div>
+                    <div>
+                        <strong>Aktivní senzory:</strong><br>
+                        ${stats.sensors.outdoor ? '✅ Venkovní senzor' : '❌ Venkovní senzor'}<br>
+                        ${stats.sensors.indoor ? '✅ Vnitřní senzor' : '❌ Vnitřní senzor'}<br>
+                        ${stats.sensors.soil ? '✅ Půdní senzor' : '❌ Půdní senzor'}<br>
+                        ${stats.sensors.lightning ? '✅ Detektor blesků' : '❌ Detektor blesků'}
+                    </div>
+                </div>
+            </div>
+        `;
+
+        document.getElementById('stats-content').innerHTML = html;
+
+    } catch (error) {
+        console.error('Chyba při načítání statistik:', error);
+        document.getElementById('stats-content').innerHTML = `
+            <div class="card">
+                <h3>Chyba</h3>
+                <p>Nepodařilo se načíst statistiky.</p>
+            </div>
+        `;
+    }
+}
+
+function formatStats(data) {
+    const m = data.metrics;
+    const fixed = (value, digits) => value === null ? '-' : Number(value).toFixed(digits);
+
+    return {
+        temp: {
+            min: fixed(m.outdoor_temp.min, 1),
+            max: fixed(m.outdoor_temp.max, 1),
+            avg: fixed(m.outdoor_temp.avg, 1)
+        },
+        humidity: {
+            min: fixed(m.outdoor_humidity.min, 0),
+            max: fixed(m.outdoor_humidity.max, 0),
+            avg: fixed(m.outdoor_humidity.avg, 0)
+        },
+        pressure: {
+            min: fixed(m.relative_pressure.min, 1),
+            max: fixed(m.relative_pressure.max, 1),
+            avg: fixed(m.relative_pressure.avg, 1)
+        },
+        wind: {
+            min: fixed(m.wind_speed.min, 1),
+            max: fixed(m.wind_speed.max, 1),
+            avg: fixed(m.wind_speed.avg, 1)
+        },
+        // Úhrn z přírůstků denního čítače srážek
+        rain: { total: fixed(data.rain_mm, 1) },
+        sensors: {
+            outdoor: m.outdoor_temp.count > 0,
+            indoor: m.indoor_temp.count > 0,
+            soil: m.soil_temp.count > 0,
+            lightning: m.lightning_connection.max > 0
+        }
+    };
+}
+
+function exportData() {
+    // CSV generuje a streamuje server - export není omezený na načtená data
+    const fields = ['received_at'].concat(EXPORT_FIELDS).join(',');
+    const link = document.createElement('a');
+    link.setAttribute('href', `/api/export?format=csv&fields=${fields}`);
+    link.style.visibility = 'hidden';
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+}
+
+// Nové záznamy posílá server hned po uložení (Server-Sent Events)
+function connectLive() {
+    if (!window.EventSource) {
+        // Starší prohlížeče - auto-refresh každých 30 sekund pouze pro aktuální data
+        setInterval(() => {
+            if (document.getElementById('current').classList.contains('active')) {
+                loadCurrentData();
+            }
+        }, 30000);
+        return;
+    }
+
+    const source = new EventSource('/api/live');
+    let reconnecting = false;
+    source.onmessage = (event) => {
+        // Do prvního načtení okna záznamy nepřidáváme - budou v něm
+        if (initialLoaded && mergeData([JSON.parse(event.data)]) && document.getElementById('current').classList.contains('active')) {
+            renderCurrentData();
+        }
+    };
+    source.onerror = () => {
+        reconnecting = true;
+    };
+    source.onopen = () => {
+        // Po výpadku spojení doplníme záznamy, které mezitím přišly
+        if (reconnecting) {
+            reconnecting = false;
+            loadCurrentData();
+        }
+    };
+}
+
+// Načíst data při načtení stránky
+window.addEventListener('DOMContentLoaded', () => {
+    loadCurrentData();
+    connectLive();
+});